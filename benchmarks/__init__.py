@@ -0,0 +1,5 @@
+'''Performance benchmarks of the pommerman simulator.
+
+See env_benchmarks.py for how to run them and compare the results of two
+runs.
+'''
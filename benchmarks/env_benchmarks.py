@@ -0,0 +1,355 @@
+"""Throughput, reset latency and memory of every registered env.
+
+For every config a game is played with SimpleAgents from a fixed seed. The
+states at the start of the early, mid and late phase of that game and the
+actions that followed them are kept, and the benchmark replays the actions
+from those states. The agents' time is not measured and every run steps
+through exactly the same states, so runs can be compared with each other.
+
+Measured per config:
+- steps/sec of env.step in each phase (the best of the repeats).
+- observations/sec, i.e. agent observations built per second.
+- the mean time of each section of the step, see pommerman.profiling.
+- the latency of env.reset over a range of seeds.
+- the memory allocated by making and resetting an env.
+
+Run all configs and save the results:
+python -m benchmarks.env_benchmarks --output results.json
+
+Compare with an earlier run. This exits with 1 if a metric got worse by
+more than the tolerance:
+python -m benchmarks.env_benchmarks --baseline results.json --tolerance 0.1
+"""
+import argparse
+from datetime import datetime
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import gym
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import constants
+from pommerman import profiling
+
+PHASES = ('early', 'mid', 'late')
+
+_clock = time.perf_counter
+
+
+def num_agents(config_id):
+    '''Returns the number of agents in a game of config_id'''
+    game_type = gym.spec(config_id)._kwargs['game_type']
+    return 2 if game_type == constants.GameType.OneVsOne else 4
+
+
+def make_env(config_id, seed, agent_class=agents.BaseAgent):
+    '''Makes a seeded env of config_id played by agent_class agents'''
+    random.seed(seed)
+    np.random.seed(seed)
+    env = pommerman.make(
+        config_id, [agent_class() for _ in range(num_agents(config_id))])
+    env.seed(seed)
+    return env
+
+
+def phase_starts(max_steps):
+    '''Returns the step at which each phase of a game starts'''
+    return {'early': 0, 'mid': max_steps // 3, 'late': 2 * max_steps // 3}
+
+
+def record_phases(config_id, seed, window):
+    '''Plays a game with SimpleAgents and keeps the states to benchmark.
+
+    The game is played on after it is done, so that every phase is reached
+    even when the agents die early. The late phase then has the few agents
+    that are left, like real games.
+
+    Returns:
+      A dict from phase to a tuple of (start step, the GameState at the
+      start of the phase, the actions of the window steps after it).
+    '''
+    env = make_env(config_id, seed, agents.SimpleAgent)
+    obs = env.reset()
+    starts = phase_starts(env._max_steps)
+    states = {}
+    actions = []
+    for step in range(max(starts.values()) + window):
+        for phase, start in starts.items():
+            if step == start:
+                states[phase] = env.get_state()
+        actions.append(env.act(obs))
+        obs = env.step(actions[-1])[0]
+    env.close()
+    return {
+        phase: (start, states[phase], actions[start:start + window])
+        for phase, start in starts.items()
+    }
+
+
+def bench_phase(env, state, actions, repeats):
+    '''Steps env through the actions from state.
+
+    Returns:
+      A dict with the steps/sec, the observations/sec and the mean time of
+      each profiled section in microseconds, all from the fastest repeat.
+      The sections come from separate profiled repeats, so the profiling
+      doesn't slow down the timed ones.
+    '''
+    best = float('inf')
+    for _ in range(repeats):
+        env.set_state(state)
+        start = _clock()
+        for action in actions:
+            env.step(action)
+        best = min(best, _clock() - start)
+
+    sections = {}
+    for _ in range(repeats):
+        env.set_state(state)
+        profiler = profiling.enable()
+        try:
+            for action in actions:
+                env.step(action)
+        finally:
+            profiling.disable()
+        for name, total in profiler.totals.items():
+            mean = total / profiler.calls[name] * 1e6
+            sections[name] = min(sections.get(name, mean), mean)
+
+    return {
+        'steps_per_sec': len(actions) / best,
+        'observations_per_sec':
+        len(env._agents) * 1e6 / sections['observations'],
+        'sections': dict(sorted(sections.items())),
+    }
+
+
+def bench_resets(config_id, seed, num_resets):
+    '''Returns the median, min and max reset latency in ms'''
+    env = make_env(config_id, seed)
+    times = []
+    for num in range(num_resets):
+        random.seed(seed + num)
+        np.random.seed(seed + num)
+        start = _clock()
+        env.reset()
+        times.append((_clock() - start) * 1e3)
+    env.close()
+    return {'median': float(np.median(times)), 'min': min(times),
+            'max': max(times)}
+
+
+def bench_memory(config_id, seed):
+    '''Returns the bytes allocated by making and resetting an env'''
+    tracemalloc.start()
+    try:
+        env = make_env(config_id, seed)
+        env.reset()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    env.close()
+    return current, peak
+
+
+def bench_config(config_id, seed=0, window=100, repeats=5, num_resets=20):
+    '''Runs all the benchmarks of a config and returns the results as a dict'''
+    phases = {}
+    env = make_env(config_id, seed)
+    env.reset()
+    for phase, (start, state, actions) in record_phases(
+            config_id, seed, window).items():
+        result = bench_phase(env, state, actions, repeats)
+        result.update({
+            'start_step': start,
+            'steps': len(actions),
+            'alive_agents': int(state.agents[:, 3].sum()),
+            'bombs': len(state.bombs),
+            'wood': int((state.board == constants.Item.Wood.value).sum()),
+        })
+        phases[phase] = result
+    env.close()
+
+    memory, memory_peak = bench_memory(config_id, seed)
+    return {
+        'config': config_id,
+        'num_agents': num_agents(config_id),
+        'phases': phases,
+        'reset_ms': bench_resets(config_id, seed, num_resets),
+        'memory_bytes': memory,
+        'memory_peak_bytes': memory_peak,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(config_ids, seed=0, window=100, repeats=5, num_resets=20):
+    '''Benchmarks the configs and returns the results with the machine's info'''
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'seed': seed,
+            'window': window,
+            'repeats': repeats,
+            'num_resets': num_resets,
+        },
+        'results': [
+            bench_config(config_id, seed, window, repeats, num_resets)
+            for config_id in config_ids
+        ],
+    }
+
+
+def metrics(result):
+    '''Yields (name, value, higher_is_better) for the metrics of a config'''
+    for phase in PHASES:
+        if phase in result['phases']:
+            values = result['phases'][phase]
+            yield phase + '.steps_per_sec', values['steps_per_sec'], True
+            yield (phase + '.observations_per_sec',
+                   values['observations_per_sec'], True)
+    yield 'reset_ms.median', result['reset_ms']['median'], False
+    yield 'memory_bytes', result['memory_bytes'], False
+
+
+def compare(results, baseline, tolerance=0.1):
+    '''Compares two runs of the benchmarks.
+
+    Args:
+      results: The dict of run.
+      baseline: The dict of an earlier run.
+      tolerance: The relative change beyond which a metric that got worse
+        counts as a regression.
+
+    Returns:
+      A list of (config, metric, baseline value, value, relative change,
+      is_regression). A positive change is an improvement.
+    '''
+    baseline_results = {
+        result['config']: dict(
+            (name, value) for name, value, _ in metrics(result))
+        for result in baseline['results']
+    }
+    rows = []
+    for result in results['results']:
+        old_metrics = baseline_results.get(result['config'])
+        if old_metrics is None:
+            continue
+        for name, value, higher_is_better in metrics(result):
+            old = old_metrics.get(name)
+            if not old:
+                continue
+            change = (value - old) / old
+            if not higher_is_better:
+                change = -change
+            rows.append((result['config'], name, old, value, change,
+                         change < -tolerance))
+    return rows
+
+
+def print_results(results):
+    configs = [result['config'] for result in results['results']]
+    width = max([len(config) for config in configs] + [6])
+    print('{:<{}} {:>5} {:>10} {:>10} {:>9} {:>10}'.format(
+        'config', width, 'phase', 'steps/s', 'obs/s', 'reset ms', 'memory kB'))
+    for result in results['results']:
+        for num, phase in enumerate(PHASES):
+            values = result['phases'][phase]
+            extra = ['', '']
+            if num == 0:
+                extra = ['%.2f' % result['reset_ms']['median'],
+                         '%d' % (result['memory_bytes'] // 1024)]
+            print('{:<{}} {:>5} {:>10.0f} {:>10.0f} {:>9} {:>10}'.format(
+                result['config'] if num == 0 else '', width, phase,
+                values['steps_per_sec'], values['observations_per_sec'],
+                *extra))
+
+
+def print_comparison(rows):
+    width = max([len(config) for config, *_ in rows] + [6])
+    print('{:<{}} {:<26} {:>12} {:>12} {:>8}'.format(
+        'config', width, 'metric', 'baseline', 'now', 'change'))
+    for config, name, old, value, change, is_regression in rows:
+        print('{:<{}} {:<26} {:>12.2f} {:>12.2f} {:>+7.1f}%{}'.format(
+            config, width, name, old, value, change * 100,
+            ' REGRESSION' if is_regression else ''))
+
+
+def main():
+    '''CLI entry point of the benchmarks'''
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the pommerman envs.')
+    parser.add_argument(
+        '--configs',
+        default=None,
+        help='Comma delineated list of configs to benchmark. Defaults to '
+        'all registered configs.')
+    parser.add_argument('--seed', default=0, type=int)
+    parser.add_argument(
+        '--window',
+        default=100,
+        type=int,
+        help='The number of steps benchmarked in each phase of the game.')
+    parser.add_argument(
+        '--repeats',
+        default=5,
+        type=int,
+        help='Times each window is stepped. The fastest one counts.')
+    parser.add_argument(
+        '--resets',
+        default=20,
+        type=int,
+        help='The number of resets to time per config.')
+    parser.add_argument(
+        '--output', default=None, help='File to write the results to as json.')
+    parser.add_argument(
+        '--baseline',
+        default=None,
+        help='Results of an earlier run to compare with.')
+    parser.add_argument(
+        '--tolerance',
+        default=0.1,
+        type=float,
+        help='Relative change beyond which a worse metric is a regression.')
+    args = parser.parse_args()
+
+    config_ids = args.configs.split(',') if args.configs else \
+        sorted(pommerman.REGISTRY)
+    results = run(config_ids, args.seed, args.window, args.repeats,
+                  args.resets)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline, args.tolerance)
+        print()
+        print_comparison(rows)
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
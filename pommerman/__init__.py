@@ -1,13 +1,25 @@
 '''Entry point into the pommerman module'''
+import copy
 import gym
 import inspect
+from . import action_collector
 from . import agents
+from . import batched_forward_model
+from . import belief
+from . import binary_obs
+from . import board_analysis
+from . import board_bank
 from . import configs
 from . import constants
+from . import featurizer
 from . import forward_model
+from . import game_state
 from . import helpers
 from . import utility
 from . import network
+from . import profiling
+from . import recording
+from . import replay
 
 gym.logger.set_level(40)
 REGISTRY = None
@@ -32,11 +44,23 @@ def _register():
 # Register environments with gym
 _register()
 
-def make(config_id, agent_list, game_state_file=None, render_mode='human'):
-    '''Makes the pommerman env and registers it with gym'''
+def make(config_id, agent_list, game_state_file=None, render_mode='human',
+         **kwargs):
+    '''Makes the pommerman env and registers it with gym.
+
+    Extra kwargs override the env_kwargs of the config, e.g.
+    model=batched_forward_model.BatchedForwardModel.
+    '''
     assert config_id in REGISTRY, "Unknown configuration '{}'. " \
         "Possible values: {}".format(config_id, REGISTRY)
-    env = gym.make(config_id)
+    if kwargs:
+        # gym.make takes no kwargs in the pinned gym, so build the env from
+        # a copy of the registered spec with the overrides merged in.
+        spec = copy.copy(gym.spec(config_id))
+        spec._kwargs = dict(spec._kwargs, **kwargs)
+        env = spec.make()
+    else:
+        env = gym.make(config_id)
 
     for id_, agent in enumerate(agent_list):
         assert isinstance(agent, agents.BaseAgent)
@@ -50,3 +74,4 @@ def make(config_id, agent_list, game_state_file=None, render_mode='human'):
 
 
 from . import cli
+from . import vec
@@ -0,0 +1,20 @@
+'''Runs a pommerman cli command, e.g. python -m pommerman tournament'''
+import sys
+
+from .cli import make_board_bank
+from .cli import run_battle
+from .cli import tournament
+
+COMMANDS = {
+    'battle': run_battle.main,
+    'board_bank': make_board_bank.main,
+    'tournament': tournament.main,
+}
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        sys.exit('Usage: python -m pommerman {%s} [flags]' %
+                 ','.join(sorted(COMMANDS)))
+    command = sys.argv.pop(1)
+    sys.argv[0] = 'pommerman ' + command
+    COMMANDS[command]()
@@ -0,0 +1,116 @@
+'''Asks all agents for their actions at once, with a deadline per step.
+
+ForwardModel.act asks the agents one after the other, so with agents that
+act over the network, like DockerAgent and HttpAgent, a step takes as long
+as all of their requests together. An ActionCollector asks them all at the
+same time on a thread pool and waits at most until the deadline of the step.
+Agents that have not answered by then play their default action. An agent is
+never asked twice at once: while its late answer is outstanding it plays
+the default action without being asked.
+
+Late actions are recorded in ActionCollector.late, e.g.
+
+    env = pommerman.make('PommeFFACompetition-v0', agent_list,
+                         act_deadline=0.1)
+    ...
+    print(env.action_collector.late)
+'''
+from concurrent import futures
+import functools
+import time
+
+
+class ActionCollector(object):
+    """Collects the actions of agents on a thread pool.
+
+    Attributes:
+      deadline: The seconds the agents have to act each step.
+      num_steps: The number of times actions were collected.
+      late: A dict for each action that was late, with the step and
+        agent_id, whether the agent was still busy with an earlier step
+        and late_by, the seconds after the deadline its answer came. That is
+        None until the answer comes and for agents that were busy.
+    """
+
+    def __init__(self, deadline, max_workers=None):
+        '''Makes an ActionCollector.
+
+        Args:
+          deadline: The seconds the agents have to act each step.
+          max_workers: The number of threads. Defaults to the number of agents
+            of the first step.
+        '''
+        self.deadline = deadline
+        self.num_steps = 0
+        self.late = []
+        self._max_workers = max_workers
+        self._executor = None
+        # The future of each agent whose answer is late, by agent_id.
+        self._pending = {}
+
+    def collect(self, agents, act, default):
+        '''Returns the actions of the agents.
+
+        Args:
+          agents: The agents to ask.
+          act: A function that returns an agent's action.
+          default: A function that returns the action of a late agent.
+
+        Returns:
+          A list with the action of each agent.
+        '''
+        end = time.perf_counter() + self.deadline
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(
+                max_workers=self._max_workers or max(len(agents), 1))
+
+        ret = [None] * len(agents)
+        asked = {}
+        for num_agent, agent in enumerate(agents):
+            pending = self._pending.get(agent.agent_id)
+            if pending is not None:
+                if not pending.done():
+                    self.late.append({
+                        'step': self.num_steps,
+                        'agent_id': agent.agent_id,
+                        'busy': True,
+                        'late_by': None
+                    })
+                    ret[num_agent] = default(agent)
+                    continue
+                del self._pending[agent.agent_id]
+            asked[num_agent] = self._executor.submit(act, agent)
+
+        futures.wait(asked.values(),
+                     timeout=max(0, end - time.perf_counter()))
+        for num_agent, future in asked.items():
+            agent = agents[num_agent]
+            if future.done():
+                ret[num_agent] = future.result()
+                continue
+
+            record = {
+                'step': self.num_steps,
+                'agent_id': agent.agent_id,
+                'busy': False,
+                'late_by': None
+            }
+            self.late.append(record)
+            self._pending[agent.agent_id] = future
+            future.add_done_callback(
+                functools.partial(self._answered, record, end))
+            ret[num_agent] = default(agent)
+
+        self.num_steps += 1
+        return ret
+
+    @staticmethod
+    def _answered(record, end, future):
+        record['late_by'] = time.perf_counter() - end
+
+    def close(self):
+        '''Stops the threads without waiting for late agents'''
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self._pending = {}
@@ -17,6 +17,23 @@ class BaseAgent:
     def act(self, obs, action_space):
         raise NotImplementedError()
 
+    def act_batch(self, observations, action_space):
+        """Returns the actions for a batch of observations.
+
+        A vectorized runner like vec.VecEnv calls this once a step with the
+        observations of every env and seat that the agent plays. Agents that
+        can act on all of them at once, e.g. with one forward pass of a
+        network, should override it. This default calls act for each.
+
+        Args:
+          observations: A list of observation dicts.
+          action_space: The action space of the envs.
+
+        Returns:
+          A list with the action for each observation.
+        """
+        return [self.act(obs, action_space) for obs in observations]
+
     def episode_end(self, reward):
         """This is called at the end of the episode to let the agent know that
         the episode has ended and what is the reward.
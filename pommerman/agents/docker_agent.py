@@ -7,6 +7,7 @@ import requests
 import docker
 
 from . import BaseAgent
+from .. import binary_obs
 from .. import utility
 from .. import characters
 
@@ -20,7 +21,8 @@ class DockerAgent(BaseAgent):
                  server='http://localhost',
                  character=characters.Bomber,
                  docker_client=None,
-                 env_vars=None):
+                 env_vars=None,
+                 binary_obs=False):
         super(DockerAgent, self).__init__(character)
 
         self._docker_image = docker_image
@@ -37,6 +39,10 @@ class DockerAgent(BaseAgent):
         self._timeout = 32
         self._container = None
         self._env_vars = env_vars or {}
+        # Keeps the connection to the container open between requests.
+        self._session = requests.Session()
+        # Sends the observations in the encoding of the binary_obs module.
+        self._binary_obs = binary_obs
         # Pass env variables starting with DOCKER_AGENT to the container.
         for key, value in os.environ.items():
             if not key.startswith("DOCKER_AGENT_"):
@@ -93,7 +99,7 @@ class DockerAgent(BaseAgent):
                     raise
 
                 request_url = '%s:%s/ping' % (self._server, self._port)
-                req = requests.get(request_url)
+                req = self._session.get(request_url)
                 self._acknowledged = True
                 return True
             except requests.exceptions.ConnectionError as e:
@@ -112,7 +118,7 @@ class DockerAgent(BaseAgent):
         super(DockerAgent, self).init_agent(id, game_type)
         request_url = "http://localhost:{}/init_agent".format(self._port)
         try:
-            req = requests.post(
+            req = self._session.post(
                 request_url,
                 timeout=0.5,
                 json={
@@ -123,18 +129,27 @@ class DockerAgent(BaseAgent):
             print('Timeout in init_agent()!')
 
     def act(self, obs, action_space):
-        obs_serialized = json.dumps(obs, cls=utility.PommermanJSONEncoder)
         request_url = "http://localhost:{}/action".format(self._port)
         try:
-            req = requests.post(
-                request_url,
-                timeout=0.15,
-                json={
-                    "obs":
-                    obs_serialized,
-                    "action_space":
-                    json.dumps(action_space, cls=utility.PommermanJSONEncoder)
-                })
+            if self._binary_obs:
+                req = self._session.post(
+                    request_url,
+                    timeout=0.15,
+                    data=binary_obs.encode(obs, action_space),
+                    headers={'Content-Type': binary_obs.CONTENT_TYPE})
+            else:
+                obs_serialized = json.dumps(
+                    obs, cls=utility.PommermanJSONEncoder)
+                req = self._session.post(
+                    request_url,
+                    timeout=0.15,
+                    json={
+                        "obs":
+                        obs_serialized,
+                        "action_space":
+                        json.dumps(action_space,
+                                   cls=utility.PommermanJSONEncoder)
+                    })
             action = req.json()['action']
         except requests.exceptions.Timeout as e:
             print('Timeout!')
@@ -149,7 +164,7 @@ class DockerAgent(BaseAgent):
     def episode_end(self, reward):
         request_url = "http://localhost:{}/episode_end".format(self._port)
         try:
-            req = requests.post(
+            req = self._session.post(
                 request_url,
                 timeout=0.5,
                 json={
@@ -161,12 +176,13 @@ class DockerAgent(BaseAgent):
     def shutdown(self):
         request_url = "http://localhost:{}/shutdown".format(self._port)
         try:
-            req = requests.post(
+            req = self._session.post(
                 request_url,
                 timeout=0.5,
                 json={ })
         except requests.exceptions.Timeout as e:
             print('Timeout in shutdown()!')
+        self._session.close()
 
         print("Stopping container..")
         if self._container:
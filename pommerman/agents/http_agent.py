@@ -7,6 +7,7 @@ import threading
 import requests
 
 from . import BaseAgent
+from .. import binary_obs
 from .. import utility
 from .. import characters
 
@@ -20,10 +21,15 @@ class HttpAgent(BaseAgent):
                  port=8080,
                  host='localhost',
                  timeout=120,
-                 character=characters.Bomber):
+                 character=characters.Bomber,
+                 binary_obs=False):
         self._port = port
         self._host = host
         self._timeout = timeout
+        # Keeps the connection to the remote agent open between requests.
+        self._session = requests.Session()
+        # Sends the observations in the encoding of the binary_obs module.
+        self._binary_obs = binary_obs
         super(HttpAgent, self).__init__(character)
         self._wait_for_remote()
 
@@ -45,7 +51,7 @@ class HttpAgent(BaseAgent):
                     raise
 
                 request_url = 'http://%s:%s/ping' % (self._host, self._port)
-                req = requests.get(request_url)
+                req = self._session.get(request_url)
                 self._acknowledged = True
                 return True
             except requests.exceptions.ConnectionError as e:
@@ -61,7 +67,7 @@ class HttpAgent(BaseAgent):
         super(HttpAgent, self).init_agent(id, game_type)
         request_url = "http://{}:{}/init_agent".format(self._host, self._port)
         try:
-            req = requests.post(
+            req = self._session.post(
                 request_url,
                 timeout=0.5,
                 json={
@@ -72,18 +78,27 @@ class HttpAgent(BaseAgent):
             print('Timeout in init_agent()!')
 
     def act(self, obs, action_space):
-        obs_serialized = json.dumps(obs, cls=utility.PommermanJSONEncoder)
         request_url = "http://{}:{}/action".format(self._host, self._port)
         try:
-            req = requests.post(
-                request_url,
-                timeout=0.15,
-                json={
-                    "obs":
-                    obs_serialized,
-                    "action_space":
-                    json.dumps(action_space, cls=utility.PommermanJSONEncoder)
-                })
+            if self._binary_obs:
+                req = self._session.post(
+                    request_url,
+                    timeout=0.15,
+                    data=binary_obs.encode(obs, action_space),
+                    headers={'Content-Type': binary_obs.CONTENT_TYPE})
+            else:
+                obs_serialized = json.dumps(
+                    obs, cls=utility.PommermanJSONEncoder)
+                req = self._session.post(
+                    request_url,
+                    timeout=0.15,
+                    json={
+                        "obs":
+                        obs_serialized,
+                        "action_space":
+                        json.dumps(action_space,
+                                   cls=utility.PommermanJSONEncoder)
+                    })
             action = req.json()['action']
         except requests.exceptions.Timeout as e:
             print('Timeout!')
@@ -98,7 +113,7 @@ class HttpAgent(BaseAgent):
     def episode_end(self, reward):
         request_url = "http://{}:{}/episode_end".format(self._host, self._port)
         try:
-            req = requests.post(
+            req = self._session.post(
                 request_url,
                 timeout=0.5,
                 json={
@@ -110,9 +125,10 @@ class HttpAgent(BaseAgent):
     def shutdown(self):
         request_url = "http://{}:{}/shutdown".format(self._host, self._port)
         try:
-            req = requests.post(
+            req = self._session.post(
                 request_url,
                 timeout=0.5,
                 json={ })
         except requests.exceptions.Timeout as e:
             print('Timeout in shutdown()!')
+        self._session.close()
@@ -2,15 +2,50 @@
 This agent is also the benchmark for other agents.
 '''
 from collections import defaultdict
-import queue
+from collections import deque
+import functools
+import heapq
 import random
 
 import numpy as np
 
 from . import BaseAgent
+from .. import board_analysis
 from .. import constants
 from .. import utility
 
+_ITEMS = list(constants.Item)
+
+
+@functools.lru_cache(maxsize=None)
+def _search_window(board_size, depth, position):
+    '''The cells that SimpleAgent._djikstra searches from position.
+
+    These are the cells within a distance of depth, less the last row and
+    column of the square around them.
+    '''
+    x, y = position
+    rows = np.arange(board_size)[:, None]
+    cols = np.arange(board_size)[None, :]
+    window = (abs(rows - x) + abs(cols - y) <= depth) & \
+        (rows < x + depth) & (cols < y + depth)
+    window.flags.writeable = False
+    return window
+
+
+@functools.lru_cache(maxsize=None)
+def _neighbours(board_size):
+    '''The flat indices of the cells next to each cell, in search order'''
+    ret = []
+    for x in range(board_size):
+        for y in range(board_size):
+            ret.append([
+                (x + row) * board_size + y + col
+                for row, col in [(-1, 0), (1, 0), (0, -1), (0, 1)]
+                if 0 <= x + row < board_size and 0 <= y + col < board_size
+            ])
+    return ret
+
 
 class SimpleAgent(BaseAgent):
     """This is a baseline agent. After you can beat it, submit your agent to
@@ -28,32 +63,25 @@ class SimpleAgent(BaseAgent):
         self._prev_direction = None
 
     def act(self, obs, action_space):
-        def convert_bombs(bomb_map):
-            '''Flatten outs the bomb array'''
-            ret = []
-            locations = np.where(bomb_map > 0)
-            for r, c in zip(locations[0], locations[1]):
-                ret.append({
-                    'position': (r, c),
-                    'blast_strength': int(bomb_map[(r, c)])
-                })
-            return ret
-
+        # The bombs and the masks are shared with the other agents that see
+        # the same board this step.
+        analysis = board_analysis.analyze(obs)
         my_position = tuple(obs['position'])
         board = np.array(obs['board'])
-        bombs = convert_bombs(np.array(obs['bomb_blast_strength']))
+        bombs = analysis.bombs
         enemies = [constants.Item(e) for e in obs['enemies']]
+        passable = analysis.passable(enemies)
         ammo = int(obs['ammo'])
         blast_strength = int(obs['blast_strength'])
         items, dist, prev = self._djikstra(
-            board, my_position, bombs, enemies, depth=10)
+            board, my_position, bombs, enemies, depth=10, passable=passable)
 
         # Move if we are in an unsafe place.
         unsafe_directions = self._directions_in_range_of_bomb(
             board, my_position, bombs, dist)
         if unsafe_directions:
             directions = self._find_safe_directions(
-                board, my_position, unsafe_directions, bombs, enemies)
+                board, my_position, unsafe_directions, passable)
             return random.choice(directions).value
 
         # Lay pomme if we are adjacent to an enemy.
@@ -83,8 +111,8 @@ class SimpleAgent(BaseAgent):
         # Move towards a wooden wall if there is one within two reachable spaces and you have a bomb.
         direction = self._near_wood(my_position, items, dist, prev, 2)
         if direction is not None:
-            directions = self._filter_unsafe_directions(board, my_position,
-                                                        [direction], bombs)
+            directions = self._filter_unsafe_directions(
+                my_position, [direction], analysis.blast_coverage)
             if directions:
                 return directions[0].value
 
@@ -94,9 +122,9 @@ class SimpleAgent(BaseAgent):
             constants.Action.Right, constants.Action.Up, constants.Action.Down
         ]
         valid_directions = self._filter_invalid_directions(
-            board, my_position, directions, enemies)
-        directions = self._filter_unsafe_directions(board, my_position,
-                                                    valid_directions, bombs)
+            passable, my_position, directions)
+        directions = self._filter_unsafe_directions(
+            my_position, valid_directions, analysis.blast_coverage)
         directions = self._filter_recently_visited(
             directions, my_position, self._recently_visited_positions)
         if len(directions) > 1:
@@ -112,7 +140,24 @@ class SimpleAgent(BaseAgent):
         return random.choice(directions).value
 
     @staticmethod
-    def _djikstra(board, my_position, bombs, enemies, depth=None, exclude=None):
+    def _djikstra(board, my_position, bombs, enemies, depth=None, exclude=None,
+                  passable=None):
+        '''Finds the shortest paths to the cells around my_position.
+
+        A breadth first search over flat lists of the board's cells. Cells
+        are visited and ties between equally short paths are broken at random
+        in the same order as the search over dicts that this replaced. The
+        passable mask of a BoardAnalysis can be given to save making it.
+
+        Returns:
+          items: The positions of the cells within depth by Item, in row-major
+            order.
+          dist: An array of the board's shape with the number of steps to each
+            cell. It is np.inf where a cell is out of depth, excluded or can't
+            be reached.
+          prev: An array of the board's shape with the flat index of the cell
+            before each cell on its path, or -1.
+        '''
         assert (depth is not None)
 
         if exclude is None:
@@ -120,62 +165,63 @@ class SimpleAgent(BaseAgent):
                 constants.Item.Fog, constants.Item.Rigid, constants.Item.Flames
             ]
 
-        def out_of_range(p_1, p_2):
-            '''Determines if two points are out of rang of each other'''
-            x_1, y_1 = p_1
-            x_2, y_2 = p_2
-            return abs(y_2 - y_1) + abs(x_2 - x_1) > depth
+        board_size = len(board)
+        excluded = np.zeros(len(constants.Item), dtype=bool)
+        excluded[[item.value for item in exclude]] = True
+        searched = _search_window(board_size, depth, my_position) & \
+            ~excluded[board]
 
-        items = defaultdict(list)
-        dist = {}
-        prev = {}
-        Q = queue.Queue()
-
-        my_x, my_y = my_position
-        for r in range(max(0, my_x - depth), min(len(board), my_x + depth)):
-            for c in range(max(0, my_y - depth), min(len(board), my_y + depth)):
-                position = (r, c)
-                if any([
-                        out_of_range(my_position, position),
-                        utility.position_in_items(board, position, exclude),
-                ]):
-                    continue
-
-                prev[position] = None
-                item = constants.Item(board[position])
-                items[item].append(position)
-                
-                if position == my_position:
-                    Q.put(position)
-                    dist[position] = 0
-                else:
-                    dist[position] = np.inf
+        if passable is None:
+            passable_items = board_analysis.PASSABLE.copy()
+            passable_items[[enemy.value for enemy in enemies]] = False
+            passable = passable_items[board]
+        passable = passable.ravel().tolist()
 
+        items = defaultdict(list)
+        values = board[searched]
+        rows, cols = np.nonzero(searched)
+        order = np.argsort(values, kind='stable')
+        values = values[order]
+        positions = list(zip(rows[order].tolist(), cols[order].tolist()))
+        starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+        ends = starts[1:].tolist() + [len(values)]
+        for value, start, end in zip(values[starts].tolist(), starts.tolist(),
+                                     ends):
+            items[_ITEMS[value]] = positions[start:end]
 
         for bomb in bombs:
             if bomb['position'] == my_position:
                 items[constants.Item.Bomb].append(my_position)
 
-        while not Q.empty():
-            position = Q.get()
-
-            if utility.position_is_passable(board, position, enemies):
-                x, y = position
-                val = dist[(x, y)] + 1
-                for row, col in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                    new_position = (row + x, col + y)
-                    if new_position not in dist:
-                        continue
+        searched = searched.ravel().tolist()
+        neighbours = _neighbours(board_size)
+        dist = [np.inf] * len(searched)
+        prev = [-1] * len(searched)
+        Q = deque()
+        my_index = my_position[0] * board_size + my_position[1]
+        if searched[my_index]:
+            dist[my_index] = 0
+            Q.append(my_index)
+
+        while Q:
+            position = Q.popleft()
+            if not passable[position]:
+                continue
 
-                    if val < dist[new_position]:
-                        dist[new_position] = val
-                        prev[new_position] = position
-                        Q.put(new_position)
-                    elif (val == dist[new_position] and random.random() < .5):
-                        dist[new_position] = val
-                        prev[new_position] = position   
+            val = dist[position] + 1
+            for new_position in neighbours[position]:
+                if not searched[new_position]:
+                    continue
 
+                if val < dist[new_position]:
+                    dist[new_position] = val
+                    prev[new_position] = position
+                    Q.append(new_position)
+                elif (val == dist[new_position] and random.random() < .5):
+                    prev[new_position] = position
 
+        dist = np.array(dist).reshape(board_size, board_size)
+        prev = np.array(prev).reshape(board_size, board_size)
         return items, dist, prev
 
     def _directions_in_range_of_bomb(self, board, my_position, bombs, dist):
@@ -184,10 +230,7 @@ class SimpleAgent(BaseAgent):
         x, y = my_position
         for bomb in bombs:
             position = bomb['position']
-            distance = dist.get(position)
-            if distance is None:
-                continue
-
+            distance = dist[position]
             bomb_range = bomb['blast_strength']
             if distance > bomb_range:
                 continue
@@ -222,18 +265,17 @@ class SimpleAgent(BaseAgent):
         return ret
 
     def _find_safe_directions(self, board, my_position, unsafe_directions,
-                              bombs, enemies):
+                              passable):
 
-        def is_stuck_direction(next_position, bomb_range, next_board, enemies):
+        def is_stuck_direction(next_position, bomb_range, next_passable):
             '''Helper function to do determine if the agents next move is possible.'''
-            Q = queue.PriorityQueue()
-            Q.put((0, next_position))
+            Q = [(0, next_position)]
             seen = set()
 
             next_x, next_y = next_position
             is_stuck = True
-            while not Q.empty():
-                dist, position = Q.get()
+            while Q:
+                dist, position = heapq.heappop(Q)
                 seen.add(position)
 
                 position_x, position_y = position
@@ -250,34 +292,35 @@ class SimpleAgent(BaseAgent):
                     if new_position in seen:
                         continue
 
-                    if not utility.position_on_board(next_board, new_position):
+                    if not utility.position_on_board(next_passable,
+                                                     new_position):
                         continue
 
-                    if not utility.position_is_passable(next_board,
-                                                        new_position, enemies):
+                    if not next_passable[new_position]:
                         continue
 
                     dist = abs(row + position_x - next_x) + abs(col + position_y - next_y)
-                    Q.put((dist, new_position))
+                    heapq.heappush(Q, (dist, new_position))
             return is_stuck
 
         # All directions are unsafe. Return a position that won't leave us locked.
         safe = []
 
         if len(unsafe_directions) == 4:
-            next_board = board.copy()
-            next_board[my_position] = constants.Item.Bomb.value
+            # The bomb we are on can't be passed.
+            next_passable = passable.copy()
+            next_passable[my_position] = False
 
             for direction, bomb_range in unsafe_directions.items():
                 next_position = utility.get_next_position(
                     my_position, direction)
                 next_x, next_y = next_position
-                if not utility.position_on_board(next_board, next_position) or \
-                   not utility.position_is_passable(next_board, next_position, enemies):
+                if not utility.position_on_board(next_passable, next_position) or \
+                   not next_passable[next_position]:
                     continue
 
-                if not is_stuck_direction(next_position, bomb_range, next_board,
-                                          enemies):
+                if not is_stuck_direction(next_position, bomb_range,
+                                          next_passable):
                     # We found a direction that works. The .items provided
                     # a small bit of randomness. So let's go with this one.
                     return [direction]
@@ -301,9 +344,7 @@ class SimpleAgent(BaseAgent):
             if direction in unsafe_directions:
                 continue
 
-            if utility.position_is_passable(board, position,
-                                            enemies) or utility.position_is_fog(
-                                                board, position):
+            if passable[position] or utility.position_is_fog(board, position):
                 safe.append(direction)
 
         if not safe:
@@ -360,7 +401,7 @@ class SimpleAgent(BaseAgent):
     @staticmethod
     def _nearest_position(dist, objs, items, radius):
         nearest = None
-        dist_to = max(dist.values())
+        dist_to = np.inf
 
         for obj in objs:
             for position in items.get(obj, []):
@@ -373,14 +414,20 @@ class SimpleAgent(BaseAgent):
 
     @staticmethod
     def _get_direction_towards_position(my_position, position, prev):
-        if not position:
+        if not position or tuple(position) == tuple(my_position):
             return None
 
-        next_position = position
-        while prev[next_position] != my_position:
-            next_position = prev[next_position]
+        board_size = len(prev)
+        my_index = my_position[0] * board_size + my_position[1]
+        next_index = position[0] * board_size + position[1]
+        while prev.flat[next_index] != my_index:
+            # -1 marks a cell without a predecessor, so there is no path.
+            if prev.flat[next_index] < 0:
+                return None
+            next_index = prev.flat[next_index]
 
-        return utility.get_direction(my_position, next_position)
+        return utility.get_direction(my_position,
+                                     divmod(int(next_index), board_size))
 
     @classmethod
     def _near_enemy(cls, my_position, items, dist, prev, enemies, radius):
@@ -407,30 +454,25 @@ class SimpleAgent(BaseAgent):
                                                    nearest_item_position, prev)
 
     @staticmethod
-    def _filter_invalid_directions(board, my_position, directions, enemies):
+    def _filter_invalid_directions(passable, my_position, directions):
         ret = []
         for direction in directions:
             position = utility.get_next_position(my_position, direction)
-            if utility.position_on_board(
-                    board, position) and utility.position_is_passable(
-                        board, position, enemies):
+            if utility.position_on_board(passable,
+                                         position) and passable[position]:
                 ret.append(direction)
         return ret
 
     @staticmethod
-    def _filter_unsafe_directions(board, my_position, directions, bombs):
+    def _filter_unsafe_directions(my_position, directions, blast_coverage):
+        '''Drops the directions that lead into the blast of a bomb.
+
+        The directions have to lead to cells on the board.
+        '''
         ret = []
         for direction in directions:
-            x, y = utility.get_next_position(my_position, direction)
-            is_bad = False
-            for bomb in bombs:
-                bomb_x, bomb_y = bomb['position']
-                blast_strength = bomb['blast_strength']
-                if (x == bomb_x and abs(bomb_y - y) <= blast_strength) or \
-                   (y == bomb_y and abs(bomb_x - x) <= blast_strength):
-                    is_bad = True
-                    break
-            if not is_bad:
+            position = utility.get_next_position(my_position, direction)
+            if not blast_coverage[position]:
                 ret.append(direction)
         return ret
 
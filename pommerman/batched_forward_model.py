@@ -0,0 +1,653 @@
+'''Module to advance the state of many games at once.
+
+The BatchedForwardModel holds the boards, agents, bombs and flames of N games
+in stacked numpy arrays and resolves movement, kicks, collisions and
+explosions for all of them in one call. ForwardModel.step remains the
+reference implementation of the rules and the results of both are identical.
+'''
+import numpy as np
+
+from . import characters
+from . import constants
+from . import explosions
+from .forward_model import ForwardModel
+
+# Bomber.incr_ammo never lets the ammo go above this.
+MAX_AMMO = 10
+# The life of a freshly created Flame.
+FLAME_LIFE = 2
+
+# Row and column offsets of a move, indexed by constants.Action value.
+ROW_OFFSETS = np.array([0, -1, 1, 0, 0, 0])
+COL_OFFSETS = np.array([0, 0, 0, -1, 1, 0])
+
+_PASSAGE = constants.Item.Passage.value
+_RIGID = constants.Item.Rigid.value
+_WOOD = constants.Item.Wood.value
+_BOMB = constants.Item.Bomb.value
+_FLAMES = constants.Item.Flames.value
+_EXTRA_BOMB = constants.Item.ExtraBomb.value
+_INCR_RANGE = constants.Item.IncrRange.value
+_KICK = constants.Item.Kick.value
+_AGENT0 = constants.Item.Agent0.value
+
+
+def _character(agent):
+    '''Returns the Bomber behind an agent so that attributes can be set'''
+    return getattr(agent, '_character', agent)
+
+
+def _action_value(action):
+    '''Converts an action (int or constants.Action) into an int'''
+    if isinstance(action, constants.Action):
+        return action.value
+    return int(action)
+
+
+class BatchedGameState(object):
+    """The state of num_games games held in stacked arrays.
+
+    Flames are stored as a bit mask per cell: bit k is set when a flame with
+    life k burns on that cell. This is all ForwardModel needs from its list of
+    Flame objects, as at most one flame is created per cell and step.
+
+    Bombs are kept in the order in which they were laid, compacted to the
+    front of the bomb arrays, with num_bombs holding the count per game. A
+    bomb_direction of 0 means that the bomb is not moving, otherwise it is the
+    value of the constants.Action it is moving in.
+    """
+
+    def __init__(self, num_games, board_size, num_agents=4, max_bombs=None):
+        self.num_games = num_games
+        self.board_size = board_size
+        self.num_agents = num_agents
+
+        shape = (num_games, board_size, board_size)
+        self.board = np.zeros(shape, dtype=np.uint8)
+        self.items = np.zeros(shape, dtype=np.uint8)
+        self.flames = np.zeros(shape, dtype=np.uint8)
+
+        self.agent_position = np.zeros((num_games, num_agents, 2),
+                                       dtype=np.int64)
+        self.agent_alive = np.zeros((num_games, num_agents), dtype=bool)
+        self.agent_ammo = np.zeros((num_games, num_agents), dtype=np.int64)
+        self.agent_blast_strength = np.zeros((num_games, num_agents),
+                                             dtype=np.int64)
+        self.agent_can_kick = np.zeros((num_games, num_agents), dtype=bool)
+
+        self.num_bombs = np.zeros(num_games, dtype=np.int64)
+        self._allocate_bombs(max_bombs or num_agents * MAX_AMMO)
+
+    def _allocate_bombs(self, max_bombs):
+        shape = (self.num_games, max_bombs)
+        self.bomb_position = np.zeros(shape + (2,), dtype=np.int64)
+        self.bomb_life = np.zeros(shape, dtype=np.int64)
+        self.bomb_blast_strength = np.zeros(shape, dtype=np.int64)
+        self.bomb_bomber = np.zeros(shape, dtype=np.int64)
+        self.bomb_direction = np.zeros(shape, dtype=np.int64)
+
+    @property
+    def max_bombs(self):
+        return self.bomb_life.shape[1]
+
+    def reserve_bombs(self, max_bombs):
+        '''Grows the bomb arrays so that they can hold max_bombs per game'''
+        if max_bombs <= self.max_bombs:
+            return
+        old = (self.bomb_position, self.bomb_life, self.bomb_blast_strength,
+               self.bomb_bomber, self.bomb_direction)
+        size = self.max_bombs
+        self._allocate_bombs(max(max_bombs, 2 * size))
+        self.bomb_position[:, :size] = old[0]
+        self.bomb_life[:, :size] = old[1]
+        self.bomb_blast_strength[:, :size] = old[2]
+        self.bomb_bomber[:, :size] = old[3]
+        self.bomb_direction[:, :size] = old[4]
+
+    def set_game(self, index, board, agents, bombs, items, flames):
+        """Loads a game given in the ForwardModel representation.
+
+        Args:
+          index: The game to overwrite.
+          board: The board of the game.
+          agents: The agents, ordered by agent_id.
+          bombs: The list of Bomb objects.
+          items: The dict of position to item value hidden under wood.
+          flames: The list of Flame objects.
+        """
+        self.board[index] = board
+        self.items[index] = 0
+        for position, value in items.items():
+            self.items[index][position] = value
+        self.flames[index] = 0
+        for flame in flames:
+            self.flames[index][flame.position] |= 1 << flame.life
+
+        agent_ids = [agent.agent_id for agent in agents]
+        for num_agent, agent in enumerate(agents):
+            self.agent_position[index, num_agent] = agent.position
+            self.agent_alive[index, num_agent] = agent.is_alive
+            self.agent_ammo[index, num_agent] = agent.ammo
+            self.agent_blast_strength[index, num_agent] = agent.blast_strength
+            self.agent_can_kick[index, num_agent] = agent.can_kick
+
+        self.reserve_bombs(len(bombs) + self.num_agents)
+        self.num_bombs[index] = len(bombs)
+        for num_bomb, bomb in enumerate(bombs):
+            self.bomb_position[index, num_bomb] = bomb.position
+            self.bomb_life[index, num_bomb] = bomb.life
+            self.bomb_blast_strength[index, num_bomb] = bomb.blast_strength
+            self.bomb_bomber[index, num_bomb] = agent_ids.index(
+                bomb.bomber.agent_id)
+            self.bomb_direction[index, num_bomb] = 0 \
+                if bomb.moving_direction is None \
+                else _action_value(bomb.moving_direction)
+
+    def update_agents(self, index, agents):
+        '''Writes the agent state of a game back into the agent objects'''
+        for num_agent, agent in enumerate(agents):
+            character = _character(agent)
+            row, col = self.agent_position[index, num_agent]
+            character.position = (int(row), int(col))
+            character.is_alive = bool(self.agent_alive[index, num_agent])
+            character.ammo = int(self.agent_ammo[index, num_agent])
+            character.blast_strength = int(
+                self.agent_blast_strength[index, num_agent])
+            character.can_kick = bool(self.agent_can_kick[index, num_agent])
+
+    def get_game(self, index, agents):
+        """Returns a game in the ForwardModel representation.
+
+        Args:
+          index: The game to return.
+          agents: The agents of the game, ordered by agent_id. Their state is
+            updated and they are used as the bombers of the bombs.
+
+        Returns:
+          board: A copy of the board.
+          bombs: A list of Bomb objects.
+          items: A dict of position to item value.
+          flames: A list of Flame objects in ForwardModel order.
+        """
+        self.update_agents(index, agents)
+        board = self.board[index].copy()
+
+        bombs = []
+        for num_bomb in range(self.num_bombs[index]):
+            row, col = self.bomb_position[index, num_bomb]
+            direction = self.bomb_direction[index, num_bomb]
+            bombs.append(
+                characters.Bomb(
+                    agents[self.bomb_bomber[index, num_bomb]],
+                    (int(row), int(col)),
+                    int(self.bomb_life[index, num_bomb]),
+                    int(self.bomb_blast_strength[index, num_bomb]),
+                    constants.Action(direction) if direction else None))
+
+        items = {}
+        for row, col in zip(*np.nonzero(self.items[index])):
+            items[(int(row), int(col))] = int(self.items[index, row, col])
+
+        # ForwardModel appends new flames in row major order and keeps the
+        # survivors in order, so older (i.e. shorter lived) flames come first.
+        flames = []
+        for life in range(8):
+            positions = np.nonzero(self.flames[index] & (1 << life))
+            for row, col in zip(*positions):
+                flames.append(characters.Flame((int(row), int(col)), life))
+
+        return board, bombs, items, flames
+
+
+class BatchedForwardModel(ForwardModel):
+    """ForwardModel whose step is resolved on stacked arrays.
+
+    step_batch advances a BatchedGameState of N games in one call. step keeps
+    the ForwardModel signature by running a batch of one game, so the model
+    can be used by the envs, e.g. with
+    pommerman.make(config_id, agents, model=BatchedForwardModel).
+    """
+
+    @staticmethod
+    def step(actions,
+             curr_board,
+             curr_agents,
+             curr_bombs,
+             curr_items,
+             curr_flames,
+             max_blast_strength=10):
+        state = BatchedGameState(1, len(curr_board), len(curr_agents))
+        state.set_game(0, curr_board, curr_agents, curr_bombs, curr_items,
+                       curr_flames)
+        BatchedForwardModel.step_batch(
+            state, [[_action_value(action) for action in actions]],
+            max_blast_strength=max_blast_strength)
+        board, bombs, items, flames = state.get_game(0, curr_agents)
+
+        curr_board[:] = board
+        curr_items.clear()
+        curr_items.update(items)
+        return curr_board, curr_agents, bombs, curr_items, flames
+
+    @staticmethod
+    def step_batch(state, actions, max_blast_strength=10):
+        """Advances every game of a BatchedGameState by one step in place.
+
+        Args:
+          state: The BatchedGameState to advance.
+          actions: Integer actions of shape (num_games, num_agents).
+          max_blast_strength: The cap on the blast strength of the agents.
+
+        Returns:
+          The advanced state.
+        """
+        num_games = state.num_games
+        num_agents = state.num_agents
+        board_size = state.board_size
+        actions = np.asarray(actions, dtype=np.int64).reshape(
+            num_games, num_agents)
+        board = state.board
+        games = np.arange(num_games)
+
+        def on_board(rows, cols):
+            '''Returns which positions are on the board and clipped copies'''
+            valid = (rows >= 0) & (rows < board_size) & \
+                    (cols >= 0) & (cols < board_size)
+            return valid, rows.clip(0, board_size - 1), \
+                   cols.clip(0, board_size - 1)
+
+        def blocks_movement(cells):
+            '''Powerups and walls stop bombs from moving onto them'''
+            return (cells == _RIGID) | (cells == _WOOD) | \
+                   (cells >= _EXTRA_BOMB) & (cells <= _KICK)
+
+        # Tick the flames. Replace any dead ones with passages. If there is an
+        # item there, then reveal that item.
+        dead = (state.flames & 1) != 0
+        revealed = dead & (state.items != 0)
+        board[dead] = _PASSAGE
+        board[revealed] = state.items[revealed]
+        state.items[revealed] = 0
+        state.flames >>= 1
+
+        # Redraw all current flames.
+        board[state.flames != 0] = _FLAMES
+
+        # Every agent may lay a bomb, make sure there is room for them.
+        state.reserve_bombs(int(state.num_bombs.max()) + num_agents)
+
+        # Figure out desired next position for alive agents.
+        alive = state.agent_alive.copy()
+        position = state.agent_position
+        desired = position.copy()
+        for num_agent in range(num_agents):
+            live = alive[:, num_agent]
+            rows = position[:, num_agent, 0]
+            cols = position[:, num_agent, 1]
+            board[games[live], rows[live], cols[live]] = _PASSAGE
+            action = actions[:, num_agent]
+
+            lay = live & (action == constants.Action.Bomb.value)
+            if lay.any():
+                BatchedForwardModel._lay_bombs(state, lay, num_agent)
+
+            valid, next_rows, next_cols = on_board(
+                rows + ROW_OFFSETS[action], cols + COL_OFFSETS[action])
+            cells = board[games, next_rows, next_cols]
+            move = live & valid & (action >= constants.Action.Up.value) & \
+                   (action <= constants.Action.Right.value) & \
+                   (cells != _RIGID) & (cells != _WOOD)
+            desired[move, num_agent, 0] = next_rows[move]
+            desired[move, num_agent, 1] = next_cols[move]
+
+        # Gather desired next positions for moving bombs. Handle kicks later.
+        num_bombs = int(state.num_bombs.max())
+        slots = np.arange(num_bombs)
+        live_bombs = slots < state.num_bombs[:, None]
+        bomb_games = games[:, None].repeat(num_bombs, 1)
+        bomb_position = state.bomb_position[:, :num_bombs]
+        bomb_direction = state.bomb_direction[:, :num_bombs]
+        board[bomb_games[live_bombs], bomb_position[live_bombs][:, 0],
+              bomb_position[live_bombs][:, 1]] = _PASSAGE
+
+        desired_bombs = bomb_position.copy()
+        valid, next_rows, next_cols = on_board(
+            bomb_position[..., 0] + ROW_OFFSETS[bomb_direction],
+            bomb_position[..., 1] + COL_OFFSETS[bomb_direction])
+        move = live_bombs & (bomb_direction != 0) & valid & \
+               ~blocks_movement(board[bomb_games, next_rows, next_cols])
+        desired_bombs[move, 0] = next_rows[move]
+        desired_bombs[move, 1] = next_cols[move]
+
+        # Position switches:
+        # Agent <-> Agent => revert both to previous position.
+        # Bomb <-> Bomb => revert both to previous position.
+        # Agent <-> Bomb => revert Bomb to previous position.
+        # A border between two cells is indexed by its axis and the cell with
+        # the smaller coordinates. Agents are registered with their number,
+        # bombs with num_agents plus their number.
+        crossings = np.full((num_games, 2 * board_size * board_size), -1,
+                            dtype=np.int64)
+
+        def border(current, desired):
+            '''Returns the index of the border crossed by a move'''
+            vertical = current[:, 0] != desired[:, 0]
+            rows = np.minimum(current[:, 0], desired[:, 0])
+            cols = np.minimum(current[:, 1], desired[:, 1])
+            return np.where(vertical, 0, board_size * board_size) + \
+                   rows * board_size + cols
+
+        for num_agent in range(num_agents):
+            current = position[:, num_agent]
+            moved = alive[:, num_agent] & \
+                    (desired[:, num_agent] != current).any(1)
+            index = border(current, desired[:, num_agent])
+            other = crossings[games, index]
+            crossed = moved & (other >= 0)
+            # Crossed another agent - revert both to prior positions.
+            desired[crossed, num_agent] = current[crossed]
+            desired[games[crossed], other[crossed]] = \
+                position[games[crossed], other[crossed]]
+            registered = moved & ~crossed
+            crossings[games[registered], index[registered]] = num_agent
+
+        for num_bomb in range(num_bombs):
+            current = bomb_position[:, num_bomb]
+            moved = live_bombs[:, num_bomb] & \
+                    (desired_bombs[:, num_bomb] != current).any(1)
+            index = border(current, desired_bombs[:, num_bomb])
+            other = crossings[games, index]
+            crossed = moved & (other >= 0)
+            desired_bombs[crossed, num_bomb] = current[crossed]
+            # Crossed bomb - revert that to prior position as well.
+            crossed_bomb = crossed & (other >= num_agents)
+            other_games = games[crossed_bomb]
+            other_bombs = other[crossed_bomb] - num_agents
+            desired_bombs[other_games, other_bombs] = \
+                bomb_position[other_games, other_bombs]
+            registered = moved & ~crossed
+            crossings[games[registered], index[registered]] = \
+                num_agents + num_bomb
+
+        # Deal with multiple agents or multiple bomb collisions on desired next
+        # position by resetting desired position to current position for
+        # everyone involved in the collision.
+        agent_occupancy = np.zeros_like(board, dtype=np.int64)
+        bomb_occupancy = np.zeros_like(board, dtype=np.int64)
+        agent_games, agent_nums = np.nonzero(alive)
+        np.add.at(agent_occupancy,
+                  (agent_games, desired[agent_games, agent_nums, 0],
+                   desired[agent_games, agent_nums, 1]), 1)
+        np.add.at(bomb_occupancy,
+                  (bomb_games[live_bombs], desired_bombs[live_bombs][:, 0],
+                   desired_bombs[live_bombs][:, 1]), 1)
+
+        def occupancy(grid, positions):
+            '''Looks up an occupancy grid for one position per game'''
+            return grid[games, positions[:, 0], positions[:, 1]]
+
+        def occupy(grid, mask, positions):
+            '''Increments an occupancy grid where mask is set'''
+            grid[games[mask], positions[mask, 0], positions[mask, 1]] += 1
+
+        # Resolve >=2 agents or >=2 bombs trying to occupy the same space.
+        # Every game keeps iterating until a pass leaves it unchanged.
+        change = np.ones(num_games, dtype=bool)
+        while change.any():
+            active = change
+            change = np.zeros(num_games, dtype=bool)
+            for num_agent in range(num_agents):
+                desired_position = desired[:, num_agent]
+                curr_position = position[:, num_agent]
+                revert = active & alive[:, num_agent] & \
+                         (desired_position != curr_position).any(1) & (
+                             (occupancy(agent_occupancy, desired_position) > 1) |
+                             (occupancy(bomb_occupancy, desired_position) > 1))
+                desired[revert, num_agent] = curr_position[revert]
+                occupy(agent_occupancy, revert, curr_position)
+                change |= revert
+
+            for num_bomb in range(num_bombs):
+                desired_position = desired_bombs[:, num_bomb]
+                curr_position = bomb_position[:, num_bomb]
+                revert = active & live_bombs[:, num_bomb] & \
+                         (desired_position != curr_position).any(1) & (
+                             (occupancy(bomb_occupancy, desired_position) > 1) |
+                             (occupancy(agent_occupancy, desired_position) > 1))
+                desired_bombs[revert, num_bomb] = curr_position[revert]
+                occupy(bomb_occupancy, revert, curr_position)
+                change |= revert
+
+        # Handle kicks.
+        agent_indexed_by_kicked_bomb = np.full((num_games, num_bombs), -1,
+                                               dtype=np.int64)
+        kicked_bomb_indexed_by_agent = np.full((num_games, num_agents), -1,
+                                               dtype=np.int64)
+        delayed_bombs = np.zeros((num_games, num_bombs), dtype=bool)
+        delayed_bomb_positions = bomb_position.copy()
+        delayed_agents = np.zeros((num_games, num_agents), dtype=np.int64)
+
+        # Loop through all bombs to see if they need a good kicking or cause
+        # collisions with an agent.
+        for num_bomb in range(num_bombs):
+            desired_position = desired_bombs[:, num_bomb]
+            curr_position = bomb_position[:, num_bomb]
+
+            # The alive agent (if any) that wants to be where the bomb goes.
+            agent_list = alive & (desired == desired_position[:, None]).all(2)
+            involved = live_bombs[:, num_bomb] & agent_list.any(1) & \
+                       (occupancy(agent_occupancy, desired_position) != 0)
+            num_agent = agent_list.argmax(1)
+            agent_position = position[games, num_agent]
+
+            # Agent did not move. If the bomb moved, it reverts and stops.
+            stayed = involved & (desired_position == agent_position).all(1)
+            delayed_bombs[stayed & (desired_position != curr_position).any(1),
+                          num_bomb] = True
+
+            # Agent moved and can kick - see if the target for the kick never
+            # had anything on it.
+            moved = involved & ~stayed
+            direction = actions[games, num_agent]
+            valid, target_rows, target_cols = on_board(
+                desired_position[:, 0] + ROW_OFFSETS[direction],
+                desired_position[:, 1] + COL_OFFSETS[direction])
+            kicked = moved & state.agent_can_kick[games, num_agent] & valid & \
+                     (agent_occupancy[games, target_rows, target_cols] == 0) & \
+                     (bomb_occupancy[games, target_rows, target_cols] == 0) & \
+                     ~blocks_movement(board[games, target_rows, target_cols])
+
+            # The agent stays on the bomb's square, so clear its bomb count.
+            bomb_occupancy[games[kicked], desired_position[kicked, 0],
+                           desired_position[kicked, 1]] = 0
+            delayed_bombs[kicked, num_bomb] = True
+            delayed_bomb_positions[kicked, num_bomb, 0] = target_rows[kicked]
+            delayed_bomb_positions[kicked, num_bomb, 1] = target_cols[kicked]
+            agent_indexed_by_kicked_bomb[kicked, num_bomb] = num_agent[kicked]
+            kicked_bomb_indexed_by_agent[games[kicked],
+                                         num_agent[kicked]] = num_bomb
+            state.bomb_direction[kicked, num_bomb] = direction[kicked]
+
+            # Either the agent can't kick or the kick is blocked. The agent and
+            # the bomb both stay where they are.
+            blocked = moved & ~kicked
+            delayed_bombs[blocked, num_bomb] = True
+            delayed_agents[games[blocked], num_agent[blocked]] += 1
+
+        for num_bomb in range(num_bombs):
+            delayed = delayed_bombs[:, num_bomb]
+            desired_bombs[delayed, num_bomb] = \
+                delayed_bomb_positions[delayed, num_bomb]
+            occupy(bomb_occupancy, delayed, desired_bombs[:, num_bomb])
+
+        for num_agent in range(num_agents):
+            count = delayed_agents[:, num_agent]
+            delayed = count > 0
+            desired[delayed, num_agent] = position[delayed, num_agent]
+            agent_occupancy[games[delayed], position[delayed, num_agent, 0],
+                            position[delayed, num_agent, 1]] += count[delayed]
+
+        change = delayed_bombs.any(1) | (delayed_agents > 0).any(1)
+        while change.any():
+            active = change
+            change = np.zeros(num_games, dtype=bool)
+            for num_agent in range(num_agents):
+                desired_position = desired[:, num_agent]
+                curr_position = position[:, num_agent]
+                # Agents and bombs can only share a square if they are both in
+                # their original position (Agent dropped bomb and has not
+                # moved).
+                revert = active & alive[:, num_agent] & \
+                         (desired_position != curr_position).any(1) & (
+                             (occupancy(agent_occupancy, desired_position) > 1) |
+                             (occupancy(bomb_occupancy, desired_position) != 0))
+                # Late collisions resulting from failed kicks force this agent
+                # to stay at the original position. Undo its kick, if any.
+                num_bomb = kicked_bomb_indexed_by_agent[:, num_agent]
+                undo = revert & (num_bomb >= 0)
+                undo_games = games[undo]
+                undo_bombs = num_bomb[undo]
+                undo_positions = bomb_position[undo_games, undo_bombs]
+                desired_bombs[undo_games, undo_bombs] = undo_positions
+                bomb_occupancy[undo_games, undo_positions[:, 0],
+                               undo_positions[:, 1]] += 1
+                agent_indexed_by_kicked_bomb[undo_games, undo_bombs] = -1
+                kicked_bomb_indexed_by_agent[undo, num_agent] = -1
+
+                desired[revert, num_agent] = curr_position[revert]
+                occupy(agent_occupancy, revert, curr_position)
+                change |= revert
+
+            for num_bomb in range(num_bombs):
+                desired_position = desired_bombs[:, num_bomb]
+                curr_position = bomb_position[:, num_bomb]
+                num_agent = agent_indexed_by_kicked_bomb[:, num_bomb]
+                # This bomb may be a boomerang, i.e. it was kicked back to the
+                # original location it moved from. If it is blocked now, it
+                # can't be kicked and the agent needs to move back to stay
+                # consistent with other movements.
+                revert = active & live_bombs[:, num_bomb] & (
+                    (desired_position != curr_position).any(1) |
+                    (num_agent >= 0)) & (
+                        (occupancy(bomb_occupancy, desired_position) > 1) |
+                        (occupancy(agent_occupancy, desired_position) != 0))
+                desired_bombs[revert, num_bomb] = curr_position[revert]
+                occupy(bomb_occupancy, revert, curr_position)
+
+                undo = revert & (num_agent >= 0)
+                undo_games = games[undo]
+                undo_agents = num_agent[undo]
+                undo_positions = position[undo_games, undo_agents]
+                desired[undo_games, undo_agents] = undo_positions
+                agent_occupancy[undo_games, undo_positions[:, 0],
+                                undo_positions[:, 1]] += 1
+                kicked_bomb_indexed_by_agent[undo_games, undo_agents] = -1
+                agent_indexed_by_kicked_bomb[undo, num_bomb] = -1
+                change |= revert
+
+        # Bombs that were not kicked this turn and stay where they are stop,
+        # just in case they were moving before. The others move.
+        stopped = live_bombs & (desired_bombs == bomb_position).all(2) & \
+                  (agent_indexed_by_kicked_bomb < 0)
+        bomb_direction[stopped] = 0
+        bomb_position[live_bombs & ~stopped] = \
+            desired_bombs[live_bombs & ~stopped]
+
+        # Move the agents and let them pick up powerups.
+        moved = alive & (desired != position).any(2)
+        position[moved] = desired[moved]
+        moved_games, moved_agents = np.nonzero(moved)
+        cells = board[moved_games, position[moved_games, moved_agents, 0],
+                      position[moved_games, moved_agents, 1]]
+        extra_bomb = (moved_games[cells == _EXTRA_BOMB],
+                      moved_agents[cells == _EXTRA_BOMB])
+        state.agent_ammo[extra_bomb] = np.minimum(
+            state.agent_ammo[extra_bomb] + 1, MAX_AMMO)
+        incr_range = (moved_games[cells == _INCR_RANGE],
+                      moved_agents[cells == _INCR_RANGE])
+        state.agent_blast_strength[incr_range] = np.minimum(
+            state.agent_blast_strength[incr_range] + 1, max_blast_strength)
+        state.agent_can_kick[moved_games[cells == _KICK],
+                             moved_agents[cells == _KICK]] = True
+
+        # Explode bombs.
+        bomb_life = state.bomb_life[:, :num_bombs]
+        bomb_life[live_bombs] -= 1
+        on_flames = board[bomb_games, bomb_position[..., 0],
+                          bomb_position[..., 1]] == _FLAMES
+        bomb_life[live_bombs & (bomb_life != 0) & on_flames] = 0
+
+        # Chain the explosions.
+        exploded = np.zeros_like(live_bombs)
+        exploded[live_bombs], exploded_map = explosions.resolve(
+            board, bomb_games[live_bombs], bomb_position[live_bombs],
+            state.bomb_blast_strength[:, :num_bombs][live_bombs],
+            bomb_life[live_bombs] == 0)
+        bombers = np.zeros_like(state.agent_ammo)
+        np.add.at(bombers, (bomb_games[exploded],
+                            state.bomb_bomber[:, :num_bombs][exploded]), 1)
+        state.agent_ammo[:] = np.where(
+            bombers > 0, np.minimum(state.agent_ammo + bombers, MAX_AMMO),
+            state.agent_ammo)
+
+        BatchedForwardModel._remove_bombs(state, exploded, num_bombs)
+
+        # Update the board's bombs.
+        num_bombs = int(state.num_bombs.max())
+        live_bombs = np.arange(num_bombs) < state.num_bombs[:, None]
+        bomb_position = state.bomb_position[:, :num_bombs][live_bombs]
+        board[np.nonzero(live_bombs)[0], bomb_position[:, 0],
+              bomb_position[:, 1]] = _BOMB
+
+        # Update the board's flames.
+        state.flames[exploded_map] |= 1 << FLAME_LIFE
+        board[state.flames != 0] = _FLAMES
+
+        # Kill agents on flames. Otherwise, update position on the board.
+        agent_games, agent_nums = np.nonzero(alive)
+        rows = position[agent_games, agent_nums, 0]
+        cols = position[agent_games, agent_nums, 1]
+        burnt = board[agent_games, rows, cols] == _FLAMES
+        state.agent_alive[agent_games[burnt], agent_nums[burnt]] = False
+        board[agent_games[~burnt], rows[~burnt], cols[~burnt]] = \
+            _AGENT0 + agent_nums[~burnt]
+
+        return state
+
+    @staticmethod
+    def _lay_bombs(state, lay, num_agent):
+        '''Lays a bomb for num_agent in the games where lay is set'''
+        num_bombs = state.num_bombs
+        position = state.agent_position[:, num_agent]
+        slots = np.arange(state.max_bombs)
+        on_bomb = ((state.bomb_position == position[:, None]).all(2) &
+                   (slots < num_bombs[:, None])).any(1)
+        lay = lay & ~on_bomb & (state.agent_ammo[:, num_agent] > 0)
+
+        games = np.nonzero(lay)[0]
+        index = num_bombs[games]
+        state.agent_ammo[games, num_agent] -= 1
+        state.bomb_position[games, index] = position[games]
+        state.bomb_life[games, index] = constants.DEFAULT_BOMB_LIFE + 1
+        state.bomb_blast_strength[games, index] = \
+            state.agent_blast_strength[games, num_agent]
+        state.bomb_bomber[games, index] = num_agent
+        state.bomb_direction[games, index] = 0
+        num_bombs[games] += 1
+
+    @staticmethod
+    def _remove_bombs(state, removed, num_bombs):
+        '''Drops the removed bombs, keeping the others in order'''
+        if not removed.any():
+            return
+        keep = (np.arange(num_bombs) < state.num_bombs[:, None]) & ~removed
+        order = np.argsort(~keep, axis=1, kind='stable')
+        for array in (state.bomb_position, state.bomb_life,
+                      state.bomb_blast_strength, state.bomb_bomber,
+                      state.bomb_direction):
+            view = array[:, :num_bombs]
+            if array.ndim == 3:
+                view[:] = np.take_along_axis(view, order[..., None], 1)
+            else:
+                view[:] = np.take_along_axis(view, order, 1)
+        state.num_bombs[:] = keep.sum(1)
@@ -0,0 +1,107 @@
+'''What each agent remembers of the fogged parts of the board.
+
+In partially observable games an agent only sees the cells around it. A
+BeliefTracker keeps, for every agent, what it saw of each cell the last
+time it was in view, and updates all agents at once from the fogged
+observations of a step. It only uses what the agents saw, so no hidden
+information leaks into the beliefs.
+
+The env adds these keys to the observations when made with
+track_beliefs=True:
+
+  belief_board                The board as last seen. Cells never seen are
+                              fog. Bombs that must have gone off since are
+                              shown as passages.
+  belief_age                  Steps since each cell was last seen, -1 if it
+                              never was.
+  belief_bomb_life            The bomb_life seen, counted down while the
+                              cell is out of view.
+  belief_bomb_blast_strength  The bomb_blast_strength seen, kept until the
+                              bomb's life runs out.
+  belief_items                The power-ups seen on the board.
+'''
+import numpy as np
+
+from . import constants
+
+_FOG = constants.Item.Fog.value
+_BOMB = constants.Item.Bomb.value
+_PASSAGE = constants.Item.Passage.value
+# The power-ups are the items from ExtraBomb to Kick.
+_FIRST_POWERUP = constants.Item.ExtraBomb.value
+_LAST_POWERUP = constants.Item.Kick.value
+
+
+def _read_only(array):
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class BeliefTracker(object):
+    """Belief maps of every agent, stacked along the first axis."""
+
+    KEYS = ('belief_board', 'belief_age', 'belief_bomb_life',
+            'belief_bomb_blast_strength', 'belief_items')
+
+    def __init__(self, board_size, num_agents):
+        self.board_size = board_size
+        self.num_agents = num_agents
+        shape = (num_agents, board_size, board_size)
+        self.maps = {
+            'belief_board': np.empty(shape, dtype=np.uint8),
+            'belief_age': np.empty(shape, dtype=np.int64),
+            'belief_bomb_life': np.empty(shape),
+            'belief_bomb_blast_strength': np.empty(shape),
+            'belief_items': np.empty(shape, dtype=np.uint8),
+        }
+        self.reset()
+
+    def reset(self):
+        '''Forgets everything, e.g. at the start of a game'''
+        self.maps['belief_board'][:] = _FOG
+        self.maps['belief_age'][:] = -1
+        for key in ['belief_bomb_life', 'belief_bomb_blast_strength',
+                    'belief_items']:
+            self.maps[key][:] = 0
+
+    def update(self, observations, copy=True):
+        '''Updates the beliefs with a step's observations and adds them.
+
+        Args:
+          observations: The observations of all agents, ordered by agent id.
+            The belief keys are added to them.
+          copy: Whether to add fresh arrays or read-only views of the maps
+            that the next update overwrites.
+        '''
+        board = np.stack([obs['board'] for obs in observations])
+        bomb_life = np.stack([obs['bomb_life'] for obs in observations])
+        blast_strength = np.stack(
+            [obs['bomb_blast_strength'] for obs in observations])
+        visible = board != _FOG
+        maps = self.maps
+
+        age = maps['belief_age']
+        age[age >= 0] += 1
+        age[visible] = 0
+
+        # Bombs out of view tick down like they would in the game.
+        life = maps['belief_bomb_life']
+        np.subtract(life, 1, out=life, where=life > 0)
+        gone = (life <= 0) & (maps['belief_bomb_blast_strength'] > 0)
+        maps['belief_bomb_blast_strength'][gone] = 0
+        maps['belief_board'][gone & (maps['belief_board'] == _BOMB)] = \
+            _PASSAGE
+
+        np.copyto(maps['belief_board'], board, where=visible)
+        np.copyto(life, bomb_life, where=visible)
+        np.copyto(maps['belief_bomb_blast_strength'], blast_strength,
+                  where=visible)
+        is_powerup = (board >= _FIRST_POWERUP) & (board <= _LAST_POWERUP)
+        np.copyto(maps['belief_items'], board, where=visible & is_powerup)
+        maps['belief_items'][visible & ~is_powerup] = 0
+
+        for num_agent, obs in enumerate(observations):
+            for key in self.KEYS:
+                array = maps[key][num_agent]
+                obs[key] = array.copy() if copy else _read_only(array)
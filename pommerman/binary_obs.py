@@ -0,0 +1,90 @@
+'''A compact binary encoding of observations for remote agents.
+
+DockerAgent and HttpAgent send observations as JSON by default, which turns
+every map into a list of floats that the DockerAgentRunner parses back into
+arrays. With binary_obs=True they send this encoding instead:
+
+  MAGIC, a version byte and the length of the header as a uint32
+  a JSON header with the other observation keys, the action space and the
+    dtype and shape of each array
+  the raw bytes of each array, one after the other
+
+Maps whose values are small whole numbers, like bomb_life, go over the wire
+as uint8 and are cast back to their dtype. Other arrays, like the board, are
+decoded as read-only views of the payload without copying.
+'''
+import json
+import struct
+
+import numpy as np
+
+from . import utility
+
+CONTENT_TYPE = 'application/x-pommerman-obs'
+MAGIC = b'PMOB'
+VERSION = 1
+
+_PREFIX = struct.Struct('<4sBI')
+
+
+def _narrow(array):
+    '''Returns array as uint8 if that holds its values exactly'''
+    if array.dtype != np.uint8 and array.dtype.kind in 'iuf':
+        narrow = array.astype(np.uint8)
+        if np.array_equal(narrow, array):
+            return narrow
+    return array
+
+
+def encode(obs, action_space=None):
+    '''Returns the binary encoding of an observation and an action space'''
+    fields = {}
+    arrays = []
+    chunks = []
+    for key, value in obs.items():
+        if isinstance(value, np.ndarray):
+            wire = _narrow(value)
+            arrays.append(
+                [key, wire.dtype.str, value.dtype.str, list(value.shape)])
+            chunks.append(wire.tobytes())
+        else:
+            fields[key] = value
+    header = json.dumps(
+        {
+            'fields': fields,
+            'arrays': arrays,
+            'action_space': action_space
+        },
+        cls=utility.PommermanJSONEncoder).encode('utf-8')
+    return b''.join([_PREFIX.pack(MAGIC, VERSION, len(header)), header] +
+                    chunks)
+
+
+def decode(payload):
+    '''Decodes a payload made by encode.
+
+    Returns:
+      The observation and the action space, both as JSON decoded them, so
+      Items are their values. Arrays are read-only.
+    '''
+    magic, version, header_length = _PREFIX.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a version %d pommerman observation' % VERSION)
+    offset = _PREFIX.size
+    header = json.loads(
+        bytes(payload[offset:offset + header_length]).decode('utf-8'))
+    offset += header_length
+
+    obs = header['fields']
+    for key, wire_dtype, dtype, shape in header['arrays']:
+        wire_dtype = np.dtype(wire_dtype)
+        count = int(np.prod(shape))
+        array = np.frombuffer(
+            payload, dtype=wire_dtype, count=count,
+            offset=offset).reshape(shape)
+        offset += count * wire_dtype.itemsize
+        if wire_dtype != np.dtype(dtype):
+            array = array.astype(dtype)
+            array.flags.writeable = False
+        obs[key] = array
+    return obs, header['action_space']
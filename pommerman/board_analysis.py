@@ -0,0 +1,97 @@
+'''Per-step analysis of a board that scripted agents share.
+
+Every SimpleAgent used to rebuild the bomb list and redo the same bomb range
+and passability checks on the board of its observation. BoardAnalysis does
+this once for a board and analyze hands the same analysis to every agent
+whose observation shows the same board, bombs and bomb lives. In fully
+observable games that is all agents of a step. With fog the views differ,
+so each agent gets its own and nothing out of view leaks into its choices.
+
+The arrays of an analysis are shared and read-only.
+'''
+import numpy as np
+
+from . import constants
+
+# The items an agent can walk onto, indexed by value.
+PASSABLE = np.zeros(len(constants.Item), dtype=bool)
+PASSABLE[[
+    constants.Item.Passage.value, constants.Item.ExtraBomb.value,
+    constants.Item.IncrRange.value, constants.Item.Kick.value,
+    constants.Item.Agent0.value, constants.Item.Agent1.value,
+    constants.Item.Agent2.value, constants.Item.Agent3.value
+]] = True
+
+# Enough for the views of all agents of a step.
+_CACHE_SIZE = 8
+_cache = {}
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+class BoardAnalysis(object):
+    """Bombs, blast coverage, danger timers and passability of a board.
+
+    Attributes:
+      bombs: A dict with the position and blast_strength of each bomb, in
+        row-major order.
+      danger: The fewest steps until a bomb whose blast covers a cell goes
+        off, np.inf where none does. Blasts are taken to reach blast_strength
+        cells along the bomb's row and column, walls or not.
+      blast_coverage: Where danger is finite.
+    """
+
+    def __init__(self, board, bomb_blast_strength, bomb_life):
+        self.board = board
+        rows, cols = np.nonzero(bomb_blast_strength > 0)
+        strengths = bomb_blast_strength[rows, cols].astype(int).tolist()
+        lives = bomb_life[rows, cols].tolist()
+        positions = list(zip(rows.tolist(), cols.tolist()))
+        self.bombs = [{
+            'position': position,
+            'blast_strength': strength
+        } for position, strength in zip(positions, strengths)]
+
+        danger = np.full(board.shape, np.inf)
+        for (row, col), strength, life in zip(positions, strengths, lives):
+            horizontal = danger[row, max(0, col - strength):col + strength + 1]
+            np.minimum(horizontal, life, out=horizontal)
+            vertical = danger[max(0, row - strength):row + strength + 1, col]
+            np.minimum(vertical, life, out=vertical)
+        self.danger = _read_only(danger)
+        self.blast_coverage = _read_only(np.isfinite(danger))
+        self._passable = {}
+
+    def passable(self, enemies):
+        '''Where an agent with these enemies can walk, as a bool array'''
+        key = tuple(enemy.value for enemy in enemies)
+        ret = self._passable.get(key)
+        if ret is None:
+            items = PASSABLE.copy()
+            items[list(key)] = False
+            ret = _read_only(items[self.board])
+            self._passable[key] = ret
+        return ret
+
+
+def analyze(obs):
+    '''Returns the BoardAnalysis of an observation.
+
+    Observations with the same board, bomb_blast_strength and bomb_life share
+    an analysis, so it is made once a step for all agents that see the same.
+    '''
+    board = np.asarray(obs['board'])
+    bomb_blast_strength = np.asarray(obs['bomb_blast_strength'])
+    bomb_life = np.asarray(obs['bomb_life'])
+    key = (board.shape, board.tobytes(), bomb_blast_strength.tobytes(),
+           bomb_life.tobytes())
+    analysis = _cache.get(key)
+    if analysis is None:
+        analysis = BoardAnalysis(board.copy(), bomb_blast_strength, bomb_life)
+        if len(_cache) >= _CACHE_SIZE:
+            _cache.clear()
+        _cache[key] = analysis
+    return analysis
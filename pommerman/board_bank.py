@@ -0,0 +1,122 @@
+'''A bank of pre-generated boards and items for instant resets.
+
+A bank is a .npy file holding an array shaped (num_boards, 2, board_size,
+board_size) of uint8. [i, 0] is the board and [i, 1] the item under every
+cell, 0 where there is none. It is opened memory-mapped, so the processes
+that read the same bank (e.g. the workers of a VecEnv) share one copy of it.
+
+Envs use a bank through the board_bank kwarg:
+
+    env = pommerman.make('PommeFFACompetition-v0', agents,
+                         board_bank='ffa.npy')
+    env.set_board_index(17)  # Play board 17 next, e.g. in an evaluation.
+    obs = env.reset()
+
+Without set_board_index the board is drawn with np.random, so seeding it
+makes the boards reproducible like with utility.make_board.
+
+A bank for a config is made with:
+python -m pommerman board_bank --config=PommeFFACompetition-v0 \
+    --num_boards=100000 --output=ffa.npy
+'''
+import random
+
+import gym
+import numpy as np
+
+from . import constants
+from . import utility
+
+
+def config_settings(config_id):
+    '''Returns the board settings of a config as kwargs of generate'''
+    kwargs = gym.spec(config_id)._kwargs
+    return {
+        'board_size': kwargs['board_size'],
+        'num_rigid': kwargs['num_rigid'],
+        'num_wood': kwargs['num_wood'],
+        'num_items': kwargs['num_items'],
+        'num_agents': 2 if kwargs['game_type'] == constants.GameType.OneVsOne
+                      else 4,
+    }
+
+
+def generate(path,
+             num_boards,
+             board_size,
+             num_rigid,
+             num_wood,
+             num_items,
+             num_agents=4,
+             seed=0):
+    '''Writes a bank of num_boards boards made by utility.make_board.
+
+    The global random and np.random are seeded with seed while making the
+    boards and restored afterwards.
+    '''
+    bank = np.lib.format.open_memmap(
+        path, mode='w+', dtype=np.uint8,
+        shape=(num_boards, 2, board_size, board_size))
+    random_state = random.getstate()
+    np_random_state = np.random.get_state()
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        for num in range(num_boards):
+            board = utility.make_board(board_size, num_rigid, num_wood,
+                                       num_agents)
+            items = utility.make_items(board, num_items)
+            item_grid = np.zeros_like(board)
+            for position, item in items.items():
+                item_grid[position] = item
+            bank[num] = board, item_grid
+    finally:
+        random.setstate(random_state)
+        np.random.set_state(np_random_state)
+    bank.flush()
+    del bank
+    return BoardBank(path)
+
+
+class BoardBank(object):
+    """Reads the boards of a bank file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._bank = np.load(path, mmap_mode='r')
+        assert self._bank.ndim == 4 and self._bank.shape[1] == 2, \
+            '{} is not a board bank'.format(path)
+
+    def __len__(self):
+        return len(self._bank)
+
+    @property
+    def board_size(self):
+        return self._bank.shape[-1]
+
+    @property
+    def num_agents(self):
+        board = self._bank[0, 0]
+        return int(np.count_nonzero(board >= constants.Item.Agent0.value))
+
+    def get(self, index):
+        '''Returns a new (board, items) of the board at index'''
+        board = np.array(self._bank[index, 0])
+        item_grid = self._bank[index, 1]
+        rows, cols = np.nonzero(item_grid)
+        items = dict(
+            zip(zip(rows.tolist(), cols.tolist()),
+                item_grid[rows, cols].tolist()))
+        return board, items
+
+    def sample_index(self):
+        '''Draws the index of a board with np.random'''
+        return np.random.randint(len(self._bank))
+
+    def __getstate__(self):
+        # Processes reopen the file rather than copying the boards.
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
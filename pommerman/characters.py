@@ -9,6 +9,10 @@ from . import utility
 class Bomber(object):
     """Container to keep the agent state."""
 
+    __slots__ = ('_game_type', 'ammo', 'is_alive', 'blast_strength',
+                 'can_kick', 'agent_id', 'teammate', 'enemies',
+                 'start_position', 'position')
+
     def __init__(self, agent_id=None, game_type=None):
         self._game_type = game_type
         self.ammo = 1
@@ -104,6 +108,9 @@ class Bomber(object):
 class Bomb(object):
     """Container for the Bomb object."""
 
+    __slots__ = ('bomber', 'position', 'life', 'blast_strength',
+                 'moving_direction')
+
     def __init__(self,
                  bomber,
                  position,
@@ -164,6 +171,8 @@ class Bomb(object):
 class Flame(object):
     """Container for Flame object."""
 
+    __slots__ = ('position', 'life')
+
     def __init__(self, position, life=2):
         self.position = position
         self.life = life
@@ -1,2 +1,4 @@
 '''CLI module entry point'''
+from . import make_board_bank
 from . import run_battle
+from . import tournament
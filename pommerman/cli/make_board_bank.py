@@ -0,0 +1,39 @@
+"""Makes a bank of boards for a config, see pommerman.board_bank.
+
+An example making 100000 boards of the FFA competition config:
+python -m pommerman board_bank --config=PommeFFACompetition-v0 \
+    --num_boards=100000 --output=ffa.npy
+"""
+import argparse
+import time
+
+from .. import board_bank
+
+
+def main():
+    '''CLI entry point that makes a board bank'''
+    parser = argparse.ArgumentParser(description='Makes a board bank.')
+    parser.add_argument(
+        '--config',
+        default='PommeFFACompetition-v0',
+        help='Configuration whose boards to make. See env_ids in '
+        'configs.py for options.')
+    parser.add_argument(
+        '--num_boards',
+        default=10000,
+        type=int,
+        help='The number of boards in the bank.')
+    parser.add_argument(
+        '--seed', default=0, type=int, help='Seed of the boards.')
+    parser.add_argument(
+        '--output', required=True, help='The .npy file to write.')
+    args = parser.parse_args()
+
+    start = time.time()
+    bank = board_bank.generate(args.output, args.num_boards, seed=args.seed,
+                               **board_bank.config_settings(args.config))
+    print('Made %d boards in %.1fs' % (len(bank), time.time() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,7 @@ import numpy as np
 
 from .. import helpers
 from .. import make
+from .. import profiling
 from pommerman import utility
 
 
@@ -32,6 +33,7 @@ def run(args, num_times=1, seed=None):
     config = args.config
     record_pngs_dir = args.record_pngs_dir
     record_json_dir = args.record_json_dir
+    record_replay_dir = args.record_replay_dir
     agent_env_vars = args.agent_env_vars
     game_state_file = args.game_state_file
     render_mode = args.render_mode
@@ -42,17 +44,28 @@ def run(args, num_times=1, seed=None):
         for agent_id, agent_string in enumerate(args.agents.split(','))
     ]
 
-    env = make(config, agents, game_state_file, render_mode=render_mode)
+    env_kwargs = {}
+    if args.act_deadline is not None:
+        env_kwargs['act_deadline'] = args.act_deadline
+    env = make(config, agents, game_state_file, render_mode=render_mode,
+               **env_kwargs)
 
-    def _run(record_pngs_dir=None, record_json_dir=None):
+    def _run(record_pngs_dir=None, record_json_dir=None,
+             record_replay_dir=None):
         '''Runs a game'''
         print("Starting the Game.")
         if record_pngs_dir and not os.path.isdir(record_pngs_dir):
             os.makedirs(record_pngs_dir)
         if record_json_dir and not os.path.isdir(record_json_dir):
             os.makedirs(record_json_dir)
+        if record_replay_dir and not os.path.isdir(record_replay_dir):
+            os.makedirs(record_replay_dir)
 
         obs = env.reset()
+        if record_replay_dir:
+            env.record_replay(
+                os.path.join(record_replay_dir, 'replay.npz'),
+                keyframe_interval=args.replay_keyframe_interval)
         done = False
 
         while not done:
@@ -96,6 +109,9 @@ def run(args, num_times=1, seed=None):
     random.seed(seed)
     env.seed(seed)
 
+    if args.profile or args.profile_trace:
+        profiling.enable(trace=bool(args.profile_trace))
+
     infos = []
     times = []
     for i in range(num_times):
@@ -105,11 +121,20 @@ def run(args, num_times=1, seed=None):
                            if record_pngs_dir else None
         record_json_dir_ = record_json_dir + '/%d' % (i+1) \
                            if record_json_dir else None
-        infos.append(_run(record_pngs_dir_, record_json_dir_))
+        record_replay_dir_ = record_replay_dir + '/%d' % (i+1) \
+                             if record_replay_dir else None
+        infos.append(_run(record_pngs_dir_, record_json_dir_,
+                          record_replay_dir_))
 
         times.append(time.time() - start)
         print("Game Time: ", times[-1])
 
+    profiler = profiling.disable()
+    if profiler is not None:
+        print(profiler.summary())
+        if args.profile_trace:
+            profiler.save_chrome_trace(args.profile_trace)
+
     atexit.register(env.close)
     return infos
 
@@ -151,6 +176,32 @@ def main():
         default=None,
         help='Directory to record the JSON representations of '
         "the game. Doesn't record if None.")
+    parser.add_argument(
+        '--record_replay_dir',
+        default=None,
+        help='Directory to record a binary replay of the game to. '
+        'See pommerman.recording. Doesn\'t record if None.')
+    parser.add_argument(
+        '--replay_keyframe_interval',
+        default=None,
+        type=int,
+        help='Store the full state in the replay every this many steps.')
+    parser.add_argument(
+        '--act_deadline',
+        default=None,
+        type=float,
+        help='Ask all agents at once and let those that take longer than '
+        'this many seconds Stop.')
+    parser.add_argument(
+        '--profile',
+        default=False,
+        action='store_true',
+        help='Print the time spent in each phase of the steps.')
+    parser.add_argument(
+        '--profile_trace',
+        default=None,
+        help='File to write a Chrome trace of the step phases to. '
+        'Implies --profile.')
     parser.add_argument(
         "--render",
         default=False,
@@ -0,0 +1,321 @@
+"""Run a headless tournament among a pool of agents.
+
+Each agent spec in the pool is an entry in the tournament. Games are played
+between sides: in FFA every agent is its own side, in team games both agents
+of a side come from the same entry and in OneVsOne there are two sides of
+one agent. The games of each round are played in parallel across a process
+pool, each result is recorded as one row and the ratings are updated after
+every game.
+
+A round robin among four SimpleAgents and two RandomAgents in FFA:
+python -m pommerman.cli.tournament --agents=test::agents.SimpleAgent,test::agents.SimpleAgent,test::agents.SimpleAgent,test::agents.SimpleAgent,random::null,random::null
+
+Five Swiss rounds of team games, with the results written to a CSV file:
+python -m pommerman.cli.tournament --config=PommeTeamCompetition-v0 --format=swiss --rounds=5 --agents=test::agents.SimpleAgent,random::null,test::agents.SimpleAgent --results_file=results.csv
+
+Docker agents listen on a port derived from their seat, so they can not be
+played in more than one game at a time (use --num_workers=1).
+"""
+import argparse
+import csv
+import itertools
+import multiprocessing
+import random
+import sys
+
+import gym
+import numpy as np
+
+from .. import constants
+from .. import helpers
+from .. import make
+
+RESULT_FIELDS = ['round', 'game', 'seed', 'sides', 'ranks', 'steps']
+
+
+def num_sides(config_id):
+    '''Returns the number of sides that play in a game of config_id'''
+    game_type = gym.spec(config_id)._kwargs['game_type']
+    if game_type == constants.GameType.FFA:
+        return 4
+    return 2
+
+
+def side_seats(side, sides):
+    '''Returns the agent ids that are played by a side'''
+    if sides == 2 and side < 2:
+        # Team games seat teammates at (0, 2) and (1, 3).
+        return [side, side + 2]
+    return [side]
+
+
+def play_game(task):
+    '''Plays one game and returns the rank of every side.
+
+    Args:
+      task: A tuple of (config_id, agent specs of the sides, seed).
+
+    Returns:
+      A tuple of (ranks, steps). Winning sides have rank 0 and the others
+      rank 1. In a tie every side has rank 0.
+    '''
+    config_id, side_specs, seed = task
+    random.seed(seed)
+    np.random.seed(seed)
+
+    sides = len(side_specs)
+    num_agents = 2 if gym.spec(config_id)._kwargs['game_type'] == \
+        constants.GameType.OneVsOne else 4
+    seat_specs = [None] * num_agents
+    for side, spec in enumerate(side_specs):
+        for seat in side_seats(side, sides):
+            if seat < num_agents:
+                seat_specs[seat] = spec
+
+    agents = [
+        helpers.make_agent_from_string(spec, agent_id)
+        for agent_id, spec in enumerate(seat_specs)
+    ]
+    env = make(config_id, agents)
+    env.seed(seed)
+    obs = env.reset()
+    done = False
+    while not done:
+        obs, _, done, info = env.step(env.act(obs))
+    steps = env._step_count
+    env.close()
+
+    if info['result'] == constants.Result.Tie:
+        return [0] * sides, steps
+    winners = set(info['winners'])
+    ranks = [
+        0 if winners.intersection(side_seats(side, sides)) else 1
+        for side in range(sides)
+    ]
+    return ranks, steps
+
+
+class Elo(object):
+    """Elo ratings that handle games of more than two sides.
+
+    A game is scored as every pair of sides having played each other, and the
+    update is divided by the number of opponents.
+    """
+
+    def __init__(self, initial=1200., k_factor=32.):
+        self.initial = initial
+        self.k_factor = k_factor
+        self.ratings = {}
+
+    def get(self, entry):
+        return self.ratings.get(entry, self.initial)
+
+    def update(self, entries, ranks):
+        '''Updates the ratings of the entries of a game with their ranks'''
+        ratings = [self.get(entry) for entry in entries]
+        deltas = [0.] * len(entries)
+        for i, j in itertools.combinations(range(len(entries)), 2):
+            expected = 1. / (1. + 10**((ratings[j] - ratings[i]) / 400.))
+            if ranks[i] < ranks[j]:
+                score = 1.
+            elif ranks[i] > ranks[j]:
+                score = 0.
+            else:
+                score = .5
+            delta = self.k_factor * (score - expected) / (len(entries) - 1)
+            deltas[i] += delta
+            deltas[j] -= delta
+        for entry, rating, delta in zip(entries, ratings, deltas):
+            self.ratings[entry] = rating + delta
+
+    def score(self, entry):
+        '''The value that the entries are ranked by'''
+        return self.get(entry)
+
+
+class TrueSkill(object):
+    '''TrueSkill ratings from the optional trueskill package'''
+
+    def __init__(self):
+        import trueskill
+        self.env = trueskill.TrueSkill(draw_probability=0.2)
+        self.ratings = {}
+
+    def get(self, entry):
+        return self.ratings.get(entry, self.env.create_rating())
+
+    def update(self, entries, ranks):
+        '''Updates the ratings of the entries of a game with their ranks'''
+        groups = [(self.get(entry),) for entry in entries]
+        for entry, (rating,) in zip(entries,
+                                    self.env.rate(groups, ranks=ranks)):
+            self.ratings[entry] = rating
+
+    def score(self, entry):
+        '''The conservative estimate mu - 3 * sigma'''
+        return self.env.expose(self.get(entry))
+
+
+def round_robin_pairings(entries, sides):
+    '''Every combination of sides entries plays once'''
+    return list(itertools.combinations(entries, sides))
+
+
+def swiss_pairings(entries, sides, rating, played):
+    '''Groups entries of similar rating that have not met yet.
+
+    Entries are sorted by rating and each game is filled greedily with the
+    best placed entries that have not played the game's first entry. Entries
+    that are left over sit out the round.
+    '''
+    remaining = sorted(entries, key=lambda entry: -rating.score(entry))
+    games = []
+    while len(remaining) >= sides:
+        game = [remaining.pop(0)]
+        candidates = [entry for entry in remaining
+                      if (game[0], entry) not in played]
+        candidates += [entry for entry in remaining if entry not in candidates]
+        game.extend(candidates[:sides - 1])
+        for entry in game[1:]:
+            remaining.remove(entry)
+        games.append(tuple(game))
+    return games
+
+
+def run(args):
+    '''Plays the tournament and returns the rows and the ratings'''
+    specs = args.agents.split(',')
+    entries = list(range(len(specs)))
+    sides = num_sides(args.config)
+    assert len(entries) >= sides, \
+        'Need at least {} agents for {}'.format(sides, args.config)
+
+    rating = TrueSkill() if args.rating == 'trueskill' else Elo()
+    rounds = 1 if args.format == 'round_robin' else args.rounds
+    seeds = random.Random(args.seed)
+    played = set()
+
+    results_file = open(args.results_file, 'w', newline='') \
+        if args.results_file else None
+    writer = csv.writer(results_file) if results_file else None
+    if writer:
+        writer.writerow(RESULT_FIELDS)
+
+    rows = []
+    pool = multiprocessing.Pool(args.num_workers)
+    try:
+        for num_round in range(rounds):
+            if args.format == 'round_robin':
+                games = round_robin_pairings(entries, sides)
+            else:
+                games = swiss_pairings(entries, sides, rating, played)
+
+            tasks = []
+            for game in games:
+                for num_game in range(args.games_per_match):
+                    # Rotate the seats so no entry keeps a corner.
+                    shift = num_game % sides
+                    game_sides = game[shift:] + game[:shift]
+                    tasks.append((game_sides,
+                                  seeds.randint(0, np.iinfo(np.int32).max)))
+                for first, second in itertools.permutations(game, 2):
+                    played.add((first, second))
+
+            # imap keeps the order of the tasks so the ratings don't depend
+            # on which game happens to finish first.
+            results = pool.imap(
+                play_game,
+                [(args.config, [specs[entry] for entry in game_sides], seed)
+                 for game_sides, seed in tasks])
+            for (game_sides, seed), (ranks, steps) in zip(tasks, results):
+                rating.update(game_sides, ranks)
+                row = [num_round, len(rows), seed,
+                       ' '.join(map(str, game_sides)),
+                       ' '.join(map(str, ranks)), steps]
+                rows.append(row)
+                if writer:
+                    writer.writerow(row)
+                    results_file.flush()
+    finally:
+        pool.close()
+        pool.join()
+        if results_file:
+            results_file.close()
+
+    return rows, rating
+
+
+def print_standings(specs, rows, rating, out=sys.stdout):
+    '''Prints the entries ordered by rating'''
+    wins = [0] * len(specs)
+    games = [0] * len(specs)
+    for row in rows:
+        for entry, rank in zip(row[3].split(), row[4].split()):
+            games[int(entry)] += 1
+            wins[int(entry)] += rank == '0'
+
+    out.write('{:>4} {:>9} {:>6} {:>7}  {}\n'.format(
+        'rank', 'rating', 'games', 'wins', 'agent'))
+    order = sorted(range(len(specs)), key=lambda entry: -rating.score(entry))
+    for place, entry in enumerate(order):
+        out.write('{:>4} {:>9.1f} {:>6} {:>7}  {}:{}\n'.format(
+            place + 1, rating.score(entry), games[entry], wins[entry], entry,
+            specs[entry]))
+
+
+def main():
+    '''CLI entry point to run a tournament'''
+    parser = argparse.ArgumentParser(description='Tournament Flags.')
+    parser.add_argument(
+        '--config',
+        default='PommeFFACompetition-v0',
+        help='Configuration to execute. See env_ids in '
+        'configs.py for options.')
+    parser.add_argument(
+        '--agents',
+        required=True,
+        help='Comma delineated list of the agents in the tournament, in '
+        'the format of make_agent_from_string.')
+    parser.add_argument(
+        '--format',
+        default='round_robin',
+        choices=['round_robin', 'swiss'],
+        help='How the games are paired.')
+    parser.add_argument(
+        '--rounds',
+        default=3,
+        type=int,
+        help='The number of Swiss rounds.')
+    parser.add_argument(
+        '--games_per_match',
+        default=1,
+        type=int,
+        help='How many games each pairing plays, with rotated seats.')
+    parser.add_argument(
+        '--rating',
+        default='elo',
+        choices=['elo', 'trueskill'],
+        help='Rating system. trueskill needs the trueskill package.')
+    parser.add_argument(
+        '--num_workers',
+        default=None,
+        type=int,
+        help='Number of processes that play games. Defaults to the number '
+        'of cpus.')
+    parser.add_argument(
+        '--seed',
+        default=0,
+        type=int,
+        help='Seed from which the seeds of the games are drawn.')
+    parser.add_argument(
+        '--results_file',
+        default=None,
+        help='CSV file to write a row per game to. '
+        "Doesn't record if None.")
+    args = parser.parse_args()
+    rows, rating = run(args)
+    print_standings(args.agents.split(','), rows, rating)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,10 +12,17 @@ from gym import spaces
 from gym.utils import seeding
 import gym
 
+from .. import action_collector
+from .. import belief
+from .. import board_bank
 from .. import characters
 from .. import constants
 from .. import forward_model
+from .. import game_state
 from .. import graphics
+from .. import profiling
+from .. import recording
+from .. import replay
 from .. import utility
 
 
@@ -36,6 +43,11 @@ class Pomme(gym.Env):
                  max_steps=1000,
                  is_partially_observable=False,
                  env=None,
+                 model=None,
+                 copy_observations=True,
+                 board_bank=None,
+                 track_beliefs=False,
+                 act_deadline=None,
                  **kwargs):
         self._render_fps = render_fps
         self._intended_actions = []
@@ -52,7 +64,32 @@ class Pomme(gym.Env):
         self._env = env
 
         self.training_agent = None
-        self.model = forward_model.ForwardModel()
+        # The ForwardModel class used to run the game. This can be set from
+        # the env_kwargs of a config, e.g. to the BatchedForwardModel.
+        self.model = (model or forward_model.ForwardModel)()
+        # With False, the observation arrays are read-only views that the
+        # model overwrites on the next step. Only for agents that don't keep
+        # or modify their observations.
+        self._copy_observations = copy_observations
+        # Boards and items to reset to instead of making new ones. This can
+        # be a board_bank.BoardBank or the path of one, which is opened on
+        # the first reset.
+        self._board_bank = board_bank
+        self._board_index = None
+        self.board_index = None
+        # Adds the belief.BeliefTracker keys to the observations, which is
+        # memory of the fogged cells for partially observable games.
+        self._track_beliefs = track_beliefs
+        self._belief_tracker = None
+        # With a deadline in seconds, act asks all agents at once and agents
+        # that don't answer in time Stop. See action_collector.
+        self.action_collector = None
+        if act_deadline is not None:
+            self.action_collector = action_collector.ActionCollector(
+                act_deadline)
+        self._replay_writer = None
+        self._seed = None
+        self._record = None
 
         # This can be changed through set_render_mode
         # or from the cli tool using '--render_mode=MODE_TYPE'
@@ -131,18 +168,51 @@ class Pomme(gym.Env):
     def make_items(self):
         self._items = utility.make_items(self._board, self._num_items)
 
+    def set_board_index(self, index):
+        """Plays the board at index of the board bank on the next reset.
+
+        Without it, reset draws the board from the bank with np.random. The
+        index of the board being played is in board_index.
+        """
+        assert self._board_bank is not None, 'The env has no board bank'
+        self._board_index = index
+
+    def _take_board(self):
+        '''Sets the board and items to the next board of the bank'''
+        if isinstance(self._board_bank, str):
+            self._board_bank = board_bank.BoardBank(self._board_bank)
+        bank = self._board_bank
+        assert bank.board_size == self._board_size and \
+            bank.num_agents == len(self._agents), \
+            'The boards of {} are not for this env'.format(bank.path)
+        if self._board_index is None:
+            self.board_index = bank.sample_index()
+        else:
+            self.board_index = self._board_index
+            self._board_index = None
+        self._board, self._items = bank.get(self.board_index)
+
     def act(self, obs):
         agents = [agent for agent in self._agents \
                   if agent.agent_id != self.training_agent]
-        return self.model.act(agents, obs, self.action_space)
+        if self.action_collector is None:
+            return self.model.act(agents, obs, self.action_space)
+        return self.model.act(agents, obs, self.action_space,
+                              collector=self.action_collector)
 
     def get_observations(self):
         self.observations = self.model.get_observations(
             self._board, self._agents, self._bombs, self._flames,
             self._is_partially_observable, self._agent_view_size,
-            self._game_type, self._env)
+            self._game_type, self._env, copy=self._copy_observations)
         for obs in self.observations:
             obs['step_count'] = self._step_count
+        if self._track_beliefs:
+            if self._belief_tracker is None:
+                self._belief_tracker = belief.BeliefTracker(
+                    self._board_size, len(self._agents))
+            self._belief_tracker.update(self.observations,
+                                        copy=self._copy_observations)
         return self.observations
 
     def _get_rewards(self):
@@ -157,15 +227,54 @@ class Pomme(gym.Env):
     def _get_info(self, done, rewards):
         return self.model.get_info(done, rewards, self._game_type, self._agents)
 
+    def record_replay(self, path, keyframe_interval=None):
+        """Streams the game into a binary replay file.
+
+        Call this after reset. The file is closed when the game is done, the
+        env is reset or close_replay is called. See recording.ReplayReader
+        for reading it back.
+
+        Args:
+          path: The replay file to write.
+          keyframe_interval: Also store the full state every this many steps
+            so that seeking in the replay is faster.
+        """
+        self.close_replay()
+        header = {
+            'config': self.spec.id if self.spec else None,
+            'game_type': self._game_type.value,
+            'board_size': self._board_size,
+            'max_blast_strength': self._agent_view_size or 10,
+            'agents': [type(agent).__name__ for agent in self._agents],
+            'step_count': self._step_count,
+        }
+        self._replay_writer = recording.ReplayWriter(
+            path, header, self._board, self._agents, self._bombs,
+            self._items, self._flames, keyframe_interval=keyframe_interval)
+
+    def close_replay(self, info=None):
+        if self._replay_writer is not None:
+            self._replay_writer.close(info)
+            self._replay_writer = None
+
+    def _record_keyframe(self):
+        self._replay_writer.write_keyframe(
+            self._replay_writer.num_steps, self._board, self._agents,
+            self._bombs, self._items, self._flames)
+
     def reset(self):
         assert (self._agents is not None)
+        self.close_replay()
 
         if self._init_game_state is not None:
             self.set_json_info()
         else:
             self._step_count = 0
-            self.make_board()
-            self.make_items()
+            if self._board_bank is not None:
+                self._take_board()
+            else:
+                self.make_board()
+                self.make_items()
             self._bombs = []
             self._flames = []
             self._powerups = []
@@ -176,14 +285,69 @@ class Pomme(gym.Env):
                 agent.set_start_position((row, col))
                 agent.reset()
 
+        self._record = self._make_record()
+        if self._belief_tracker is not None:
+            self._belief_tracker.reset()
         return self.get_observations()
 
+    def _make_record(self):
+        '''Starts the replay.GameRecord of a new game'''
+        return replay.GameRecord(
+            replay.state_to_arrays(self._board, self._agents, self._bombs,
+                                   self._items, self._flames),
+            self._game_type,
+            self._agent_view_size or 10,
+            config=self.spec.id if self.spec else None,
+            seed=self._seed,
+            step_count=self._step_count)
+
+    def get_state(self):
+        """Returns a game_state.GameState of the current game.
+
+        It is a snapshot that can be cloned and stepped cheaply, e.g. by
+        agents that search ahead, and restored with set_state.
+        """
+        return game_state.GameState.from_objects(
+            self._board, self._agents, self._bombs, self._items,
+            self._flames, self._game_type, step_count=self._step_count,
+            max_blast_strength=self._agent_view_size or 10)
+
+    def set_state(self, state):
+        """Sets the game to a game_state.GameState, e.g. from get_state.
+
+        The record of get_record starts over from this state, an open replay
+        is closed and the beliefs of track_beliefs are forgotten.
+        """
+        self.close_replay()
+        self._board = state.board.copy()
+        self._items = dict(state.items)
+        self._step_count = state.step_count
+        bombers = [agent._character for agent in self._agents]
+        self._bombs, self._flames = state.unpack_entities(bombers)
+        # The old record's actions led somewhere else, so a new one starts
+        # from the restored state.
+        self._record = self._make_record()
+        self._belief_tracker = None
+
+    def get_record(self):
+        """Returns the replay.GameRecord of the current game.
+
+        It holds the seed, the initial board, items and agents and the
+        actions so far, which is enough to rebuild every step with a
+        replay.Replay.
+        """
+        return self._record
+
     def seed(self, seed=None):
         self.np_random, seed = seeding.np_random(seed)
+        self._seed = seed
         return [seed]
 
     def step(self, actions):
         self._intended_actions = actions
+        profiler = profiling.active
+        if profiler is not None:
+            step_start = start = profiler.start()
 
         max_blast_strength = self._agent_view_size or 10
         result = self.model.step(
@@ -196,11 +360,19 @@ class Pomme(gym.Env):
             max_blast_strength=max_blast_strength)
         self._board, self._agents, self._bombs, self._items, self._flames = \
                                                                     result[:5]
+        if profiler is not None:
+            start = profiler.lap('env.step.model', start)
 
         done = self._get_done()
+        if profiler is not None:
+            start = profiler.lap('env.step.done', start)
         obs = self.get_observations()
+        if profiler is not None:
+            start = profiler.lap('env.step.observations', start)
         reward = self._get_rewards()
         info = self._get_info(done, reward)
+        if profiler is not None:
+            start = profiler.lap('env.step.rewards', start)
 
         if done:
             # Callback to let the agents know that the game has ended.
@@ -208,6 +380,19 @@ class Pomme(gym.Env):
                 agent.episode_end(reward[agent.agent_id])
 
         self._step_count += 1
+        if self._record is not None:
+            self._record.add_step(actions)
+            if done:
+                self._record.info = info
+        if self._replay_writer is not None:
+            self._replay_writer.write_step(actions)
+            if done:
+                self.close_replay(info)
+            elif self._replay_writer.keyframe_due():
+                self._record_keyframe()
+        if profiler is not None:
+            profiler.lap('env.step.records', start)
+            profiler.lap('env.step', step_start)
         return obs, reward, done, info
 
     def render(self,
@@ -272,10 +457,14 @@ class Pomme(gym.Env):
             time.sleep(1.0 / self._render_fps)
 
     def close(self):
+        self.close_replay()
         if self._viewer is not None:
             self._viewer.close()
             self._viewer = None
 
+        if self.action_collector is not None:
+            self.action_collector.close()
+
         for agent in self._agents:
             agent.shutdown()
 
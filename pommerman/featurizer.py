@@ -0,0 +1,232 @@
+'''Turns batches of observations into stacked feature planes.
+
+A Featurizer fills a (N, C, H, W) float32 or uint8 array from N
+observations in one pass, one registered feature at a time. A feature
+spec gives the number of channels, the highest value and the function
+that fills those channels for the whole batch.
+
+The registered features are named after the observation keys:
+
+  board                  one plane per constants.Item, 1 where it is.
+  bomb_blast_strength, bomb_life, bomb_moving_direction, flame_life
+                         the map of the observation.
+  position               1 at the agent's position.
+  teammate, enemies      1 where the teammate or an enemy is on the board.
+  ammo, blast_strength, can_kick, step_count
+                         constant planes of the value.
+  message                a constant plane per radio word.
+
+An example:
+
+    featurizer = Featurizer.for_config('PommeTeamCompetition-v0')
+    planes = featurizer.allocate(len(obs))
+    featurizer.featurize(obs, out=planes)
+
+The observations can be a list of the env's observation dicts or a dict of
+arrays stacked along a leading batch axis, like those of a VecEnv with a
+training agent.
+
+More features are added with register.
+'''
+from collections import namedtuple
+from enum import Enum
+
+import gym
+from gym import spaces
+import numpy as np
+
+from . import constants
+
+FeatureSpec = namedtuple('FeatureSpec', ['name', 'num_channels', 'high',
+                                         'fill'])
+
+# The registered FeatureSpecs by name.
+FEATURES = {}
+
+DEFAULT_FEATURES = ('board', 'bomb_blast_strength', 'bomb_life',
+                    'bomb_moving_direction', 'flame_life', 'position',
+                    'teammate', 'enemies', 'ammo', 'blast_strength',
+                    'can_kick')
+
+
+def register(name, num_channels=1, high=1):
+    '''Registers the decorated function as the feature name.
+
+    The function is called with the (N, num_channels, H, W) slice of the
+    output to fill and the _Batch of observations.
+    '''
+    def decorator(fill):
+        FEATURES[name] = FeatureSpec(name, num_channels, high, fill)
+        return fill
+    return decorator
+
+
+class _Batch(object):
+    '''Stacks the observation keys of a batch the first time they are used'''
+
+    def __init__(self, observations):
+        self._observations = observations
+        self._stacked = {}
+        if isinstance(observations, dict):
+            self.size = len(observations['board'])
+        else:
+            self.size = len(observations)
+
+    def __getitem__(self, key):
+        array = self._stacked.get(key)
+        if array is None:
+            if isinstance(self._observations, dict):
+                array = np.asarray(self._observations[key])
+            else:
+                array = _stack([obs[key] for obs in self._observations])
+            self._stacked[key] = array
+        return array
+
+
+def _stack(values):
+    '''Stacks the values of a key, replacing Items with their int values'''
+    first = values[0]
+    if isinstance(first, np.ndarray):
+        return np.stack(values)
+    if isinstance(first, Enum):
+        return np.array([value.value for value in values])
+    if isinstance(first, (list, tuple)) and first and \
+       isinstance(first[0], Enum):
+        return np.array([[item.value for item in value] for value in values])
+    return np.array(values)
+
+
+def _map_plane(key):
+    def fill(out, batch):
+        np.copyto(out[:, 0], batch[key], casting='unsafe')
+    return fill
+
+
+def _constant_planes(key):
+    def fill(out, batch):
+        values = batch[key].reshape(len(out), -1)
+        out[...] = values[:, :, None, None]
+    return fill
+
+
+@register('board', num_channels=len(constants.Item))
+def _board(out, batch):
+    items = np.arange(len(constants.Item))[None, :, None, None]
+    np.equal(batch['board'][:, None], items, out=out, casting='unsafe')
+
+
+register('bomb_blast_strength', high=10)(_map_plane('bomb_blast_strength'))
+register('bomb_life', high=constants.DEFAULT_BOMB_LIFE + 1)(
+    _map_plane('bomb_life'))
+register('bomb_moving_direction', high=4)(_map_plane('bomb_moving_direction'))
+register('flame_life', high=3)(_map_plane('flame_life'))
+
+
+@register('position')
+def _position(out, batch):
+    position = batch['position']
+    out[...] = 0
+    out[np.arange(len(out)), 0, position[:, 0], position[:, 1]] = 1
+
+
+@register('teammate')
+def _teammate(out, batch):
+    np.equal(batch['board'], batch['teammate'][:, None, None],
+             out=out[:, 0], casting='unsafe')
+
+
+@register('enemies')
+def _enemies(out, batch):
+    board = batch['board'][:, None]
+    enemies = batch['enemies'][:, :, None, None]
+    np.copyto(out[:, 0], (board == enemies).any(1), casting='unsafe')
+
+
+register('ammo', high=constants.NUM_ITEMS + 1)(_constant_planes('ammo'))
+register('blast_strength', high=10)(_constant_planes('blast_strength'))
+register('can_kick')(_constant_planes('can_kick'))
+register('step_count', high=constants.MAX_STEPS)(
+    _constant_planes('step_count'))
+register('message', num_channels=constants.RADIO_NUM_WORDS,
+         high=constants.RADIO_VOCAB_SIZE)(_constant_planes('message'))
+
+
+class Featurizer(object):
+    """Fills (N, C, H, W) arrays with the features of observations."""
+
+    def __init__(self, board_size, features=DEFAULT_FEATURES,
+                 dtype=np.float32):
+        '''Makes a Featurizer.
+
+        Args:
+          board_size: The size of the board of the observations.
+          features: The names of the registered features, in the order of
+            their channels.
+          dtype: The dtype of the output, e.g. np.float32 or np.uint8.
+            Values are cast to it, so step_count doesn't fit uint8.
+        '''
+        self.board_size = board_size
+        self.specs = [FEATURES[name] for name in features]
+        self.dtype = np.dtype(dtype)
+        self.num_channels = sum(spec.num_channels for spec in self.specs)
+        self.shape = (self.num_channels, board_size, board_size)
+
+    @classmethod
+    def for_config(cls, config_id, features=None, dtype=np.float32):
+        '''Makes a Featurizer for the observations of a config.
+
+        The default features of radio configs include the message.
+        '''
+        kwargs = gym.spec(config_id)._kwargs
+        if features is None:
+            features = DEFAULT_FEATURES
+            if 'radio_num_words' in kwargs:
+                features += ('message',)
+        return cls(kwargs['board_size'], features, dtype)
+
+    def channels(self):
+        '''Returns the (first channel, num_channels) of each feature by name'''
+        ret = {}
+        channel = 0
+        for spec in self.specs:
+            ret[spec.name] = (channel, spec.num_channels)
+            channel += spec.num_channels
+        return ret
+
+    def observation_space(self):
+        '''Returns the gym Box of a single featurized observation'''
+        high = np.concatenate([
+            np.full(spec.num_channels, spec.high) for spec in self.specs
+        ])
+        high = np.broadcast_to(high[:, None, None], self.shape)
+        return spaces.Box(
+            low=np.zeros(self.shape, dtype=self.dtype),
+            high=high.astype(self.dtype),
+            dtype=self.dtype)
+
+    def allocate(self, batch_size):
+        return np.zeros((batch_size,) + self.shape, dtype=self.dtype)
+
+    def featurize(self, observations, out=None):
+        '''Featurizes a batch of observations.
+
+        Args:
+          observations: A list of observation dicts or a dict of arrays with
+            a leading batch axis.
+          out: The array to fill, e.g. from allocate. Its first N rows are
+            filled. A new one is made if None.
+
+        Returns:
+          The (N, C, H, W) array of features.
+        '''
+        batch = _Batch(observations)
+        if out is None:
+            out = self.allocate(batch.size)
+        out = out[:batch.size]
+        channel = 0
+        for spec in self.specs:
+            spec.fill(out[:, channel:channel + spec.num_channels], batch)
+            channel += spec.num_channels
+        return out
+
+    __call__ = featurize
@@ -5,12 +5,19 @@ import numpy as np
 
 from . import constants
 from . import characters
+from . import explosions
+from . import observation_builder
+from . import profiling
 from . import utility
 
 
 class ForwardModel(object):
     """Class for helping with the [forward] modeling of the game state."""
 
+    def __init__(self):
+        # Created on the first get_observations call.
+        self._observation_builder = None
+
     def run(self,
             num_times,
             board,
@@ -82,7 +89,8 @@ class ForwardModel(object):
         return steps, board, agents, bombs, items, flames, done, info
 
     @staticmethod
-    def act(agents, obs, action_space, is_communicative=False):
+    def act(agents, obs, action_space, is_communicative=False,
+            collector=None):
         """Returns actions for each agent in this list.
 
         Args:
@@ -91,6 +99,9 @@ class ForwardModel(object):
           action_space: The action space for the environment using this model.
           is_communicative: Whether the action depends on communication
             observations as well.
+          collector: An action_collector.ActionCollector to ask the agents
+            at once with, or None to ask them one after the other. Late
+            agents play the action of a dead agent.
 
         Returns a list of actions.
         """
@@ -114,12 +125,32 @@ class ForwardModel(object):
             else:
                 return [constants.Action.Stop.value, 0, 0]
 
+        profiler = profiling.active
+        if collector is not None:
+            def default(_agent):
+                if is_communicative:
+                    return [constants.Action.Stop.value, 0, 0]
+                return constants.Action.Stop.value
+
+            if profiler is not None:
+                start = profiler.start()
+            ret = collector.collect(
+                agents, act_with_communication
+                if is_communicative else act_ex_communication, default)
+            if profiler is not None:
+                profiler.lap('act.collect', start)
+            return ret
+
         ret = []
         for agent in agents:
+            if profiler is not None:
+                start = profiler.start()
             if is_communicative:
                 ret.append(act_with_communication(agent))
             else:
                 ret.append(act_ex_communication(agent))
+            if profiler is not None:
+                profiler.lap('act.agent_%d' % agent.agent_id, start)
         return ret
 
     @staticmethod
@@ -130,7 +161,9 @@ class ForwardModel(object):
              curr_items,
              curr_flames,
              max_blast_strength=10):
-        board_size = len(curr_board)
+        profiler = profiling.active
+        if profiler is not None:
+            start = profiler.start()
 
         # Tick the flames. Replace any dead ones with passages. If there is an
         # item there, then reveal that item.
@@ -155,6 +188,8 @@ class ForwardModel(object):
         # movements and explosions.
         for flame in curr_flames:
             curr_board[flame.position] = constants.Item.Flames.value
+        if profiler is not None:
+            start = profiler.lap('step.flames', start)
 
         # Step the living agents and moving bombs.
         # If two agents try to go to the same spot, they should bounce back to
@@ -169,6 +204,8 @@ class ForwardModel(object):
         # Figure out desired next position for alive agents
         alive_agents = [agent for agent in curr_agents if agent.is_alive]
         desired_agent_positions = [agent.position for agent in alive_agents]
+        # Positions of the bombs, so that looking one up is O(1).
+        bomb_positions = {bomb.position for bomb in curr_bombs}
 
         for num_agent, agent in enumerate(alive_agents):
             position = agent.position
@@ -182,10 +219,11 @@ class ForwardModel(object):
             # line after this has been changed by BramG, 2020-5-18
             elif constants.Action(action) == constants.Action.Bomb:
                 position = agent.position
-                if not utility.position_is_bomb(curr_bombs, position):
+                if position not in bomb_positions:
                     bomb = agent.maybe_lay_bomb()
                     if bomb:
                         curr_bombs.append(bomb)
+                        bomb_positions.add(position)
             elif utility.is_valid_direction(curr_board, position, action):
                 desired_agent_positions[num_agent] = agent.get_next_position(
                     action)
@@ -202,6 +240,8 @@ class ForwardModel(object):
                    and not utility.position_is_powerup(curr_board, desired_position) \
                    and not utility.position_is_wall(curr_board, desired_position):
                     desired_bomb_positions[num_bomb] = desired_position
+        if profiler is not None:
+            start = profiler.lap('step.intents', start)
 
         # Position switches:
         # Agent <-> Agent => revert both to previous position.
@@ -257,9 +297,11 @@ class ForwardModel(object):
             bomb_occupancy[desired_position] += 1
 
         # Resolve >=2 agents or >=2 bombs trying to occupy the same space.
+        collision_iterations = 0
         change = True
         while change:
             change = False
+            collision_iterations += 1
             for num_agent, agent in enumerate(alive_agents):
                 desired_position = desired_agent_positions[num_agent]
                 curr_position = agent.position
@@ -281,6 +323,9 @@ class ForwardModel(object):
                     bomb_occupancy[curr_position] += 1
                     change = True
 
+        if profiler is not None:
+            start = profiler.lap('step.collisions', start)
+
         # Handle kicks.
         agent_indexed_by_kicked_bomb = {}
         kicked_bomb_indexed_by_agent = {}
@@ -360,6 +405,7 @@ class ForwardModel(object):
 
         while change:
             change = False
+            collision_iterations += 1
             for num_agent, agent in enumerate(alive_agents):
                 desired_position = desired_agent_positions[num_agent]
                 curr_position = agent.position
@@ -407,6 +453,10 @@ class ForwardModel(object):
                         del kicked_bomb_indexed_by_agent[num_agent]
                         del agent_indexed_by_kicked_bomb[num_bomb]
                     change = True
+        if profiler is not None:
+            start = profiler.lap('step.kicks', start)
+            profiler.count('step.collision_iterations', collision_iterations)
+            profiler.count('step.kicks', len(kicked_bomb_indexed_by_agent))
 
         for num_bomb, bomb in enumerate(curr_bombs):
             if desired_bomb_positions[num_bomb] == bomb.position and \
@@ -426,6 +476,8 @@ class ForwardModel(object):
                     agent.pick_up(
                         constants.Item(curr_board[agent.position]),
                         max_blast_strength=max_blast_strength)
+        if profiler is not None:
+            start = profiler.lap('step.moves', start)
 
         # Explode bombs.
         exploded_map = np.zeros_like(curr_board)
@@ -440,31 +492,29 @@ class ForwardModel(object):
                 has_new_explosions = True
 
         # Chain the explosions.
-        while has_new_explosions:
+        if has_new_explosions:
+            exploded, exploded_map = explosions.resolve(
+                curr_board[None],
+                np.zeros(len(curr_bombs), dtype=np.int64),
+                np.array([bomb.position for bomb in curr_bombs],
+                         dtype=np.int64),
+                np.array([bomb.blast_strength for bomb in curr_bombs]),
+                [bomb.exploded() for bomb in curr_bombs])
+            exploded_map = exploded_map[0].astype(curr_board.dtype)
+
             next_bombs = []
-            has_new_explosions = False
-            for bomb in curr_bombs:
-                if not bomb.exploded():
+            for bomb, bomb_exploded in zip(curr_bombs, exploded):
+                if bomb_exploded:
+                    bomb.fire()
+                    bomb.bomber.incr_ammo()
+                else:
                     next_bombs.append(bomb)
-                    continue
-
-                bomb.bomber.incr_ammo()
-                for _, indices in bomb.explode().items():
-                    for r, c in indices:
-                        if not all(
-                            [r >= 0, c >= 0, r < board_size, c < board_size]):
-                            break
-                        if curr_board[r][c] == constants.Item.Rigid.value:
-                            break
-                        exploded_map[r][c] = 1
-                        if curr_board[r][c] == constants.Item.Wood.value:
-                            break
-
+            if profiler is not None:
+                profiler.count('step.bombs_exploded',
+                               len(curr_bombs) - len(next_bombs))
             curr_bombs = next_bombs
-            for bomb in curr_bombs:
-                if bomb.in_range(exploded_map):
-                    bomb.fire()
-                    has_new_explosions = True
+        if profiler is not None:
+            start = profiler.lap('step.explosions', start)
 
         # Update the board's bombs.
         for bomb in curr_bombs:
@@ -483,92 +533,97 @@ class ForwardModel(object):
                 agent.die()
             else:
                 curr_board[agent.position] = utility.agent_value(agent.agent_id)
+        if profiler is not None:
+            profiler.lap('step.board', start)
 
         return curr_board, curr_agents, curr_bombs, curr_items, curr_flames
 
+    @staticmethod
+    def collapse_board(ring, curr_board, curr_agents, curr_bombs, curr_items,
+                       curr_flames):
+        """Collapses the board at a certain ring radius.
+
+        For example, if the board is 13x13 and ring is 0, then the the ring of
+        the first row, last row, first column, and last column is all going to
+        be turned into rigid walls. All agents in that ring die and all bombs
+        are removed without detonating.
+
+        For further rings, the values get closer to the center.
+
+        Returns:
+          A tuple of (board, bombs, flames). The board is a new array and
+          curr_items is changed in place.
+        """
+        board = curr_board.copy()
+        board_size = len(board)
+        bomb_positions = {bomb.position for bomb in curr_bombs}
+
+        def collapse(r, c):
+            '''Handles the collapsing of the board. Will
+            kill of remove any item/agent that is on the
+            collapsing tile.'''
+            nonlocal curr_bombs, curr_flames
+            if utility.position_is_agent(board, (r, c)):
+                # Agent. Kill it.
+                num_agent = board[r][c] - constants.Item.Agent0.value
+                agent = curr_agents[num_agent]
+                agent.die()
+            if (r, c) in bomb_positions:
+                # Bomb. Remove the bomb. Update agent's ammo tally.
+                bomb_positions.discard((r, c))
+                new_bombs = []
+                for b in curr_bombs:
+                    if b.position == (r, c):
+                        b.bomber.incr_ammo()
+                    else:
+                        new_bombs.append(b)
+                curr_bombs = new_bombs
+            if utility.position_is_flames(board, (r, c)):
+                curr_flames = [f for f in curr_flames if f.position != (r, c)]
+            if (r, c) in curr_items:
+                # Item. Remove the item.
+                del curr_items[(r, c)]
+            board[r][c] = constants.Item.Rigid.value
+
+        for cell in range(ring, board_size - ring):
+            collapse(ring, cell)
+            if ring != cell:
+                collapse(cell, ring)
+
+            end = board_size - ring - 1
+            collapse(end, cell)
+            if end != cell:
+                collapse(cell, end)
+
+        return board, curr_bombs, curr_flames
+
     def get_observations(self, curr_board, agents, bombs, flames,
                          is_partially_observable, agent_view_size,
-                         game_type, game_env):
+                         game_type, game_env, copy=True):
         """Gets the observations as an np.array of the visible squares.
 
         The agent gets to choose whether it wants to keep the fogged part in
         memory.
-        """
-        board_size = len(curr_board)
-
-        def make_bomb_maps(position):
-            ''' Makes an array of an agents bombs and the bombs attributes '''
-            blast_strengths = np.zeros((board_size, board_size))
-            life = np.zeros((board_size, board_size))
-            moving_direction = np.zeros((board_size, board_size))
-
-            for bomb in bombs:
-                x, y = bomb.position
-                if not is_partially_observable \
-                   or in_view_range(position, x, y):
-                    blast_strengths[(x, y)] = bomb.blast_strength
-                    life[(x, y)] = bomb.life
-                    if bomb.moving_direction is not None:
-                        moving_direction[(x, y)] = bomb.moving_direction.value
-            return blast_strengths, life, moving_direction
-
-        def make_flame_map(position):
-            ''' Makes an array of an agents flame life'''
-            life = np.zeros((board_size, board_size))
-
-            for flame in flames:
-                x, y = flame.position
-                if not is_partially_observable \
-                   or in_view_range(position, x, y):
-                    # +1 needed because flame removal check is done
-                    # before flame is ticked down, i.e. flame life
-                    # in environment is 2 -> 1 -> 0 -> dead
-                    life[(x, y)] = flame.life + 1
-            return life
-
-        def in_view_range(position, v_row, v_col):
-            '''Checks to see if a tile is in an agents viewing area'''
-            row, col = position
-            return all([
-                row >= v_row - agent_view_size, row <= v_row + agent_view_size,
-                col >= v_col - agent_view_size, col <= v_col + agent_view_size
-            ])
-
-        attrs = [
-            'position', 'blast_strength', 'can_kick', 'teammate', 'ammo',
-            'enemies'
-        ]
-        alive_agents = [
-            utility.agent_value(agent.agent_id)
-            for agent in agents
-            if agent.is_alive
-        ]
-
-        observations = []
-        for agent in agents:
-            agent_obs = {'alive': alive_agents}
-            board = curr_board
-            if is_partially_observable:
-                board = board.copy()
-                for row in range(board_size):
-                    for col in range(board_size):
-                        if not in_view_range(agent.position, row, col):
-                            board[row, col] = constants.Item.Fog.value
-            agent_obs['board'] = board
-            bomb_blast_strengths, bomb_life, bomb_moving_direction = make_bomb_maps(agent.position)
-            agent_obs['bomb_blast_strength'] = bomb_blast_strengths
-            agent_obs['bomb_life'] = bomb_life
-            agent_obs['bomb_moving_direction'] = bomb_moving_direction
-            flame_life = make_flame_map(agent.position)
-            agent_obs['flame_life'] = flame_life
-            agent_obs['game_type'] = game_type.value
-            agent_obs['game_env'] = game_env
-
-            for attr in attrs:
-                assert hasattr(agent, attr)
-                agent_obs[attr] = getattr(agent, attr)
-            observations.append(agent_obs)
 
+        The observations are built incrementally from buffers that persist
+        between calls. With copy=False the arrays in the observations are
+        read-only views of those buffers that are only valid until the next
+        call, which saves allocating them on every step. Callers that keep or
+        modify observations should leave copy=True.
+        """
+        profiler = profiling.active
+        if profiler is not None:
+            start = profiler.start()
+        builder = self._observation_builder
+        settings = (len(curr_board), len(agents), is_partially_observable,
+                    agent_view_size)
+        if builder is None or not builder.matches(*settings):
+            builder = observation_builder.ObservationBuilder(*settings)
+            self._observation_builder = builder
+        observations = builder.build(curr_board, agents, bombs, flames,
+                                     game_type, game_env, copy=copy)
+        if profiler is not None:
+            profiler.lap('observations', start)
         return observations
 
     @staticmethod
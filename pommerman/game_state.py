@@ -0,0 +1,333 @@
+'''A game state that is cheap to copy, for agents that search ahead.
+
+The agents, bombs and flames are small int arrays with the columns of
+replay.AGENT_FIELDS, replay.BOMB_FIELDS and replay.FLAME_FIELDS. The board
+and the items are shared between clones until one of them changes them
+(copy on write), so a clone only copies a few small arrays. Bombs and
+flames are looked up by position in O(1) through grids of row indices, and
+BombView and FlameView read a row with the attributes and the read-only
+methods of characters.Bomb and characters.Flame.
+
+An example of looking one step ahead from the env's state:
+
+    state = env.get_state()
+    for action in range(6):
+        child = state.clone()
+        child.step([action] + other_actions)
+'''
+import numpy as np
+
+from . import characters
+from . import constants
+from . import replay
+
+_ACTIONS = list(constants.Action)
+
+
+class AgentView(object):
+    """A read-only view of a row of GameState.agents, like the attributes of
+    characters.Bomber"""
+
+    __slots__ = ('_agents', '_row')
+
+    def __init__(self, agents, row):
+        self._agents = agents
+        self._row = row
+
+    @property
+    def agent_id(self):
+        return self._row
+
+    @property
+    def position(self):
+        row, col = self._agents[self._row, :2].tolist()
+        return (row, col)
+
+    @property
+    def ammo(self):
+        return int(self._agents[self._row, 2])
+
+    @property
+    def is_alive(self):
+        return bool(self._agents[self._row, 3])
+
+    @property
+    def blast_strength(self):
+        return int(self._agents[self._row, 4])
+
+    @property
+    def can_kick(self):
+        return bool(self._agents[self._row, 5])
+
+
+class BombView(object):
+    """A read-only view of a row of GameState.bombs, like characters.Bomb"""
+
+    __slots__ = ('_bombs', '_row', '_agents')
+
+    def __init__(self, bombs, row, agents):
+        self._bombs = bombs
+        self._row = row
+        self._agents = agents
+
+    @property
+    def position(self):
+        row, col = self._bombs[self._row, :2].tolist()
+        return (row, col)
+
+    @property
+    def bomber(self):
+        return AgentView(self._agents, self.bomber_id)
+
+    @property
+    def bomber_id(self):
+        return int(self._bombs[self._row, 2])
+
+    @property
+    def life(self):
+        return int(self._bombs[self._row, 3])
+
+    @property
+    def blast_strength(self):
+        return int(self._bombs[self._row, 4])
+
+    @property
+    def moving_direction(self):
+        direction = self._bombs[self._row, 5]
+        return _ACTIONS[direction] if direction else None
+
+    # These only read the attributes, so they work on a view as they are.
+    exploded = characters.Bomb.exploded
+    explode = characters.Bomb.explode
+    in_range = characters.Bomb.in_range
+    is_moving = characters.Bomb.is_moving
+
+
+class FlameView(object):
+    """A read-only view of a row of GameState.flames, like characters.Flame"""
+
+    __slots__ = ('_flames', '_row')
+
+    def __init__(self, flames, row):
+        self._flames = flames
+        self._row = row
+
+    @property
+    def position(self):
+        row, col = self._flames[self._row, :2].tolist()
+        return (row, col)
+
+    @property
+    def life(self):
+        return int(self._flames[self._row, 2])
+
+    is_dead = characters.Flame.is_dead
+
+
+class GameState(object):
+    """The full state of a game, stepped with a ForwardModel.
+
+    Use board and items to read them. Code that changes them in place must
+    go through writable_board and writable_items so clones are not affected.
+    """
+
+    __slots__ = [
+        '_board', '_board_shared', '_items', '_items_shared', 'agents',
+        'bombs', 'flames', 'step_count', 'game_type', 'max_blast_strength',
+        'collapses', '_characters', '_bomb_grid', '_flame_grid'
+    ]
+
+    def __init__(self,
+                 board,
+                 agents,
+                 bombs,
+                 flames,
+                 items,
+                 game_type,
+                 step_count=0,
+                 max_blast_strength=10,
+                 collapses=None):
+        '''Makes a state from its arrays.
+
+        Args:
+          board: The board. It is not copied.
+          agents, bombs, flames: int arrays with a row per entity.
+          items: A dict from position to the item value under it.
+          game_type: The constants.GameType of the game.
+          step_count: The step count of the env.
+          max_blast_strength: As in ForwardModel.step.
+          collapses: The collapse schedule of the v1 env, if any.
+        '''
+        self._board = board
+        self._board_shared = False
+        self._items = items
+        self._items_shared = False
+        self.agents = agents
+        self.bombs = bombs
+        self.flames = flames
+        self.game_type = game_type
+        self.step_count = step_count
+        self.max_blast_strength = max_blast_strength
+        self.collapses = collapses
+        # Scratch characters for step, shared by clones.
+        self._characters = None
+        # The position indices, made when first needed.
+        self._bomb_grid = None
+        self._flame_grid = None
+
+    @classmethod
+    def from_objects(cls, board, agents, bombs, items, flames, game_type,
+                     **kwargs):
+        '''Packs the board and lists of characters that the envs use'''
+        arrays = replay.state_to_arrays(board, agents, bombs, items, flames)
+        return cls(arrays['board'], arrays['agents'], arrays['bombs'],
+                   arrays['flames'], dict(items), game_type, **kwargs)
+
+    @property
+    def board(self):
+        return self._board
+
+    @property
+    def items(self):
+        return self._items
+
+    def writable_board(self):
+        '''Returns the board, copying it first if a clone shares it'''
+        if self._board_shared:
+            self._board = self._board.copy()
+            self._board_shared = False
+        return self._board
+
+    def writable_items(self):
+        '''Returns the items, copying them first if a clone shares them'''
+        if self._items_shared:
+            self._items = dict(self._items)
+            self._items_shared = False
+        return self._items
+
+    def clone(self):
+        '''Returns a copy that can be stepped independently'''
+        new = GameState.__new__(GameState)
+        self._board_shared = True
+        self._items_shared = True
+        new._board = self._board
+        new._board_shared = True
+        new._items = self._items
+        new._items_shared = True
+        new.agents = self.agents.copy()
+        new.bombs = self.bombs.copy()
+        new.flames = self.flames.copy()
+        new.game_type = self.game_type
+        new.step_count = self.step_count
+        new.max_blast_strength = self.max_blast_strength
+        new.collapses = self.collapses
+        new._characters = self._characters
+        # The clone has the same entities at the same rows.
+        new._bomb_grid = self._bomb_grid
+        new._flame_grid = self._flame_grid
+        return new
+
+    def _grid(self, entities):
+        '''Maps each position to the last row of entities there, or -1'''
+        grid = np.full(self._board.shape, -1, dtype=np.int64)
+        grid[entities[:, 0], entities[:, 1]] = np.arange(len(entities))
+        return grid
+
+    def bomb_at(self, position):
+        '''Returns a BombView of the bomb at position or None'''
+        if self._bomb_grid is None:
+            self._bomb_grid = self._grid(self.bombs)
+        row = self._bomb_grid[position]
+        return BombView(self.bombs, row, self.agents) if row >= 0 else None
+
+    def flame_at(self, position):
+        '''Returns a FlameView of the longest lasting flame at position.
+
+        More than one flame can be at a position, so the grid is filled in
+        order of increasing life.
+        '''
+        if self._flame_grid is None:
+            order = np.argsort(self.flames[:, 2], kind='stable')
+            grid = np.full(self._board.shape, -1, dtype=np.int64)
+            grid[self.flames[order, 0], self.flames[order, 1]] = order
+            self._flame_grid = grid
+        row = self._flame_grid[position]
+        return FlameView(self.flames, row) if row >= 0 else None
+
+    def bomb_views(self):
+        return [
+            BombView(self.bombs, row, self.agents)
+            for row in range(len(self.bombs))
+        ]
+
+    def flame_views(self):
+        return [FlameView(self.flames, row) for row in range(len(self.flames))]
+
+    def unpack_entities(self, agents):
+        '''Sets the agents to this state and returns new bombs and flames'''
+        for agent, (row, col, ammo, is_alive, blast_strength,
+                    can_kick) in zip(agents, self.agents.tolist()):
+            agent.position = (row, col)
+            agent.ammo = ammo
+            agent.is_alive = bool(is_alive)
+            agent.blast_strength = blast_strength
+            agent.can_kick = bool(can_kick)
+        bombs = [
+            characters.Bomb(agents[bomber_id], (row, col), life,
+                            blast_strength,
+                            _ACTIONS[moving_direction]
+                            if moving_direction else None)
+            for row, col, bomber_id, life, blast_strength, moving_direction
+            in self.bombs.tolist()
+        ]
+        flames = [
+            characters.Flame((row, col), life)
+            for row, col, life in self.flames.tolist()
+        ]
+        return bombs, flames
+
+    def _new_characters(self):
+        return [
+            characters.Bomber(agent_id, self.game_type)
+            for agent_id in range(len(self.agents))
+        ]
+
+    def to_objects(self):
+        '''Returns new (board, agents, bombs, items, flames) of this state'''
+        agents = self._new_characters()
+        bombs, flames = self.unpack_entities(agents)
+        return self._board.copy(), agents, bombs, dict(self._items), flames
+
+    def step(self, actions):
+        '''Runs one step of the game with the actions of all agents'''
+        if self._characters is None:
+            self._characters = self._new_characters()
+        agents = self._characters
+        bombs, flames = self.unpack_entities(agents)
+        board, agents, bombs, items, flames = replay.simulate(
+            (self.writable_board(), agents, bombs, self.writable_items(),
+             flames), actions, self.step_count, self.max_blast_strength,
+            self.collapses)
+        # A collapse makes a new board. Both were writable, so neither is
+        # shared with a clone.
+        self._board = board
+        self._items = items
+
+        self.agents = np.array([
+            agent.position + (agent.ammo, agent.is_alive,
+                              agent.blast_strength, agent.can_kick)
+            for agent in agents
+        ], dtype=np.int64)
+        self.bombs = np.array([
+            bomb.position + (bomb.bomber.agent_id, bomb.life,
+                             bomb.blast_strength,
+                             bomb.moving_direction.value
+                             if bomb.moving_direction is not None else 0)
+            for bomb in bombs
+        ], dtype=np.int64).reshape(-1, len(replay.BOMB_FIELDS))
+        self.flames = np.array(
+            [flame.position + (flame.life,) for flame in flames],
+            dtype=np.int64).reshape(-1, len(replay.FLAME_FIELDS))
+        self.step_count += 1
+        self._bomb_grid = None
+        self._flame_grid = None
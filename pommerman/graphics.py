@@ -4,6 +4,7 @@
 Display object. Pyglet only supports multiple Displays on Linux.
 """
 from datetime import datetime
+import functools
 import math
 import os
 from random import randint
@@ -11,7 +12,6 @@ from time import strftime
 
 from gym.utils import reraise
 import numpy as np
-from PIL import Image
 
 try:
     import pyglet
@@ -33,7 +33,6 @@ except ImportError as error:
     print("Import error GL! You will not be able to render --> %s" % error)
 
 from . import constants
-from . import utility
 
 __location__ = os.path.dirname(os.path.realpath(__file__))
 RESOURCE_PATH = os.path.join(__location__, constants.RESOURCE_DIR)
@@ -152,63 +151,120 @@ class PixelViewer(Viewer):
 
     def build_frame(self):
         board = self._board_state
-        board_size = self._board_size
-        agents = self._agents
-        human_factor = constants.HUMAN_FACTOR
-        rgb_array = self.rgb_array(board, board_size, agents,
+        rgb_array = self.rgb_array(board, self._board_size, self._agents,
                                    self._is_partially_observable,
                                    self._agent_view_size)
-
-        all_img = np.array(Image.fromarray(rgb_array[0].astype(np.uint8)).resize(
-                (board_size * human_factor, board_size * human_factor), resample=Image.NEAREST))
-        other_imgs = [
-            np.array(Image.fromarray(frame.astype(np.uint8)).resize(
-                    (int(board_size * human_factor / len(self._agents)),
-                     int(board_size * human_factor / len(self._agents))),
-                    resample=Image.NEAREST)) for frame in rgb_array[1:]
-        ]
-
-        other_imgs = np.concatenate(other_imgs, 0)
-        img = np.concatenate([all_img, other_imgs], 1)
-
-        return img
+        return self.tile_frames(rgb_array[None])[0]
 
     @staticmethod
     def rgb_array(board, board_size, agents, is_partially_observable,
                   agent_view_size):
-        frames = []
-
-        all_frame = np.zeros((board_size, board_size, 3))
-        num_items = len(constants.Item)
-        for row in range(board_size):
-            for col in range(board_size):
-                value = board[row][col]
-                if utility.position_is_agent(board, (row, col)):
-                    num_agent = value - num_items + 4
-                    if agents[num_agent].is_alive:
-                        all_frame[row][col] = constants.AGENT_COLORS[num_agent]
-                else:
-                    all_frame[row][col] = constants.ITEM_COLORS[value]
-
-        all_frame = np.array(all_frame)
-        frames.append(all_frame)
-
-        for agent in agents:
-            row, col = agent.position
-            my_frame = all_frame.copy()
-            for r in range(board_size):
-                for c in range(board_size):
-                    if is_partially_observable and not all([
-                        row >= r - agent_view_size, row <
-                                                    r + agent_view_size, col >= c - agent_view_size,
-                        col < c + agent_view_size
-                    ]):
-                        my_frame[r, c] = constants.ITEM_COLORS[
-                            constants.Item.Fog.value]
-            frames.append(my_frame)
+        """Returns the frames of a board as an array of shape
+        (1 + len(agents), board_size, board_size, 3): the whole board, then
+        what each agent sees."""
+        return PixelViewer.rgb_array_batch(
+            np.asarray(board)[None], [[agent.is_alive for agent in agents]],
+            [[agent.position for agent in agents]], is_partially_observable,
+            agent_view_size, dtype=np.float64)[0]
 
+    @staticmethod
+    def rgb_array_batch(boards,
+                        alive,
+                        positions,
+                        is_partially_observable,
+                        agent_view_size,
+                        dtype=np.uint8):
+        """Returns the frames of a batch of boards.
+
+        Args:
+          boards: An array of N boards.
+          alive: Whether each agent of each board is alive, of shape (N, A).
+          positions: The position of each agent of each board, of shape
+            (N, A, 2).
+          is_partially_observable: Whether to fog what the agents can't see.
+          agent_view_size: How far the agents can see.
+          dtype: The dtype of the frames.
+
+        Returns:
+          An array of shape (N, 1 + A, board_size, board_size, 3), with the
+          whole board and then what each agent sees.
+        """
+        boards = np.asarray(boards)
+        alive = np.asarray(alive, dtype=bool)
+        positions = np.asarray(positions, dtype=np.int64)
+        num_boards, num_agents = alive.shape
+        board_size = boards.shape[-1]
+
+        # Every board gets its own palette, in which dead agents are black.
+        palettes = np.repeat(_PALETTE.astype(dtype)[None], num_boards, axis=0)
+        first_agent = constants.Item.Agent0.value
+        palettes[:, first_agent:first_agent + num_agents][~alive] = 0
+
+        frames = np.empty(
+            (num_boards, 1 + num_agents, board_size, board_size, 3),
+            dtype=dtype)
+        frames[:, 0] = palettes[np.arange(num_boards)[:, None, None], boards]
+        frames[:, 1:] = frames[:, :1]
+        if is_partially_observable:
+            fogged = _fog_masks(board_size, agent_view_size)[
+                positions[..., 0], positions[..., 1]]
+            frames[:, 1:][fogged] = _PALETTE[constants.Item.Fog.value]
         return frames
 
+    @staticmethod
+    def tile_frames(frames):
+        """Lays the frames of rgb_array_batch out the way the viewer shows
+        them: the whole board and, on its right, the agents' boards above one
+        another.
+
+        Returns:
+          A uint8 array of shape (N, height, width, 3).
+        """
+        frames = np.asarray(frames).astype(np.uint8, copy=False)
+        num_boards, num_frames = frames.shape[:2]
+        num_agents = num_frames - 1
+        all_img = _upsample(frames[:, 0], constants.HUMAN_FACTOR)
+        other_imgs = _upsample(frames[:, 1:],
+                               constants.HUMAN_FACTOR // num_agents)
+        other_imgs = other_imgs.reshape((num_boards, -1) +
+                                        other_imgs.shape[3:])
+        return np.concatenate([all_img, other_imgs], 2)
+
+
+# The color of each item, with the agents' after the items'.
+_PALETTE = np.array(
+    constants.ITEM_COLORS[:constants.Item.Agent0.value] +
+    constants.AGENT_COLORS,
+    dtype=np.uint8)
+
+
+@functools.lru_cache(maxsize=None)
+def _fog_masks(board_size, agent_view_size):
+    """Returns which cells are fogged for an agent at each position, as an
+    array of shape (board_size, board_size, board_size, board_size)."""
+    cells = np.arange(board_size)
+    # Whether an agent in row row sees row r, and the same for columns.
+    sees = (cells[:, None] >= cells[None, :] - agent_view_size) & \
+           (cells[:, None] < cells[None, :] + agent_view_size)
+    masks = ~(sees[:, None, :, None] & sees[None, :, None, :])
+    masks.flags.writeable = False
+    return masks
+
+
+def _upsample(frames, factor):
+    """Scales frames up by a whole factor, each pixel becoming a factor by
+    factor square."""
+    board_size = frames.shape[-2]
+    # Note: Widening the rows first and then copying each into factor rows
+    # of the output is much faster than repeating along both axes.
+    rows = frames.repeat(factor, axis=-2)
+    ret = np.empty(
+        frames.shape[:-3] + (board_size, factor, board_size * factor, 3),
+        dtype=frames.dtype)
+    ret[...] = rows[..., :, None, :, :]
+    return ret.reshape(frames.shape[:-3] +
+                       (board_size * factor, board_size * factor, 3))
+
 
 class PommeViewer(Viewer):
     '''The primary render engine for pommerman.'''
@@ -1,3 +1,4 @@
 """Import the network modules"""
 from . import client
+from . import obs_stream
 from . import server
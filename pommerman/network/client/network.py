@@ -10,7 +10,7 @@ from . import constants
 import rapidjson
 import threading
 import gzip
-import numpy
+from .. import obs_stream
 
 
 class Network(object):
@@ -64,6 +64,7 @@ be joined, it should be a String"""
         if message_recieved[
                 "intent"] == constants.NetworkCommands.match_start.value:
             self.match_id = message_recieved["match_id"]
+            self._stream = obs_stream.Decoder()
 
     def match_get(self):
         """Description: Get the next step of the match  
@@ -81,13 +82,11 @@ pommerman.constants.Items
         finally:
             self.lock.release()
         try:
-            # Messages with normal match data are compressed using GZIP while
-            # match end notifications aren't. So we move on to that if this
-            # fails to decompress with gzip.
-            message_decoded = rapidjson.loads(
-                str(gzip.decompress(message_recieved), "utf-8"))
-        except:
-            try:
+            # Messages with match data are binary, a step of the player's
+            # observation stream, while match end notifications are text.
+            if isinstance(message_recieved, bytes):
+                message_decoded = self._stream.decode(message_recieved)
+            else:
                 message_decoded = rapidjson.loads(message_recieved)
                 if message_decoded[
                         "intent"] == constants.NetworkCommands.match_end.value:
@@ -96,8 +95,8 @@ pommerman.constants.Items
                         int(message_decoded["reward"]),
                         int(message_decoded["agent"])
                     ]
-            except:
-                raise Exception(constants.Exceptions.net_invalid_response.value)
+        except:
+            raise Exception(constants.Exceptions.net_invalid_response.value)
         # Info: message_decoded - ["d"]=Dead, ["o"]=OBS, ["i"] = Turn ID
         if message_decoded["d"]:
             return [1]
@@ -107,8 +106,6 @@ pommerman.constants.Items
         obs["position"] = tuple(obs["position"])
         for x, y in enumerate(obs["enemies"]):
             obs["enemies"][x] = pommerman.constants.Item[y]
-        for i in ["board", "bomb_life", "bomb_blast_strength"]:
-            obs[i] = numpy.asarray(obs[i])
         return [0, obs, message_decoded["i"]]
 
     def send_move(self, action, turn_id):
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""Observation stream
+
+The match sends each player an Encoder's messages in order, and the client
+rebuilds the observations with a Decoder. The first observation of a match
+is sent whole, as a keyframe. After that only the cells of the maps that
+changed and the other keys whose values changed are sent. All messages of a
+player go through one zlib stream, so what the earlier messages had in common
+with the next one doesn't have to be sent again either.
+
+A message is JSON before compression:
+* {"d": True} - The player is dead
+* {"d": False, "i": Turn ID, "k": {key: value}, "a": {key: map}} - A\
+ keyframe with the maps as nested lists and the other keys
+* {"d": False, "i": Turn ID, "a": {key: [cells, values]}, "f": {key: value}}\
+ - A delta with the flat indices and the new values of the changed cells of\
+ each map and the keys that changed"""
+
+import enum
+import zlib
+
+import numpy
+import rapidjson
+
+
+def _jsonable(value):
+    """Returns a value of an observation the way JSON holds it"""
+    if isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, enum.Enum):
+        return str(value.name)
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(x) for x in value]
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
+
+
+class Encoder(object):
+    """Encodes the observations of one player"""
+
+    def __init__(self):
+        self._compress = zlib.compressobj()
+        self._arrays = None
+        self._changed = None
+        self._fields = None
+
+    def encode(self, obs, turn_id):
+        """Description: Returns the next message with an observation"""
+        arrays = {}
+        fields = {}
+        for key, value in obs.items():
+            if isinstance(value, numpy.ndarray):
+                arrays[key] = value
+            else:
+                fields[key] = _jsonable(value)
+        if self._arrays is None:
+            message = {
+                "d": False,
+                "i": turn_id,
+                "k": fields,
+                "a": {key: value.tolist()
+                      for key, value in arrays.items()}
+            }
+            self._arrays = {
+                key: value.copy()
+                for key, value in arrays.items()
+            }
+            self._changed = {
+                key: numpy.empty(value.shape, bool)
+                for key, value in arrays.items()
+            }
+        else:
+            changed = {}
+            for key, value in arrays.items():
+                # Note: The last maps are kept up to date in place
+                last = self._arrays[key]
+                mask = numpy.not_equal(value, last, out=self._changed[key])
+                if mask.any():
+                    cells = mask.ravel().nonzero()[0]
+                    last[mask] = value[mask]
+                    changed[key] = [
+                        cells.tolist(),
+                        value.ravel()[cells].tolist()
+                    ]
+            message = {
+                "d": False,
+                "i": turn_id,
+                "a": changed,
+                "f": {
+                    key: value
+                    for key, value in fields.items()
+                    if self._fields.get(key) != value
+                }
+            }
+        self._fields = fields
+        return self._pack(message)
+
+    def encode_dead(self):
+        """Description: Returns the message telling the player it's dead"""
+        return self._pack({"d": True})
+
+    def _pack(self, message):
+        return self._compress.compress(
+            bytes(rapidjson.dumps(message), "utf8")) + self._compress.flush(
+                zlib.Z_SYNC_FLUSH)
+
+
+class Decoder(object):
+    """Rebuilds the observations of one player"""
+
+    def __init__(self):
+        self._decompress = zlib.decompressobj()
+        self._arrays = None
+        self._fields = None
+
+    def decode(self, message):
+        """Description: Decodes the next message
+        Return values:
+        * The message with the whole observation under "o", which is a new \
+dict whose maps are arrays"""
+        message = rapidjson.loads(
+            str(self._decompress.decompress(message), "utf-8"))
+        if message["d"]:
+            return message
+        if "k" in message:
+            self._fields = message.pop("k")
+            self._arrays = {
+                key: numpy.asarray(value)
+                for key, value in message.pop("a").items()
+            }
+        else:
+            for key, (cells, values) in message.pop("a").items():
+                self._arrays[key].flat[cells] = values
+            self._fields.update(message.pop("f"))
+        obs = dict(self._fields)
+        for key, value in obs.items():
+            if isinstance(value, list):
+                obs[key] = list(value)
+        for key, value in self._arrays.items():
+            obs[key] = value.copy()
+        message["o"] = obs
+        return message
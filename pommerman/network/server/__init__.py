@@ -3,9 +3,9 @@
 WebSockets protocol.  
 Functions:  
 init() - If you want to run the application normally  
-run(max_players, max_matches, port, timeout, mode, ui_en=True, 
-exit_handler=True) - If you want to programatically launch the server with
-predefined parameters"""
+run(port, max_players, timeout, mode, max_matches, ui_en=True, 
+exit_handler=True, match_workers, metrics_port, metrics_path) - If you want to
+programatically launch the server with predefined parameters"""
 
 import ui
 import multiprocessing
@@ -13,7 +13,6 @@ from . import constants
 from . import network
 from . import match
 import time
-import random
 import signal
 import pommerman
 
@@ -62,7 +61,11 @@ def run(port,
         mode,
         max_matches=False,
         ui_en=False,
-        exit_handler=False):
+        exit_handler=False,
+        match_workers=False,
+        metrics_port=False,
+        metrics_path=False,
+        metrics_interval=10):
     """Description: This function is responsible for running the server.  
     Arguments:  
     * port: The port used by the server  
@@ -73,71 +76,73 @@ def run(port,
 is set to int(max_players/4))
     * ui_en: If True, UI is enabled else UI is disabled  
     * exit_handler: If True, the exit handler is set else the exit handler \
-isn't set"""
+isn't set
+    * match_workers: The amount of processes hosting the matches (If not \
+defined this is set to the amount of CPUs, but no more than max_matches)
+    * metrics_port: If defined, the metrics of the server are served as JSON \
+on http://localhost:metrics_port/metrics (See network.server.metrics)
+    * metrics_path: If defined, the metrics are written to this file as JSON \
+every metrics_interval seconds"""
+    if not max_matches:
+        max_matches = int(max_players / 4)
+    if not match_workers:
+        match_workers = min(max_matches, multiprocessing.cpu_count())
+    match_workers = max(match_workers, 1)
     netpipe, rnetpipe = multiprocessing.Pipe()
     netqueue = multiprocessing.Queue()
+    matchqueue = multiprocessing.Queue()
     subprocess_net = multiprocessing.Process(
         target=network.thread,
-        args=(rnetpipe, netqueue, port, max_players, mode, timeout), daemon=True)
+        args=(rnetpipe, netqueue, matchqueue, port, max_players, max_matches,
+              mode, timeout, metrics_port, metrics_path, metrics_interval),
+        daemon=True)
     subprocess_net.start()
-    if not max_matches:
-        max_matches = int(max_players / 4)
+    # Note: Every worker can host all the matches of its share
+    matches_per_worker = -(-max_matches // match_workers)
+    for _ in range(match_workers):
+        MATCH_SUBPROCESS.append(_create_worker(matchqueue, netqueue, mode,
+                                               matches_per_worker))
     if exit_handler:
         signal.signal(signal.SIGINT, _exit_handler(subprocess_net))
     if ui_en:
         ui.info(ui.yellow, constants.Strings.server_ready.value, ui.white,
                 ui.Symbol("✔", ":)"))
     while True:
+        if not ui_en:
+            # Note: Matchmaking happens in the network process, so there's
+            # nothing left to do here
+            subprocess_net.join()
+            return
         netpipe.send([constants.SubprocessCommands.get_players.value])
-        concurrent_list, num_players, num_matches = netpipe.recv()
-        if int(num_matches) < max_matches:
-            for x in list(concurrent_list["room"].keys()):
-                i = concurrent_list["room"][x]
-                if len(i) >= 4:
-                    MATCH_SUBPROCESS.append(_create_match(i, netqueue, mode))
-                    del concurrent_list["room"][x]
-            if len(concurrent_list["noroom"]) >= 4:
-                e = random.sample(concurrent_list["noroom"],
-                                  (int(len(concurrent_list["noroom"]) / 4) * 4))
-                for group in range(int(len(concurrent_list["noroom"]) / 4)):
-                    MATCH_SUBPROCESS.append(
-                        _create_match(e[group * 4:(group + 1) * 4], netqueue,
-                                      mode))
-                    for player in e[group * 4:(group + 1) * 4]:
-                        del concurrent_list["noroom"][concurrent_list["noroom"]
-                                                      .index(player)]
-            netpipe.send(
-                [constants.SubprocessCommands.update_cc.value, concurrent_list])
-        if ui_en:
-            ui.info(
-                "\033[2K\r",
-                ui.white,
-                constants.Strings.server_players.value,
-                ui.yellow,
-                "[",
-                num_players,
-                "/",
-                max_players,
-                "]",
-                ui.white,
-                constants.Strings.server_matches.value,
-                ui.yellow,
-                "[",
-                num_matches,
-                "/",
-                max_matches,
-                "]",
-                end="")
-        for process in tuple(MATCH_SUBPROCESS):
-            if not process.is_alive():
-                MATCH_SUBPROCESS.remove(process)
+        num_players, num_matches = netpipe.recv()
+        ui.info(
+            "\033[2K\r",
+            ui.white,
+            constants.Strings.server_players.value,
+            ui.yellow,
+            "[",
+            num_players,
+            "/",
+            max_players,
+            "]",
+            ui.white,
+            constants.Strings.server_matches.value,
+            ui.yellow,
+            "[",
+            num_matches,
+            "/",
+            max_matches,
+            "]",
+            end="")
         time.sleep(2)
 
 
-def _create_match(players, queue_subproc, mode):
-    """Description: This function is responsible for creating a match"""
+def _create_worker(queue_match, queue_subproc, mode, max_matches):
+    """Description: This function is responsible for starting a match worker"""
     subprocess = multiprocessing.Process(
-        target=match.thread, args=(players, queue_subproc, mode), daemon=True)
+        target=match.worker,
+        args=(queue_match, queue_subproc, mode, max_matches),
+        daemon=True)
     subprocess.start()
     return subprocess
 
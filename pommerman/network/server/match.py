@@ -4,17 +4,22 @@
 This contains functions responsible for playing matches 
 (You shouldn't use this file directly due to the very specialized 
 interactions required for it to function in addition to parameters 
-i.e: Pipes, Queues)"""
+i.e: Pipes, Queues)
 
+The server starts a fixed number of match workers when it starts. Each
+hosts several matches at once and keeps their envs to reset for the next
+ones, so a match starts without starting a process, importing pommerman or
+building an env."""
+
+import asyncio
 import multiprocessing
+import threading
 from . import constants
 import uuid
 import os
 import rapidjson
-import gzip
-import enum
 import pommerman
-import numpy
+from .. import obs_stream
 
 
 def unique_uuid(dir):
@@ -31,82 +36,102 @@ def unique_uuid(dir):
     return uuid_
 
 
-def resolve_classes(i):
-    """Resolves observation into JSONable types by looping over every element
-    in it"""
-    if isinstance(i, tuple):
-        i = list(i)
-    for key, value in enumerate(i):
-        if isinstance(i, dict):
-            key = value
-            value = i[key]
-        if hasattr(value, '__iter__') and not isinstance(
-                i[key], str) and not isinstance(i[key], numpy.ndarray):
-            i[key] = resolve_classes(value)
-        elif isinstance(value, enum.Enum):
-            i[key] = str(value.name)
-        elif isinstance(value, numpy.ndarray):
-            i[key] = value.tolist()
-        elif isinstance(value, numpy.uint8) or isinstance(value, numpy.int64):
-            i[key] = int(value)
-    return i
-
-
-def thread(players, queue_subproc, mode):
+def worker(queue_match, queue_subproc, mode, max_matches):
+    """Hosts up to max_matches matches at a time, for as long as the server
+    runs. The matches are coroutines on one event loop that take turns while
+    they wait for the actions of their players, and each plays on an env
+    that an earlier match has reset instead of a new one"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    envs = []  # The envs no match is playing on
+    slots = threading.Semaphore(max_matches)
+
+    def start(players):
+        """Starts a match and frees its slot once it ends"""
+        task = loop.create_task(_play(players, queue_subproc, mode, envs))
+        task.add_done_callback(lambda _: slots.release())
+
+    def watch_queue():
+        """Hands the matches made by the network process over to the event
+loop (This runs in its own thread as a multiprocessing Queue can't be waited
+on by the loop)"""
+        while True:
+            slots.acquire()
+            players = queue_match.get()
+            loop.call_soon_threadsafe(start, players)
+
+    threading.Thread(target=watch_queue, daemon=True).start()
+    try:
+        loop.run_forever()
+    finally:
+        for env in envs:
+            env.close()
+
+
+def _recv(net):
+    """Returns a future of the next message on the pipe"""
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+
+    def readable():
+        loop.remove_reader(net.fileno())
+        try:
+            future.set_result(net.recv())
+        except Exception as e:
+            future.set_exception(e)
+
+    loop.add_reader(net.fileno(), readable)
+    return future
+
+
+async def _play(players, queue_subproc, mode, envs):
     """Handles running of the match loop"""
     uuid_ = unique_uuid("matches")
-    base_agent = pommerman.agents.BaseAgent
-    env = pommerman.make(
-        mode,
-        [base_agent(), base_agent(),
-         base_agent(), base_agent()])
+    if envs:
+        env = envs.pop()
+    else:
+        base_agent = pommerman.agents.BaseAgent
+        env = pommerman.make(
+            mode,
+            [base_agent(), base_agent(),
+             base_agent(), base_agent()])
     net, net_end = multiprocessing.Pipe()
     queue_subproc.put([net_end, players, uuid_])
     obs = env.reset()
-    record = {
-        "board": numpy.array(env._board, copy=True).tolist(),
-        "actions": [],
-        "mode": str(mode)
-    }
+    encoders = [obs_stream.Encoder() for _ in players]
     done = False
     while not done:
-        obs_res = resolve_classes(obs.copy())
         turn_id = str(uuid.uuid4())[:5]
         try:
             obs_bytes = []
-            for key, value in enumerate(obs_res):
+            for key, value in enumerate(obs):
                 if 10 + key in obs[0]["alive"]:
-                    obs_bytes.append(
-                        gzip.compress(
-                            bytes(
-                                rapidjson.dumps({
-                                    "o": value,  # o = obs
-                                    "i": turn_id,  # i = Turn ID
-                                    "d": False  # d = Dead
-                                }),
-                                "utf8")))
+                    obs_bytes.append(encoders[key].encode(value, turn_id))
                 else:
-                    obs_bytes.append(
-                        gzip.compress(
-                            bytes(
-                                rapidjson.dumps({
-                                    "d": True  # d = Dead
-                                }),
-                                "utf8")))
+                    obs_bytes.append(encoders[key].encode_dead())
             net.send([
                 constants.SubprocessCommands.match_next.value, turn_id,
                 obs_bytes,
-                len(obs[0]["alive"])
+                len(obs[0]["alive"]),
+                [x for x in range(len(players)) if 10 + x in obs[0]["alive"]]
             ])
-            act = net.recv()
+            act = await _recv(net)
         except:
             act = [0, 0, 0, 0]
-        record["actions"].append(numpy.array(act, copy=True).tolist())
         obs, rew, done = env.step(act)[:3]
+    # The record holds the initial board, items and agents and the actions,
+    # so the match can be rebuilt with pommerman.replay.
+    record = env.get_record().to_json()
+    record["mode"] = str(mode)
     record["reward"] = rew
-    env.close()
+    envs.append(env)
     with open("./matches/" + uuid_ + ".json", "w") as file:
         rapidjson.dump(record, file)
-    net.send([constants.SubprocessCommands.match_end.value, rew])
-    net.recv()
-    exit(0)
+    try:
+        net.send([constants.SubprocessCommands.match_end.value, rew])
+        await _recv(net)
+    except:
+        pass
+    # net_end is only closed now as the queue pickles it in the background.
+    net.close()
+    net_end.close()
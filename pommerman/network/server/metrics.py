@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+"""IonServer Metrics
+
+This holds the metrics the network process keeps about the matches it
+relays: how long turns take, how long each player takes to act, how often
+a turn closes on the timeout (STOP_TIMEOUT) instead of with every action,
+how long players wait for a match and how long the relay's callbacks and
+its event loop take.
+
+The metrics are served as JSON by a small HTTP server, if the server was
+started with a metrics_port:
+* /metrics - Everything below
+* /health - The status and the amount of players and matches
+
+They can also be written to a file every so often (metrics_path)."""
+
+import asyncio
+import bisect
+import collections
+import json
+import os
+import time
+
+import numpy
+
+# Note: In seconds, the last bucket holds everything slower
+BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05,
+           0.1, 0.2, 0.5, 1, 2, 5)
+PERCENTILES = (50, 90, 99)
+SAMPLES = 10000  # The amount of recent samples kept for percentiles
+FINISHED_MATCHES = 20  # The amount of finished matches kept
+
+
+class Histogram(object):
+    """Counts durations in BUCKETS"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.
+        self.max = 0.
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_json(self):
+        return {
+            "le": list(BUCKETS) + ["inf"],
+            "counts": list(self.counts),
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max
+        }
+
+
+class Samples(object):
+    """Keeps the last durations for percentiles"""
+
+    def __init__(self, maxlen=SAMPLES):
+        self.samples = collections.deque(maxlen=maxlen)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def to_json(self):
+        ret = {"count": self.count}
+        if self.samples:
+            samples = numpy.fromiter(self.samples, float, len(self.samples))
+            for percentile, value in zip(
+                    PERCENTILES, numpy.percentile(samples, PERCENTILES)):
+                ret["p%d" % percentile] = float(value)
+            ret["max"] = float(samples.max())
+        return ret
+
+
+class Metrics(object):
+    """The metrics of the network process (The relay calls the methods below
+as things happen)"""
+
+    def __init__(self, gauges=None):
+        """Arguments:
+        * gauges: A function returning a dict of values of the moment, like \
+the amount of players, to add to the metrics"""
+        self.gauges = gauges
+        self.started = time.time()
+        self.turns = 0
+        self.timeouts = 0
+        self.turn_latency = Samples()
+        self.response = Histogram()
+        self.queue_wait = Samples()
+        self.relay = collections.defaultdict(Histogram)
+        self.loop_lag = Histogram()
+        self.players = {}  # The response histogram of each connected player
+        self.matches = {}
+        self.finished = collections.deque(maxlen=FINISHED_MATCHES)
+        self._joined = {}
+
+    def player_joined(self, player):
+        self._joined[player] = time.perf_counter()
+        self.players[player] = {"response": Histogram(), "timeouts": 0}
+
+    def player_left(self, player):
+        self._joined.pop(player, None)
+        self.players.pop(player, None)
+
+    def match_started(self, match_id, players):
+        now = time.perf_counter()
+        waits = []
+        for player in players:
+            joined = self._joined.pop(player, None)
+            waits.append(None if joined is None else now - joined)
+            if joined is not None:
+                self.queue_wait.add(now - joined)
+        self.matches[match_id] = {
+            "players": list(players),
+            "queue_wait": waits,
+            "turns": 0,
+            "timeouts": 0,
+            "turn_latency": Samples(maxlen=None),
+            "response": [Histogram() for _ in players],
+            "late": [0] * len(players)
+        }
+
+    def match_ended(self, match_id):
+        match = self.matches.pop(match_id, None)
+        if match is not None:
+            self.finished.append(dict(self._match_json(match), id=match_id))
+
+    def player_acted(self, match_id, index, seconds):
+        self.response.add(seconds)
+        match = self.matches.get(match_id)
+        if match is None:
+            return
+        match["response"][index].add(seconds)
+        player = self.players.get(match["players"][index])
+        if player is not None:
+            player["response"].add(seconds)
+
+    def turn_closed(self, match_id, seconds, late):
+        """Description: Records a turn
+        Arguments:
+        * seconds: The time from sending the observations to sending the \
+actions
+        * late: The indices of the alive players that didn't act, if the \
+turn closed on the timeout, else an empty list"""
+        self.turns += 1
+        self.turn_latency.add(seconds)
+        if late:
+            self.timeouts += 1
+        match = self.matches.get(match_id)
+        if match is None:
+            return
+        match["turns"] += 1
+        match["turn_latency"].add(seconds)
+        if late:
+            match["timeouts"] += 1
+        for index in late:
+            match["late"][index] += 1
+            player = self.players.get(match["players"][index])
+            if player is not None:
+                player["timeouts"] += 1
+
+    def relayed(self, name, start):
+        """Description: Records the time a callback of the relay took since \
+start (time.perf_counter)"""
+        self.relay[name].add(time.perf_counter() - start)
+
+    @staticmethod
+    def _match_json(match):
+        return {
+            "players": match["players"],
+            "queue_wait": match["queue_wait"],
+            "turns": match["turns"],
+            "timeouts": match["timeouts"],
+            "turn_latency": match["turn_latency"].to_json(),
+            "response": [x.to_json() for x in match["response"]],
+            "late": match["late"]
+        }
+
+    def to_json(self):
+        return {
+            "time": time.time(),
+            "uptime": time.time() - self.started,
+            "gauges": self.gauges() if self.gauges is not None else {},
+            "turns": self.turns,
+            "timeouts": self.timeouts,
+            "turn_latency": self.turn_latency.to_json(),
+            "response": self.response.to_json(),
+            "queue_wait": self.queue_wait.to_json(),
+            "relay": {
+                name: histogram.to_json()
+                for name, histogram in self.relay.items()
+            },
+            "loop_lag": self.loop_lag.to_json(),
+            "players": {
+                player: {
+                    "response": x["response"].to_json(),
+                    "timeouts": x["timeouts"]
+                }
+                for player, x in self.players.items()
+            },
+            "matches": {
+                match_id: self._match_json(match)
+                for match_id, match in self.matches.items()
+            },
+            "finished_matches": list(self.finished)
+        }
+
+    def health(self):
+        return dict(
+            self.gauges() if self.gauges is not None else {},
+            status="ok",
+            uptime=time.time() - self.started)
+
+    def watch_loop(self, loop, interval=1.):
+        """Description: Measures how late the event loop runs a timer every \
+interval seconds, which is how long its callbacks hold it up"""
+        due = loop.time() + interval
+
+        def probe():
+            nonlocal due
+            self.loop_lag.add(max(loop.time() - due, 0.))
+            due = loop.time() + interval
+            loop.call_later(interval, probe)
+
+        loop.call_later(interval, probe)
+
+    def dump(self, loop, path, interval):
+        """Description: Writes the metrics to path every interval seconds"""
+        tmp = path + ".tmp"
+        with open(tmp, "w") as file:
+            json.dump(self.to_json(), file)
+        os.replace(tmp, path)
+        loop.call_later(interval, self.dump, loop, path, interval)
+
+    async def _http_handler(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            parts = request.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else ""
+            if path == "/metrics":
+                status, body = "200 OK", self.to_json()
+            elif path == "/health":
+                status, body = "200 OK", self.health()
+            else:
+                status, body = "404 Not Found", {"error": "not found"}
+            body = json.dumps(body).encode("utf-8")
+            writer.write(("HTTP/1.0 %s\r\n"
+                          "Content-Type: application/json\r\n"
+                          "Content-Length: %d\r\n\r\n" % (status, len(body))
+                          ).encode("latin-1") + body)
+            await writer.drain()
+        except:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, port):
+        """Description: Starts the HTTP server"""
+        return await asyncio.start_server(self._http_handler, 'localhost',
+                                          port)
@@ -5,9 +5,19 @@ This contains functions responsible Server-Client communication
 (You shouldn't use this file directly due to the very specialized 
 interactions required for it to function in addition to parameters 
 i.e: Pipes, Queues. This is the reason for the simple docstrings
-for functions)"""
+for functions)
+
+Everything runs on one asyncio event loop: the websocket server, the
+readers of the match pipes and of the main pipe, and a timer per turn that
+sends the actions in when the players take too long. Nothing is polled, so
+an idle server sleeps and a message is relayed as soon as it arrives. What
+the relay sees is recorded in METRICS (See metrics).
+
+Players are matched here too, as soon as there are enough of them, and the
+match is handed to the first match worker with a free slot."""
 
 import asyncio
+import random
 import websockets
 import threading
 import time
@@ -17,6 +27,7 @@ import re
 import gzip
 import rapidjson
 import uuid
+from . import metrics
 
 CONCURRENTLY_LOOKING = {
     "room": {},
@@ -25,10 +36,15 @@ CONCURRENTLY_LOOKING = {
 PLAYER_WS = {}  # This stores the mapping from player ID to the websocket object
 MATCH_PROCESS = {}  # This holds pipes to match processes
 MAX_PLAYERS = 0
+MAX_MATCHES = 0
+PENDING_MATCHES = 0  # The matches handed to a worker that haven't started
 PIPE_MAIN = False  # This holds the queue (Main-proc <-> Network-proc)
 QUEUE_SUBPROC = False  # This holds the queue (Subproc <-> Network-proc)
+QUEUE_MATCH = False  # This holds the queue (Network-proc -> Match workers)
 MODE = ""
 STOP_TIMEOUT = 0
+LOOP = None  # The event loop of the network process
+METRICS = None  # The metrics.Metrics of the relay
 
 
 async def message_parse(message, websocket):
@@ -44,13 +60,16 @@ async def message_parse(message, websocket):
                 len(MATCH_PROCESS)
             }))
     elif message["intent"] is constants.NetworkCommands.match_act.value:
-        if message["turn_id"] == MATCH_PROCESS[message["match_id"]]["turn_id"]:
+        match = MATCH_PROCESS[message["match_id"]]
+        if match["free"] and message["turn_id"] == match["turn_id"]:
             # Note: The statements below assign the action to the respective players
-            MATCH_PROCESS[message["match_id"]]["act"][
-                MATCH_PROCESS[message["match_id"]]["players"].index(
-                    message["player_id"])] = message["act"]
-            MATCH_PROCESS[message["match_id"]]["recv"][MATCH_PROCESS[message[
-                "match_id"]]["players"].index(message["player_id"])] = True
+            index = match["players"].index(message["player_id"])
+            if not match["recv"][index]:
+                METRICS.player_acted(message["match_id"], index,
+                                     time.perf_counter() - match["time"])
+            match["act"][index] = message["act"]
+            match["recv"][index] = True
+            _maybe_close_turn(match)
     elif message["intent"] is constants.NetworkCommands.replay.value:
         try:
             with open(
@@ -123,6 +142,8 @@ async def message_parse(message, websocket):
                 "mode":
                 MODE
             }))
+        METRICS.player_joined(uuid_)
+        _matchmake()
 
 
 async def ws_handler(websocket, pth=None):  # pylint: disable=unused-argument
@@ -130,130 +151,237 @@ async def ws_handler(websocket, pth=None):  # pylint: disable=unused-argument
 returned by the 'websockets' library)"""
     try:
         async for message in websocket:
+            start = time.perf_counter()
             try:
                 await message_parse(rapidjson.loads(message), websocket)
             except:
                 pass
+            METRICS.relayed("ws", start)
     except websockets.exceptions.ConnectionClosed:
         pass
+    finally:
+        for uuid_ in [
+                uuid_ for uuid_, player in PLAYER_WS.items()
+                if player["ws"] is websocket
+        ]:
+            _drop_player(uuid_)
 
 
-async def program_loop():
-    """Handles other network-related function"""
-    global CONCURRENTLY_LOOKING
-    while (True):
+def _drop_player(uuid_):
+    """Forgets a player whose connection closed"""
+    i = PLAYER_WS.pop(uuid_)
+    METRICS.player_left(uuid_)
+    if i.get("noroom") is True:
         try:
-            for uuid_ in list(PLAYER_WS.keys()):
-                i = PLAYER_WS[uuid_]
-                if not i["ws"].open:
-                    if i["noroom"] is True:
-                        try:
-                            del CONCURRENTLY_LOOKING["noroom"][CONCURRENTLY_LOOKING[
-                                "noroom"].index(uuid_)]
-                        except:
-                            pass
-                    elif i["noroom"] is False:
-                        try:
-                            del CONCURRENTLY_LOOKING["room"][i["room"]][
-                                CONCURRENTLY_LOOKING["room"][i["room"]].index(
-                                    uuid_)]
-                        except:
-                            pass
-                    try:
-                        del PLAYER_WS[uuid_]
-                    except:
-                        pass
-            if PIPE_MAIN.poll():
-                queue_msg = PIPE_MAIN.recv()
-                if queue_msg[0] is constants.SubprocessCommands.get_players.value:
-                    PIPE_MAIN.send(
-                        [CONCURRENTLY_LOOKING,
-                         len(PLAYER_WS),
-                         len(MATCH_PROCESS)])
-                elif queue_msg[0] is constants.SubprocessCommands.update_cc.value:
-                    CONCURRENTLY_LOOKING = queue_msg[1]
-            if not QUEUE_SUBPROC.empty():
-                queue_msg = QUEUE_SUBPROC.get()
-                MATCH_PROCESS[queue_msg[2]] = {
-                    "pipe": queue_msg[0],
-                    "players": queue_msg[1],
-                    "match_id": queue_msg[2],
-                    "free": False,
-                    "delete": False
-             }
-                for i in queue_msg[1]:
-                    if i in PLAYER_WS:  # If the players didn't quits during matching
-                        await PLAYER_WS[i]["ws"].send(
-                            rapidjson.dumps({
-                                "intent":
-                                constants.NetworkCommands.match_start.value,
-                                "match_id":
-                                queue_msg[2]
-                            }))
-            for key in list(MATCH_PROCESS.keys()):
-                value = MATCH_PROCESS[key]
-                if value["pipe"].poll() and not value["free"]:
-                    pipe_msg = value["pipe"].recv()
-                    if pipe_msg[0] == constants.SubprocessCommands.match_next.value:
-                        value["free"] = True
-                        value["act"] = [0, 0, 0, 0]
-                        value["recv"] = [False, False, False, False]
-                        value["time"] = time.time()
-                        value["turn_id"] = pipe_msg[1]
-                        value["alive"] = pipe_msg[3]
-                        for x, y in enumerate(value["players"]):
-                            if y in list(PLAYER_WS.keys()):
-                                try:
-                                    await PLAYER_WS[y]["ws"].send(pipe_msg[2][x])
-                                except:
-                                    pass
-                            elif y not in PLAYER_WS:
-                                value["act"][x] = 5
-                    if pipe_msg[0] is constants.SubprocessCommands.match_end.value:
-                        value["delete"] = True
-                        for x, y in enumerate(value["players"]):
-                            if y in PLAYER_WS:
-                                await PLAYER_WS[y]["ws"].send(
-                                    rapidjson.dumps({
-                                        "intent":
-                                        constants.NetworkCommands.match_end.value,
-                                        "reward":
-                                        pipe_msg[1][x],
-                                        "agent":
-                                        10 + x
-                                    }))
-                if value["free"]:
-                    if value["time"] + STOP_TIMEOUT < time.time(
-                    ) or value["recv"].count(True) == value["alive"]:
-                        value["pipe"].send(value["act"])
-                        value["free"] = False
-                if value["delete"]:
-                    value["pipe"].send("END")
-                    del MATCH_PROCESS[key]
-        finally:
-            time.sleep(0.0001)  # Sleep for a while so other threads get the GIL
-
-
-def _run_server(port):
-    """Handles running the websocket thread"""
-    asyncio.set_event_loop(asyncio.new_event_loop())
-    asyncio.get_event_loop().run_until_complete(
-        websockets.serve(ws_handler, 'localhost', port))
-    asyncio.get_event_loop().run_forever()
-
-
-def thread(pipe_main, queue_subproc, port, max_players, mode, stop_timeout):
-    """Creates a network thread"""
-    # Note: Multiple threads are used so globals are used to share data b/w them
-    global MAX_PLAYERS, PIPE_MAIN, QUEUE_SUBPROC, MODE, STOP_TIMEOUT
+            del CONCURRENTLY_LOOKING["noroom"][CONCURRENTLY_LOOKING[
+                "noroom"].index(uuid_)]
+        except:
+            pass
+    elif i.get("noroom") is False:
+        try:
+            del CONCURRENTLY_LOOKING["room"][i["room"]][
+                CONCURRENTLY_LOOKING["room"][i["room"]].index(uuid_)]
+        except:
+            pass
+
+
+async def _send_players(players, messages):
+    """Sends each player that is still connected its message"""
+    for player, message in zip(players, messages):
+        if player in PLAYER_WS:
+            try:
+                await PLAYER_WS[player]["ws"].send(message)
+            except:
+                pass
+
+
+def _matchmake():
+    """Hands groups of 4 players to the match workers while there's room for
+more matches"""
+    global PENDING_MATCHES
+    while len(MATCH_PROCESS) + PENDING_MATCHES < MAX_MATCHES:
+        group = None
+        for room, players in CONCURRENTLY_LOOKING["room"].items():
+            if len(players) >= 4:
+                group = players[:4]
+                del CONCURRENTLY_LOOKING["room"][room]
+                break
+        if group is None and len(CONCURRENTLY_LOOKING["noroom"]) >= 4:
+            group = random.sample(CONCURRENTLY_LOOKING["noroom"], 4)
+            for player in group:
+                CONCURRENTLY_LOOKING["noroom"].remove(player)
+        if group is None:
+            return
+        PENDING_MATCHES += 1
+        QUEUE_MATCH.put(group)
+
+
+def _main_readable():
+    """Answers the main process"""
+    queue_msg = PIPE_MAIN.recv()
+    if queue_msg[0] is constants.SubprocessCommands.get_players.value:
+        PIPE_MAIN.send([len(PLAYER_WS), len(MATCH_PROCESS)])
+
+
+def _watch_queue():
+    """Hands the matches that start over to the event loop (This runs in its
+own thread as a multiprocessing Queue can't be waited on by the loop)"""
+    while True:
+        queue_msg = QUEUE_SUBPROC.get()
+        LOOP.call_soon_threadsafe(_add_match, queue_msg)
+
+
+def _add_match(queue_msg):
+    """Registers the pipe of a new match and tells its players"""
+    global PENDING_MATCHES
+    pipe, players, match_id = queue_msg
+    PENDING_MATCHES -= 1
+    MATCH_PROCESS[match_id] = {
+        "pipe": pipe,
+        "players": players,
+        "match_id": match_id,
+        "free": False,
+        "timer": None
+    }
+    METRICS.match_started(match_id, players)
+    LOOP.add_reader(pipe.fileno(), _match_readable, match_id)
+    message = rapidjson.dumps({
+        "intent": constants.NetworkCommands.match_start.value,
+        "match_id": match_id
+    })
+    # If the players didn't quits during matching
+    asyncio.ensure_future(_send_players(players, [message] * len(players)))
+
+
+def _remove_match(match_id):
+    """Stops listening to a match"""
+    match = MATCH_PROCESS.pop(match_id)
+    METRICS.match_ended(match_id)
+    LOOP.remove_reader(match["pipe"].fileno())
+    if match["timer"] is not None:
+        match["timer"].cancel()
+
+
+def _match_readable(match_id):
+    """Relays a message of a match process as soon as it arrives"""
+    start = time.perf_counter()
+    try:
+        _relay_match(match_id)
+    finally:
+        METRICS.relayed("match", start)
+
+
+def _relay_match(match_id):
+    """Handles a message of a match process"""
+    match = MATCH_PROCESS[match_id]
+    try:
+        pipe_msg = match["pipe"].recv()
+    except (EOFError, OSError):
+        _remove_match(match_id)
+        _matchmake()
+        return
+    if pipe_msg[0] == constants.SubprocessCommands.match_next.value:
+        match["free"] = True
+        match["act"] = [0, 0, 0, 0]
+        match["recv"] = [False, False, False, False]
+        match["time"] = time.perf_counter()
+        match["turn_id"] = pipe_msg[1]
+        match["alive"] = pipe_msg[3]
+        match["seats"] = pipe_msg[4]
+        for x, y in enumerate(match["players"]):
+            if y not in PLAYER_WS:
+                match["act"][x] = 5
+        match["timer"] = LOOP.call_later(STOP_TIMEOUT, _close_turn, match,
+                                         pipe_msg[1])
+        asyncio.ensure_future(_send_players(match["players"], pipe_msg[2]))
+        _maybe_close_turn(match)
+    elif pipe_msg[0] is constants.SubprocessCommands.match_end.value:
+        _remove_match(match_id)
+        match["pipe"].send("END")
+        asyncio.ensure_future(
+            _send_players(match["players"], [
+                rapidjson.dumps({
+                    "intent": constants.NetworkCommands.match_end.value,
+                    "reward": pipe_msg[1][x],
+                    "agent": 10 + x
+                }) for x in range(len(match["players"]))
+            ]))
+        _matchmake()
+
+
+def _maybe_close_turn(match):
+    """Closes the turn once every alive player has acted"""
+    if match["recv"].count(True) == match["alive"]:
+        _close_turn(match, match["turn_id"])
+
+
+def _close_turn(match, turn_id):
+    """Sends the actions of the turn to the match process"""
+    if not match["free"] or match["turn_id"] != turn_id:
+        return
+    match["free"] = False
+    match["timer"].cancel()
+    match["timer"] = None
+    match["pipe"].send(match["act"])
+    METRICS.turn_closed(
+        match["match_id"],
+        time.perf_counter() - match["time"],
+        [x for x in match["seats"] if not match["recv"][x]])
+
+
+def _gauges():
+    """Returns the amounts of players and matches of the moment"""
+    return {
+        "players": len(PLAYER_WS),
+        "looking": len(CONCURRENTLY_LOOKING["noroom"]) + sum(
+            len(x) for x in CONCURRENTLY_LOOKING["room"].values()),
+        "matches": len(MATCH_PROCESS),
+        "pending_matches": PENDING_MATCHES,
+        "max_players": MAX_PLAYERS,
+        "max_matches": MAX_MATCHES
+    }
+
+
+async def _serve(port):
+    """Starts the websocket server"""
+    return await websockets.serve(ws_handler, 'localhost', port)
+
+
+def thread(pipe_main,
+           queue_subproc,
+           queue_match,
+           port,
+           max_players,
+           max_matches,
+           mode,
+           stop_timeout,
+           metrics_port=False,
+           metrics_path=False,
+           metrics_interval=10):
+    """Runs the network event loop"""
+    global MAX_PLAYERS, MAX_MATCHES, PIPE_MAIN, QUEUE_SUBPROC, QUEUE_MATCH, \
+        MODE, STOP_TIMEOUT, LOOP, METRICS
     MAX_PLAYERS = max_players
+    MAX_MATCHES = max_matches
     PIPE_MAIN = pipe_main
     QUEUE_SUBPROC = queue_subproc
+    QUEUE_MATCH = queue_match
     MODE = mode
     STOP_TIMEOUT = stop_timeout
-    ws_thread = threading.Thread(target=_run_server, args=(port,))
-    ws_thread.start()
-    asyncio.set_event_loop(asyncio.new_event_loop())
-    asyncio.get_event_loop().run_until_complete(program_loop())
-    asyncio.get_event_loop().run_forever()
-    ws_thread.join()
+    LOOP = asyncio.new_event_loop()
+    asyncio.set_event_loop(LOOP)
+    server = LOOP.run_until_complete(_serve(port))
+    METRICS = metrics.Metrics(gauges=_gauges)
+    if metrics_port or metrics_path:
+        METRICS.watch_loop(LOOP)
+    if metrics_port:
+        LOOP.run_until_complete(METRICS.serve(metrics_port))
+    if metrics_path:
+        LOOP.call_later(metrics_interval, METRICS.dump, LOOP, metrics_path,
+                        metrics_interval)
+    LOOP.add_reader(PIPE_MAIN.fileno(), _main_readable)
+    threading.Thread(target=_watch_queue, daemon=True).start()
+    try:
+        LOOP.run_forever()
+    finally:
+        server.close()
@@ -0,0 +1,169 @@
+'''Builds the per agent observations from persistent buffers.
+
+The ObservationBuilder keeps the bomb and flame maps of the whole board
+between steps and only rewrites the cells of the bombs and flames that were
+there last step or are there now. Fogged views for partially observable games
+are made by slicing the agent's view window out of those maps.
+'''
+import numpy as np
+
+from . import constants
+from . import utility
+
+_FOG = constants.Item.Fog.value
+
+
+def _read_only(array):
+    '''Returns a view of array that can not be written to'''
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class ObservationBuilder(object):
+    """Persistent buffers for ForwardModel.get_observations.
+
+    With copy=True every call returns fresh arrays, which callers are free to
+    keep and modify. With copy=False no arrays are allocated: the returned
+    arrays are read-only views of the builder's buffers and are overwritten
+    by the next call, so callers that keep observations should ask for
+    copies instead.
+    """
+
+    MAP_KEYS = ('bomb_blast_strength', 'bomb_life', 'bomb_moving_direction',
+                'flame_life')
+
+    def __init__(self, board_size, num_agents, is_partially_observable,
+                 agent_view_size):
+        self.board_size = board_size
+        self.num_agents = num_agents
+        self.is_partially_observable = is_partially_observable
+        self.agent_view_size = agent_view_size
+
+        shape = (board_size, board_size)
+        self._maps = {key: np.zeros(shape) for key in self.MAP_KEYS}
+        self._bomb_cells = (np.zeros(0, dtype=np.int64),) * 2
+        self._flame_cells = (np.zeros(0, dtype=np.int64),) * 2
+
+        # The fogged views of each agent and the window each one shows.
+        self._views = []
+        self._windows = []
+        if is_partially_observable:
+            for _ in range(num_agents):
+                view = {key: np.zeros(shape) for key in self.MAP_KEYS}
+                view['board'] = np.full(shape, _FOG, dtype=np.uint8)
+                self._views.append(view)
+                self._windows.append(None)
+
+    def matches(self, board_size, num_agents, is_partially_observable,
+                agent_view_size):
+        '''Whether this builder can be used for the given game settings'''
+        return (self.board_size, self.num_agents,
+                self.is_partially_observable, self.agent_view_size) == \
+               (board_size, num_agents, is_partially_observable,
+                agent_view_size)
+
+    def _update_maps(self, bombs, flames):
+        '''Rewrites only the cells of last step's and this step's entities'''
+        maps = self._maps
+        for key in self.MAP_KEYS[:3]:
+            maps[key][self._bomb_cells] = 0
+        maps['flame_life'][self._flame_cells] = 0
+
+        rows = np.array([bomb.position[0] for bomb in bombs], dtype=np.int64)
+        cols = np.array([bomb.position[1] for bomb in bombs], dtype=np.int64)
+        maps['bomb_blast_strength'][rows, cols] = [
+            bomb.blast_strength for bomb in bombs]
+        maps['bomb_life'][rows, cols] = [bomb.life for bomb in bombs]
+        for bomb in bombs:
+            if bomb.moving_direction is not None:
+                maps['bomb_moving_direction'][bomb.position] = \
+                    bomb.moving_direction.value
+        self._bomb_cells = (rows, cols)
+
+        rows = np.array([flame.position[0] for flame in flames],
+                        dtype=np.int64)
+        cols = np.array([flame.position[1] for flame in flames],
+                        dtype=np.int64)
+        # +1 needed because flame removal check is done before flame is ticked
+        # down, i.e. flame life in environment is 2 -> 1 -> 0 -> dead
+        maps['flame_life'][rows, cols] = [flame.life + 1 for flame in flames]
+        self._flame_cells = (rows, cols)
+
+    def _window(self, position):
+        '''The slice of the board in view of an agent at position'''
+        row, col = position
+        size = self.agent_view_size
+        return (slice(max(0, row - size), row + size + 1),
+                slice(max(0, col - size), col + size + 1))
+
+    def _update_view(self, num_agent, board, position):
+        '''Moves an agent's fogged view to its current window'''
+        view = self._views[num_agent]
+        previous = self._windows[num_agent]
+        if previous is not None:
+            view['board'][previous] = _FOG
+            for key in self.MAP_KEYS:
+                view[key][previous] = 0
+
+        window = self._window(position)
+        view['board'][window] = board[window]
+        for key in self.MAP_KEYS:
+            view[key][window] = self._maps[key][window]
+        self._windows[num_agent] = window
+        return view
+
+    def build(self, board, agents, bombs, flames, game_type, game_env,
+              copy=True):
+        """Returns the observations of all agents.
+
+        Args:
+          board: The current board.
+          agents: The agents to make observations for.
+          bombs: The list of Bomb objects.
+          flames: The list of Flame objects.
+          game_type: The constants.GameType of the game.
+          game_env: The env entry point string.
+          copy: Whether to return fresh arrays or read-only views of the
+            buffers that stay valid until the next call.
+
+        Returns:
+          A list of observation dicts, one per agent.
+        """
+        self._update_maps(bombs, flames)
+
+        def export(array):
+            '''Hands out an array according to the copy policy'''
+            return array.copy() if copy else _read_only(array)
+
+        attrs = [
+            'position', 'blast_strength', 'can_kick', 'teammate', 'ammo',
+            'enemies'
+        ]
+        alive_agents = [
+            utility.agent_value(agent.agent_id)
+            for agent in agents
+            if agent.is_alive
+        ]
+
+        observations = []
+        for num_agent, agent in enumerate(agents):
+            agent_obs = {'alive': alive_agents}
+            if self.is_partially_observable:
+                view = self._update_view(num_agent, board, agent.position)
+                agent_obs['board'] = export(view['board'])
+            else:
+                view = self._maps
+                # The full board has always been handed out as is.
+                agent_obs['board'] = board if copy else _read_only(board)
+            for key in self.MAP_KEYS:
+                agent_obs[key] = export(view[key])
+            agent_obs['game_type'] = game_type.value
+            agent_obs['game_env'] = game_env
+
+            for attr in attrs:
+                assert hasattr(agent, attr)
+                agent_obs[attr] = getattr(agent, attr)
+            observations.append(agent_obs)
+
+        return observations
@@ -0,0 +1,155 @@
+'''Optional timers and counters for the phases of a game step.
+
+ForwardModel.step, ForwardModel.get_observations, ForwardModel.act and
+Pomme.step time their phases into the active Profiler, if there is one.
+When profiling is off the only cost is a check of `profiling.active` per
+phase.
+
+An example:
+
+    profiler = profiling.enable(trace=True)
+    ... run some games ...
+    profiling.disable()
+    print(profiler.summary())
+    profiler.save_chrome_trace('trace.json')
+
+The trace can be opened in chrome://tracing or https://ui.perfetto.dev.
+'''
+from collections import defaultdict
+import contextlib
+import json
+import os
+import threading
+import time
+
+# The Profiler the instrumented code reports to. None when profiling is off.
+active = None
+
+_clock = time.perf_counter
+
+
+class Profiler(object):
+    """Collects the time spent in named sections and counts of events.
+
+    Sections are timed with start and lap, which keeps the instrumented
+    code flat:
+
+        start = profiler.start()
+        ...
+        start = profiler.lap('phase one', start)
+        ...
+        profiler.lap('phase two', start)
+    """
+
+    def __init__(self, trace=False):
+        '''Makes an empty Profiler.
+
+        Args:
+          trace: Also keep every timed section as an event, so they can be
+            saved with save_chrome_trace. This takes memory for every
+            section of every step.
+        '''
+        self.trace = trace
+        self.reset()
+
+    def reset(self):
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.maxima = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.events = []
+        self._origin = _clock()
+
+    start = staticmethod(_clock)
+
+    def lap(self, name, start):
+        '''Adds the time since start to the section name.
+
+        Returns:
+          The time now, to use as the start of the next section.
+        '''
+        now = _clock()
+        duration = now - start
+        self.totals[name] += duration
+        self.calls[name] += 1
+        if duration > self.maxima[name]:
+            self.maxima[name] = duration
+        if self.trace:
+            self.events.append((name, start, duration,
+                                threading.get_ident()))
+        return now
+
+    @contextlib.contextmanager
+    def section(self, name):
+        '''Times the body of a with block as the section name'''
+        start = _clock()
+        try:
+            yield
+        finally:
+            self.lap(name, start)
+
+    def count(self, name, value=1):
+        '''Adds value to the counter name'''
+        self.counters[name] += value
+
+    def summary(self):
+        '''Returns a table of the sections and the counters as a string'''
+        lines = []
+        if self.totals:
+            width = max(len(name) for name in self.totals)
+            lines.append('{:<{}} {:>9} {:>11} {:>11} {:>11}'.format(
+                'section', width, 'calls', 'total ms', 'mean us', 'max us'))
+            for name in sorted(self.totals):
+                total = self.totals[name]
+                calls = self.calls[name]
+                lines.append('{:<{}} {:>9} {:>11.1f} {:>11.1f} {:>11.1f}'.format(
+                    name, width, calls, total * 1e3, total / calls * 1e6,
+                    self.maxima[name] * 1e6))
+        if self.counters:
+            if lines:
+                lines.append('')
+            width = max(len(name) for name in self.counters)
+            lines.append('{:<{}} {:>9}'.format('counter', width, 'count'))
+            for name in sorted(self.counters):
+                lines.append('{:<{}} {:>9}'.format(name, width,
+                                                   self.counters[name]))
+        return '\n'.join(lines)
+
+    def to_chrome_trace(self):
+        '''Returns the events in the Chrome trace event format'''
+        pid = os.getpid()
+        events = [{
+            'name': name,
+            'ph': 'X',
+            'ts': (start - self._origin) * 1e6,
+            'dur': duration * 1e6,
+            'pid': pid,
+            'tid': tid,
+        } for name, start, duration, tid in self.events]
+        events.extend({
+            'name': name,
+            'ph': 'C',
+            'ts': (_clock() - self._origin) * 1e6,
+            'pid': pid,
+            'args': {'count': value},
+        } for name, value in sorted(self.counters.items()))
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path):
+        '''Writes the events to path, see to_chrome_trace'''
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+def enable(profiler=None, trace=False):
+    '''Starts reporting to profiler, or to a new Profiler, and returns it'''
+    global active
+    active = profiler or Profiler(trace=trace)
+    return active
+
+
+def disable():
+    '''Stops profiling and returns the Profiler that was active'''
+    global active
+    profiler, active = active, None
+    return profiler
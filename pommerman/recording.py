@@ -0,0 +1,166 @@
+'''Compact binary replays of games.
+
+A replay is a zip file of compressed .npy arrays (so np.load can open it as
+well). It holds a header, the actions of every step and keyframes with the
+full game state. The first keyframe is the initial state and more can be
+added every keyframe_interval steps, which makes seeking faster. Any other
+step is rebuilt by a replay.Replay from the nearest keyframe.
+
+The writer streams the actions out in chunks, so a game is never held in
+memory and only one file is written per game.
+'''
+import io
+import json
+import zipfile
+
+import numpy as np
+
+from . import constants
+from . import replay
+
+HEADER = 'header.json'
+ACTIONS_CHUNK_SIZE = 256
+
+def _write_array(archive, name, array):
+    with archive.open(name + '.npy', 'w') as f:
+        np.lib.format.write_array(f, np.asarray(array), allow_pickle=False)
+
+
+def _read_array(archive, name):
+    with archive.open(name + '.npy') as f:
+        return np.lib.format.read_array(io.BytesIO(f.read()),
+                                        allow_pickle=False)
+
+
+class ReplayWriter(object):
+    """Streams a game into a replay file.
+
+    Call write_step after every step and close at the end of the game. The
+    file can only be read once it is closed.
+    """
+
+    def __init__(self, path, header, board, agents, bombs, items, flames,
+                 keyframe_interval=None):
+        '''Opens the file and writes the initial state as keyframe 0.
+
+        Args:
+          path: The file to write.
+          header: A json serializable dict describing the game. It needs
+            game_type (the int value) and max_blast_strength to be readable.
+          board, agents, bombs, items, flames: The initial game state.
+          keyframe_interval: Store a keyframe every this many steps. None
+            only stores the initial state.
+        '''
+        self.header = dict(header)
+        self.keyframe_interval = keyframe_interval
+        self.num_steps = 0
+        self._archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        self._actions = []
+        self._num_chunks = 0
+        self._keyframe_steps = []
+        self._pending_keyframe = None
+        self.write_keyframe(0, board, agents, bombs, items, flames)
+
+    def write_keyframe(self, step, board, agents, bombs, items, flames):
+        '''Stores the state after step. A later call for the same step wins'''
+        if self._pending_keyframe and self._pending_keyframe[0] != step:
+            self._flush_keyframe()
+        self._pending_keyframe = (step, replay.state_to_arrays(
+            board, agents, bombs, items, flames))
+
+    def _flush_keyframe(self):
+        step, arrays = self._pending_keyframe
+        for key, array in arrays.items():
+            _write_array(self._archive, 'keyframe_%d_%s' % (step, key), array)
+        self._keyframe_steps.append(step)
+        self._pending_keyframe = None
+
+    def write_step(self, actions):
+        '''Records the actions of a step'''
+        self._actions.append([action or 0 for action in actions])
+        self.num_steps += 1
+        if len(self._actions) == ACTIONS_CHUNK_SIZE:
+            self._flush_actions()
+
+    def keyframe_due(self):
+        '''Whether the state after the last step should be a keyframe'''
+        return bool(self.keyframe_interval) and \
+            self.num_steps % self.keyframe_interval == 0
+
+    def _flush_actions(self):
+        if self._actions:
+            _write_array(self._archive, 'actions_%d' % self._num_chunks,
+                         np.array(self._actions, dtype=np.uint8))
+            self._num_chunks += 1
+            self._actions = []
+
+    def close(self, info=None):
+        '''Writes the remaining data and the header and closes the file'''
+        if self._archive is None:
+            return
+        self._flush_actions()
+        if self._pending_keyframe:
+            self._flush_keyframe()
+        self.header['num_steps'] = self.num_steps
+        self.header['num_action_chunks'] = self._num_chunks
+        self.header['keyframes'] = self._keyframe_steps
+        if info is not None:
+            self.header['result'] = info['result'].name
+            if 'winners' in info:
+                self.header['winners'] = info['winners']
+        self._archive.writestr(HEADER, json.dumps(self.header))
+        self._archive.close()
+        self._archive = None
+
+
+class ReplayReader(object):
+    """Reads a replay file and rebuilds the state of any step."""
+
+    def __init__(self, path, checkpoint_interval=100):
+        self._archive = zipfile.ZipFile(path, 'r')
+        self.header = json.loads(self._archive.read(HEADER).decode('utf-8'))
+        self.num_steps = self.header['num_steps']
+        self.keyframes = self.header['keyframes']
+        chunks = [
+            _read_array(self._archive, 'actions_%d' % num)
+            for num in range(self.header['num_action_chunks'])
+        ]
+        self.actions = np.concatenate(chunks) if chunks else \
+            np.zeros((0, 0), dtype=np.uint8)
+
+        record = replay.GameRecord(
+            self.keyframe(0),
+            constants.GameType(self.header['game_type']),
+            self.header['max_blast_strength'],
+            config=self.header.get('config'),
+            step_count=self.header.get('step_count', 0),
+            actions=self.actions.tolist())
+        self._replay = replay.Replay(record, checkpoint_interval)
+        for step in self.keyframes[1:]:
+            self._replay.add_checkpoint(step, self.keyframe(step))
+
+    def __len__(self):
+        return self.num_steps + 1
+
+    def keyframe(self, step):
+        '''Returns the arrays of the keyframe stored for step'''
+        return {
+            key: _read_array(self._archive, 'keyframe_%d_%s' % (step, key))
+            for key in replay.STATE_KEYS
+        }
+
+    def get_state(self, step):
+        '''Returns (board, agents, bombs, items, flames) after step steps.
+
+        See replay.Replay.get_state.
+        '''
+        return self._replay.get_state(step)
+
+    def close(self):
+        self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
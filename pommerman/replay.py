@@ -0,0 +1,255 @@
+'''Rebuilds games from their initial state and actions.
+
+The game is deterministic given its initial board, items and agents and the
+actions of every step, so that is all a GameRecord stores. Pomme keeps one
+for the game it plays (see Pomme.get_record). A Replay rebuilds the state
+after any step by running the ForwardModel from the nearest checkpoint and
+adds checkpoints as it goes, so seeking back and forth stays cheap.
+'''
+import gzip
+import json
+
+import numpy as np
+
+from . import characters
+from . import constants
+from . import forward_model
+
+# The columns of the arrays that a state is packed into.
+AGENT_FIELDS = ('row', 'col', 'ammo', 'is_alive', 'blast_strength',
+                'can_kick')
+BOMB_FIELDS = ('row', 'col', 'bomber_id', 'life', 'blast_strength',
+               'moving_direction')
+FLAME_FIELDS = ('row', 'col', 'life')
+ITEM_FIELDS = ('row', 'col', 'item')
+STATE_KEYS = ('board', 'agents', 'bombs', 'flames', 'items')
+
+
+def state_to_arrays(board, agents, bombs, items, flames):
+    '''Packs a game state into a dict of int arrays'''
+    def table(rows, width):
+        return np.array(rows, dtype=np.int64).reshape(-1, width)
+
+    return {
+        'board': np.array(board, dtype=np.uint8),
+        'agents': table([
+            tuple(agent.position) + (agent.ammo, agent.is_alive,
+                                     agent.blast_strength, agent.can_kick)
+            for agent in agents
+        ], len(AGENT_FIELDS)),
+        'bombs': table([
+            tuple(bomb.position) + (bomb.bomber.agent_id, bomb.life,
+                                    bomb.blast_strength,
+                                    bomb.moving_direction.value
+                                    if bomb.moving_direction is not None
+                                    else 0)
+            for bomb in bombs
+        ], len(BOMB_FIELDS)),
+        'flames': table([tuple(flame.position) + (flame.life,)
+                         for flame in flames], len(FLAME_FIELDS)),
+        'items': table([tuple(position) + (item,)
+                        for position, item in items.items()],
+                       len(ITEM_FIELDS)),
+    }
+
+
+def arrays_to_state(arrays, agents):
+    '''Unpacks the arrays of state_to_arrays.
+
+    Args:
+      arrays: The dict of arrays.
+      agents: The Bomber characters, ordered by agent_id. They are reset to
+        the state in arrays.
+
+    Returns:
+      A tuple of (board, agents, bombs, items, flames).
+    '''
+    board = np.array(arrays['board'], dtype=np.uint8)
+    for agent, (row, col, ammo, is_alive, blast_strength, can_kick) in zip(
+            agents, np.asarray(arrays['agents']).tolist()):
+        agent.set_start_position((row, col))
+        agent.reset(ammo, bool(is_alive), blast_strength, bool(can_kick))
+
+    bombs = []
+    for row, col, bomber_id, life, blast_strength, moving_direction in \
+            np.asarray(arrays['bombs']).tolist():
+        bombs.append(
+            characters.Bomb(agents[bomber_id], (row, col), life,
+                            blast_strength,
+                            constants.Action(moving_direction)
+                            if moving_direction else None))
+    flames = [
+        characters.Flame((row, col), life)
+        for row, col, life in np.asarray(arrays['flames']).tolist()
+    ]
+    items = {(row, col): item
+             for row, col, item in np.asarray(arrays['items']).tolist()}
+    return board, agents, bombs, items, flames
+
+
+def simulate(state, actions, step_count, max_blast_strength,
+             collapses=None):
+    '''Runs one step of the game.
+
+    Args:
+      state: A tuple of (board, agents, bombs, items, flames). It is changed
+        in place like in ForwardModel.step.
+      actions: The actions of all agents.
+      step_count: The env's step count before the step.
+      max_blast_strength: As in ForwardModel.step.
+      collapses: The collapse schedule of the v1 env, if any.
+
+    Returns:
+      The state after the step.
+    '''
+    model = forward_model.ForwardModel
+    board, agents, bombs, items, flames = model.step(
+        actions, *state, max_blast_strength=max_blast_strength)[:5]
+    if collapses and step_count + 1 in collapses:
+        board, bombs, flames = model.collapse_board(
+            collapses.index(step_count + 1), board, agents, bombs, items,
+            flames)
+    return board, agents, bombs, items, flames
+
+
+class GameRecord(object):
+    """The initial state and the actions of a game.
+
+    This is all that is needed to rebuild the game. The seed is the one the
+    env was seeded with and is kept for reference.
+    """
+
+    def __init__(self,
+                 initial,
+                 game_type,
+                 max_blast_strength,
+                 config=None,
+                 seed=None,
+                 step_count=0,
+                 collapses=None,
+                 actions=None):
+        self.initial = initial
+        self.game_type = game_type
+        self.max_blast_strength = max_blast_strength
+        self.config = config
+        self.seed = seed
+        self.step_count = step_count
+        self.collapses = collapses
+        self.actions = actions or []
+        self.info = None
+
+    def add_step(self, actions):
+        '''Records the actions of a step'''
+        self.actions.append([action or 0 for action in actions])
+
+    def to_json(self):
+        ret = {
+            'config': self.config,
+            'seed': self.seed,
+            'game_type': self.game_type.value,
+            'max_blast_strength': self.max_blast_strength,
+            'step_count': self.step_count,
+            'collapses': self.collapses,
+            'actions': self.actions,
+        }
+        for key in STATE_KEYS:
+            ret[key] = np.asarray(self.initial[key]).tolist()
+        if self.info is not None:
+            ret['result'] = self.info['result'].name
+            if 'winners' in self.info:
+                ret['winners'] = self.info['winners']
+        return ret
+
+    @classmethod
+    def from_json(cls, data):
+        '''Makes a GameRecord from the dict of to_json'''
+        shapes = {'agents': len(AGENT_FIELDS), 'bombs': len(BOMB_FIELDS),
+                  'flames': len(FLAME_FIELDS), 'items': len(ITEM_FIELDS)}
+        initial = {'board': np.array(data['board'], dtype=np.uint8)}
+        for key, width in shapes.items():
+            initial[key] = np.array(data[key], dtype=np.int64).reshape(
+                -1, width)
+        return cls(
+            initial,
+            constants.GameType(data['game_type']),
+            data['max_blast_strength'],
+            config=data.get('config'),
+            seed=data.get('seed'),
+            step_count=data.get('step_count', 0),
+            collapses=data.get('collapses'),
+            actions=data['actions'])
+
+    def save(self, path):
+        '''Writes the record as json, gzipped if path ends with .gz'''
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'wt') as f:
+            json.dump(self.to_json(), f)
+
+    @classmethod
+    def load(cls, path):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            return cls.from_json(json.load(f))
+
+
+class Replay(object):
+    """Rebuilds the state of a game after any number of steps.
+
+    Checkpoints are packed states. Step 0 is always one, more are added every
+    checkpoint_interval steps while simulating, and recording.ReplayReader
+    adds the keyframes of a replay file. The last rebuilt state is kept too,
+    so reading the steps in order runs the ForwardModel once per step.
+    """
+
+    def __init__(self, record, checkpoint_interval=100):
+        self.record = record
+        self.checkpoint_interval = checkpoint_interval
+        self._checkpoints = {0: record.initial}
+        self._cache = None
+
+    def __len__(self):
+        return len(self.record.actions) + 1
+
+    def add_checkpoint(self, step, arrays):
+        '''Uses arrays as the state after step'''
+        self._checkpoints[step] = arrays
+        if self._cache is not None and self._cache[0] >= step:
+            self._cache = None
+
+    def _new_agents(self, num_agents):
+        return [
+            characters.Bomber(agent_id, self.record.game_type)
+            for agent_id in range(num_agents)
+        ]
+
+    def get_state(self, step):
+        '''Returns (board, agents, bombs, items, flames) after step steps.
+
+        Step 0 is the initial state. The returned objects are new, the agents
+        being Bomber characters, so they can be changed freely.
+        '''
+        assert 0 <= step < len(self), \
+            'Step {} is not in [0, {}]'.format(step, len(self) - 1)
+        start = max(checkpoint for checkpoint in self._checkpoints
+                    if checkpoint <= step)
+        if self._cache is not None and start <= self._cache[0] <= step:
+            current, state = self._cache
+        else:
+            arrays = self._checkpoints[start]
+            current = start
+            state = arrays_to_state(
+                arrays, self._new_agents(len(arrays['agents'])))
+
+        record = self.record
+        for num_step in range(current, step):
+            state = simulate(state, record.actions[num_step],
+                             record.step_count + num_step,
+                             record.max_blast_strength, record.collapses)
+            if self.checkpoint_interval and \
+               (num_step + 1) % self.checkpoint_interval == 0:
+                self._checkpoints[num_step + 1] = state_to_arrays(*state)
+        self._cache = (step, state)
+
+        # Hand out a copy so the cached state can't be changed from outside.
+        arrays = state_to_arrays(*state)
+        return arrays_to_state(arrays, self._new_agents(len(arrays['agents'])))
@@ -2,6 +2,7 @@
 import abc
 import logging
 import json
+from .. import binary_obs
 from .. import constants
 import numpy as np
 from flask import Flask, jsonify, request
@@ -27,20 +28,25 @@ class DockerAgentRunner(metaclass=abc.ABCMeta):
         @app.route("/action", methods=["POST"])
         def action(): #pylint: disable=W0612
             '''handles an action over http'''
-            data = request.get_json()
-            observation = data.get("obs")
-            observation = json.loads(observation)
+            if request.mimetype == binary_obs.CONTENT_TYPE:
+                # The arrays are read-only views of the request body.
+                observation, action_space = binary_obs.decode(
+                    request.get_data())
+            else:
+                data = request.get_json()
+                observation = data.get("obs")
+                observation = json.loads(observation)
+                observation['board'] = np.array(observation['board'], dtype=np.uint8)
+                observation['bomb_life'] = np.array(observation['bomb_life'], dtype=np.float64)
+                observation['bomb_blast_strength'] = np.array(observation['bomb_blast_strength'], dtype=np.float64)
+                action_space = data.get("action_space")
+                action_space = json.loads(action_space)
 
             observation['teammate'] = constants.Item(observation['teammate'])
             for enemy_id in range(len(observation['enemies'])):
                 observation['enemies'][enemy_id] = constants.Item(observation['enemies'][enemy_id])
             observation['position'] = tuple(observation['position'])
-            observation['board'] = np.array(observation['board'], dtype=np.uint8)
-            observation['bomb_life'] = np.array(observation['bomb_life'], dtype=np.float64)
-            observation['bomb_blast_strength'] = np.array(observation['bomb_blast_strength'], dtype=np.float64)
 
-            action_space = data.get("action_space")
-            action_space = json.loads(action_space)
             action = self.act(observation, action_space)
             return jsonify({"action": action})
 
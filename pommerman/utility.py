@@ -1,6 +1,7 @@
 '''This file contains a set of utility functions that
 help with positioning, building a game board, and
 encoding data to be used later'''
+import functools
 import itertools
 import json
 import random
@@ -9,6 +10,7 @@ from jsonmerge import Merger
 
 from gym import spaces
 import numpy as np
+from scipy import ndimage
 
 from . import constants
 
@@ -52,6 +54,10 @@ def make_board(size, num_rigid=0, num_wood=0, num_agents=4):
      9 - skull
      10 - 13: agents
 
+    The walls are laid in pairs mirrored over the diagonal, all of them in one
+    draw. A board where more than 4 passages can't be reached is repaired by
+    moving the rigid walls that cut them off, see _repair_board.
+
     Args:
       size: The dimension of the board, i.e. it's sizeXsize.
       num_rigid: The number of rigid walls on the board. This should be even.
@@ -60,97 +66,153 @@ def make_board(size, num_rigid=0, num_wood=0, num_agents=4):
     Returns:
       board: The resulting random board.
     """
+    assert (num_rigid % 2 == 0)
+    assert (num_wood % 2 == 0)
+    template, rows, cols, agents, num_fixed_wood = _board_layout(
+        size, num_agents)
+    num_rigid_pairs = num_rigid // 2
+    num_wood_pairs = max(num_wood - num_fixed_wood, 0) // 2
+    num_pairs = num_rigid_pairs + num_wood_pairs
+    assert num_pairs <= len(rows), \
+        'There is only room for {} walls'.format(2 * len(rows))
+
+    values = np.array([constants.Item.Rigid.value] * num_rigid_pairs +
+                      [constants.Item.Wood.value] * num_wood_pairs,
+                      dtype=np.uint8)
+    while True:
+        board = template.copy()
+        pairs = np.random.choice(len(rows), num_pairs, replace=False)
+        board[rows[pairs], cols[pairs]] = values
+        board[cols[pairs], rows[pairs]] = values
+        # Make sure it's possible to reach most of the passages.
+        if _repair_board(board, rows, cols, agents[-1]):
+            return board
+
+
+@functools.lru_cache(maxsize=None)
+def _board_layout(size, num_agents):
+    """Returns what all boards of this size and number of agents share.
 
-    def lay_wall(value, num_left, coordinates, board):
-        '''Lays all of the walls on a board'''
-        x, y = random.sample(coordinates, 1)[0]
-        coordinates.remove((x, y))
-        coordinates.remove((y, x))
-        board[x, y] = value
-        board[y, x] = value
-        num_left -= 2
-        return num_left
-
-    def make(size, num_rigid, num_wood, num_agents):
-        '''Constructs a game/board'''
-        # Initialize everything as a passage.
-        board = np.ones((size,
-                         size)).astype(np.uint8) * constants.Item.Passage.value
-
-        # Gather all the possible coordinates to use for walls.
-        coordinates = set([
-            (x, y) for x, y in \
-            itertools.product(range(size), range(size)) \
-            if x != y])
-
-        # Set the players down. Exclude them from coordinates.
-        # Agent0 is in top left. Agent1 is in bottom left.
-        # Agent2 is in bottom right. Agent 3 is in top right.
-        assert (num_agents % 2 == 0)
-
-        if num_agents == 2:
-            board[1, 1] = constants.Item.Agent0.value
-            board[size - 2, size - 2] = constants.Item.Agent1.value
-            agents = [(1, 1), (size - 2, size - 2)]
-        else:
-            board[1, 1] = constants.Item.Agent0.value
-            board[size - 2, 1] = constants.Item.Agent1.value
-            board[size - 2, size - 2] = constants.Item.Agent2.value
-            board[1, size - 2] = constants.Item.Agent3.value
-            agents = [(1, 1), (size - 2, 1), (1, size - 2), (size - 2, size - 2)]
-
-        for position in agents:
-            if position in coordinates:
-                coordinates.remove(position)
-
-        # Exclude breathing room on either side of the agents.
-        for i in range(2, 4):
+    Returns:
+      A tuple of (template, rows, cols, agents, num_fixed_wood). template is
+      the board with the agents and the wood that guarantees a passage to the
+      other agents. rows and cols are the cells above the diagonal where
+      walls can go, each standing for a pair of cells.
+    """
+    # Initialize everything as a passage.
+    board = np.ones((size,
+                     size)).astype(np.uint8) * constants.Item.Passage.value
+
+    # Gather all the possible coordinates to use for walls.
+    coordinates = set([
+        (x, y) for x, y in \
+        itertools.product(range(size), range(size)) \
+        if x != y])
+
+    # Set the players down. Exclude them from coordinates.
+    # Agent0 is in top left. Agent1 is in bottom left.
+    # Agent2 is in bottom right. Agent 3 is in top right.
+    assert (num_agents % 2 == 0)
+
+    if num_agents == 2:
+        board[1, 1] = constants.Item.Agent0.value
+        board[size - 2, size - 2] = constants.Item.Agent1.value
+        agents = [(1, 1), (size - 2, size - 2)]
+    else:
+        board[1, 1] = constants.Item.Agent0.value
+        board[size - 2, 1] = constants.Item.Agent1.value
+        board[size - 2, size - 2] = constants.Item.Agent2.value
+        board[1, size - 2] = constants.Item.Agent3.value
+        agents = [(1, 1), (size - 2, 1), (1, size - 2), (size - 2, size - 2)]
+
+    for position in agents:
+        if position in coordinates:
+            coordinates.remove(position)
+
+    # Exclude breathing room on either side of the agents.
+    for i in range(2, 4):
+        coordinates.remove((1, i))
+        coordinates.remove((i, 1))
+        coordinates.remove((size - 2, size - i - 1))
+        coordinates.remove((size - i - 1, size - 2))
+
+        if num_agents == 4:
+            coordinates.remove((1, size - i - 1))
+            coordinates.remove((size - i - 1, 1))
+            coordinates.remove((i, size - 2))
+            coordinates.remove((size - 2, i))
+
+    # Lay down wooden walls providing guaranteed passage to other agents.
+    wood = constants.Item.Wood.value
+    num_fixed_wood = 0
+    if num_agents == 4:
+        for i in range(4, size - 4):
+            board[1, i] = wood
+            board[size - i - 1, 1] = wood
+            board[size - 2, size - i - 1] = wood
+            board[size - i - 1, size - 2] = wood
             coordinates.remove((1, i))
-            coordinates.remove((i, 1))
+            coordinates.remove((size - i - 1, 1))
             coordinates.remove((size - 2, size - i - 1))
             coordinates.remove((size - i - 1, size - 2))
+            num_fixed_wood += 4
 
-            if num_agents == 4:
-                coordinates.remove((1, size - i - 1))
-                coordinates.remove((size - i - 1, 1))
-                coordinates.remove((i, size - 2))
-                coordinates.remove((size - 2, i))
+    # The coordinates are symmetric, so the pairs are the ones above the
+    # diagonal.
+    rows, cols = np.array(sorted((x, y) for x, y in coordinates if x < y),
+                          dtype=np.int64).reshape(-1, 2).T
+    for array in [board, rows, cols]:
+        array.setflags(write=False)
+    return board, rows, cols, tuple(agents), num_fixed_wood
 
-        # Lay down wooden walls providing guaranteed passage to other agents.
-        wood = constants.Item.Wood.value
-        if num_agents == 4:
-            for i in range(4, size - 4):
-                board[1, i] = wood
-                board[size - i - 1, 1] = wood
-                board[size - 2, size - i - 1] = wood
-                board[size - i - 1, size - 2] = wood
-                coordinates.remove((1, i))
-                coordinates.remove((size - i - 1, 1))
-                coordinates.remove((size - 2, size - i - 1))
-                coordinates.remove((size - i - 1, size - 2))
-                num_wood -= 4
-
-        # Lay down the rigid walls.
-        while num_rigid > 0:
-            num_rigid = lay_wall(constants.Item.Rigid.value, num_rigid,
-                                 coordinates, board)
-
-        # Lay down the wooden walls.
-        while num_wood > 0:
-            num_wood = lay_wall(constants.Item.Wood.value, num_wood,
-                                coordinates, board)
-
-        return board, agents
 
-    assert (num_rigid % 2 == 0)
-    assert (num_wood % 2 == 0)
-    board, agents = make(size, num_rigid, num_wood, num_agents)
+def _grow(mask):
+    """Returns mask together with the cells next to it"""
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown
+
+
+def _repair_board(board, rows, cols, agent_position, max_repairs=10):
+    """Reconnects the passages that can't be reached from agent_position.
 
-    # Make sure it's possible to reach most of the passages.
-    while len(inaccessible_passages(board, agents)) > 4:
-        board, agents = make(size, num_rigid, num_wood, num_agents)
+    While more than 4 passages are cut off, a rigid wall pair between them
+    and the reachable part of the board is swapped with a random passage
+    pair in the reachable part. This keeps the numbers of walls and the
+    symmetry of the board. The board is changed in place.
+
+    Returns:
+      Whether the board is good. If it is not after max_repairs swaps, a
+      new board should be drawn.
+    """
+    rigid_value = constants.Item.Rigid.value
+    passage_value = constants.Item.Passage.value
+    for _ in range(max_repairs + 1):
+        open_cells = board != rigid_value
+        labels, _ = ndimage.label(open_cells)
+        reached = labels == labels[agent_position]
+        cut_off = open_cells & ~reached
+        if np.count_nonzero(cut_off & (board == passage_value)) <= 4:
+            return True
 
-    return board
+        # The walls in rows, cols that have the cut off passages on one side
+        # and the reached part on the other.
+        between = ~open_cells & _grow(reached) & _grow(cut_off)
+        walls = np.flatnonzero(between[rows, cols] | between[cols, rows])
+        passages = np.flatnonzero((board[rows, cols] == passage_value) &
+                                  reached[rows, cols])
+        if not len(walls) or not len(passages):
+            return False
+        wall = walls[np.random.randint(len(walls))]
+        passage = passages[np.random.randint(len(passages))]
+        board[rows[wall], cols[wall]] = passage_value
+        board[cols[wall], rows[wall]] = passage_value
+        board[rows[passage], cols[passage]] = rigid_value
+        board[cols[passage], rows[passage]] = rigid_value
+    return False
 
 
 def make_items(board, num_items):
@@ -173,32 +235,15 @@ def make_items(board, num_items):
 
 
 def inaccessible_passages(board, agent_positions):
-    """Return inaccessible passages on this board."""
-    seen = set()
-    agent_position = agent_positions.pop()
-    passage_positions = np.where(board == constants.Item.Passage.value)
-    positions = list(zip(passage_positions[0], passage_positions[1]))
-
-    Q = [agent_position]
-    while Q:
-        row, col = Q.pop()
-        for (i, j) in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
-            next_position = (row + i, col + j)
-            if next_position in seen:
-                continue
-            if not position_on_board(board, next_position):
-                continue
-            if position_is_rigid(board, next_position):
-                continue
-
-            if next_position in positions:
-                positions.pop(positions.index(next_position))
-                if not len(positions):
-                    return []
-
-            seen.add(next_position)
-            Q.append(next_position)
-    return positions
+    """Return inaccessible passages on this board.
+
+    These are the passages that can't be reached from the last of
+    agent_positions without crossing rigid walls.
+    """
+    labels, _ = ndimage.label(board != constants.Item.Rigid.value)
+    reached = labels == labels[tuple(agent_positions[-1])]
+    rows, cols = np.where((board == constants.Item.Passage.value) & ~reached)
+    return list(zip(rows.tolist(), cols.tolist()))
 
 
 def is_valid_direction(board, position, direction, invalid_values=None):
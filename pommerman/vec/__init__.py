@@ -0,0 +1,4 @@
+'''Runs many pommerman envs in parallel worker processes'''
+from .vec_env import VecEnv
+from .vec_env import action_space
+from .vec_env import observation_spec
@@ -0,0 +1,502 @@
+'''A vectorized env that steps K Pomme envs in worker processes.
+
+Each worker process hosts a slice of the envs and writes their observations,
+rewards and dones straight into shared memory arrays. Only the actions and
+the (small) info dicts go through the pipes, so nothing large is pickled.
+
+An example with a training agent against three SimpleAgents:
+
+    env = VecEnv('PommeFFACompetition-v0',
+                 ['test::agents.SimpleAgent'] * 4, num_envs=64,
+                 training_agent=0)
+    obs = env.reset()
+    obs, rewards, dones, infos = env.step(np.zeros(64, dtype=np.int64))
+
+Agents given as batch_agents act in the main process instead, through one
+BaseAgent.act_batch call a step for all envs and seats they play. This is
+how a network plays against itself or others with batched forward passes:
+
+    env = VecEnv('PommeFFACompetition-v0', [None, None] +
+                 ['test::agents.SimpleAgent'] * 2, num_envs=64,
+                 batch_agents={0: policy, 1: policy})
+    obs, rewards, dones, infos = env.step()
+'''
+import contextlib
+import multiprocessing
+import os
+import random
+
+import gym
+from gym import spaces
+import numpy as np
+
+from .. import agents
+from .. import belief
+from .. import constants
+from .. import helpers
+from .. import make
+
+
+def observation_spec(config_id, num_agents, track_beliefs=False):
+    '''Returns the shape and dtype of each stacked observation key.
+
+    The shapes are per env. Keys with a leading num_agents dimension hold one
+    entry per agent, the others ('alive' and 'step_count') one per env. With
+    track_beliefs the keys of belief.BeliefTracker are included.
+    '''
+    kwargs = gym.spec(config_id)._kwargs
+    board_size = kwargs['board_size']
+    num_enemies = 1 if kwargs['game_type'] == constants.GameType.OneVsOne \
+        else 3
+    board = (num_agents, board_size, board_size)
+    spec = {
+        'board': (board, np.uint8),
+        'bomb_blast_strength': (board, np.float32),
+        'bomb_life': (board, np.float32),
+        'bomb_moving_direction': (board, np.float32),
+        'flame_life': (board, np.float32),
+        'position': ((num_agents, 2), np.int64),
+        'blast_strength': ((num_agents,), np.int64),
+        'ammo': ((num_agents,), np.int64),
+        'can_kick': ((num_agents,), np.bool_),
+        'teammate': ((num_agents,), np.int64),
+        'enemies': ((num_agents, num_enemies), np.int64),
+        'alive': ((num_agents,), np.bool_),
+        'step_count': ((), np.int64),
+    }
+    if 'radio_num_words' in kwargs:
+        spec['message'] = ((num_agents, kwargs['radio_num_words']), np.int64)
+    if track_beliefs:
+        spec.update({
+            'belief_board': (board, np.uint8),
+            'belief_age': (board, np.int64),
+            'belief_bomb_life': (board, np.float32),
+            'belief_bomb_blast_strength': (board, np.float32),
+            'belief_items': (board, np.uint8),
+        })
+    return spec
+
+
+def action_space(config_id):
+    '''Returns the action space of the envs of a config'''
+    kwargs = gym.spec(config_id)._kwargs
+    if 'radio_num_words' in kwargs:
+        return spaces.Tuple(
+            tuple([spaces.Discrete(len(constants.Action))] +
+                  [spaces.Discrete(kwargs['radio_vocab_size'])] *
+                  kwargs['radio_num_words']))
+    return spaces.Discrete(len(constants.Action))
+
+
+class _SharedArrays(object):
+    '''Numpy arrays backed by shared memory so that workers can fill them'''
+
+    def __init__(self, ctx, num_envs, spec):
+        self.spec = spec
+        self.raw = {}
+        for key, (shape, dtype) in spec.items():
+            nbytes = num_envs * int(np.prod(shape)) * np.dtype(dtype).itemsize
+            self.raw[key] = ctx.RawArray('b', max(nbytes, 1))
+        self.num_envs = num_envs
+        self.arrays = self._wrap()
+
+    def _wrap(self):
+        arrays = {}
+        for key, (shape, dtype) in self.spec.items():
+            size = self.num_envs * int(np.prod(shape))
+            arrays[key] = np.frombuffer(
+                self.raw[key], dtype=dtype,
+                count=size).reshape((self.num_envs,) + tuple(shape))
+        return arrays
+
+    def __getstate__(self):
+        return {'spec': self.spec, 'raw': self.raw, 'num_envs': self.num_envs}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.arrays = self._wrap()
+
+
+def _write_observations(arrays, index, observations):
+    '''Writes the observations of one env into row index of arrays'''
+    for num_agent, obs in enumerate(observations):
+        for key in ['board', 'bomb_blast_strength', 'bomb_life',
+                    'bomb_moving_direction', 'flame_life', 'position',
+                    'blast_strength', 'ammo', 'can_kick']:
+            arrays[key][index, num_agent] = obs[key]
+        arrays['teammate'][index, num_agent] = obs['teammate'].value
+        arrays['enemies'][index, num_agent] = [
+            enemy.value for enemy in obs['enemies']]
+        if 'message' in arrays:
+            arrays['message'][index, num_agent] = obs['message']
+        if 'belief_board' in arrays:
+            for key in belief.BeliefTracker.KEYS:
+                arrays[key][index, num_agent] = obs[key]
+
+    alive = arrays['alive'][index]
+    alive[:] = False
+    for value in observations[0]['alive']:
+        alive[value - constants.Item.Agent0.value] = True
+    arrays['step_count'][index] = observations[0]['step_count']
+
+
+def _read_observation(arrays, index, num_agent, game_type, game_env,
+                      copy=True):
+    '''Rebuilds an agent's observation dict from row index of arrays.
+
+    With copy=False the maps are views of arrays.
+    '''
+    maps = ['board', 'bomb_blast_strength', 'bomb_life',
+            'bomb_moving_direction', 'flame_life']
+    if 'belief_board' in arrays:
+        maps.extend(belief.BeliefTracker.KEYS)
+    obs = {}
+    for key in maps:
+        array = arrays[key][index, num_agent]
+        obs[key] = array.copy() if copy else array
+    obs['position'] = tuple(arrays['position'][index, num_agent].tolist())
+    for key in ['blast_strength', 'ammo', 'can_kick']:
+        obs[key] = arrays[key][index, num_agent].item()
+    obs['teammate'] = constants.Item(arrays['teammate'][index,
+                                                        num_agent].item())
+    obs['enemies'] = [
+        constants.Item(value)
+        for value in arrays['enemies'][index, num_agent].tolist()
+    ]
+    if 'message' in arrays:
+        obs['message'] = tuple(arrays['message'][index, num_agent].tolist())
+    obs['alive'] = [
+        constants.Item.Agent0.value + int(agent_id)
+        for agent_id in np.flatnonzero(arrays['alive'][index])
+    ]
+    obs['game_type'] = game_type
+    obs['game_env'] = game_env
+    obs['step_count'] = int(arrays['step_count'][index])
+    return obs
+
+
+def _python_action(action):
+    '''Turns numpy actions into the ints and lists the envs take'''
+    return action.tolist() if isinstance(action, (np.ndarray,
+                                                  np.generic)) else action
+
+
+def _worker(remote, parent_remote, config_id, agent_strings, env_indices,
+            observations, rewards, dones, training_agent, seed, env_kwargs):
+    '''Hosts the envs in env_indices and serves commands from remote'''
+    parent_remote.close()
+    observations = observations.arrays
+    rewards = rewards.arrays['rewards']
+    dones = dones.arrays['dones']
+
+    # The boards are made and the agents play from the global random state
+    # of the process, so with a seed each env keeps its own and swaps it in.
+    # That way env i plays the same games whichever worker hosts it, unless
+    # late agents of an act_deadline draw after their env's turn is over.
+    random_states = None
+    if seed is not None:
+        random_states = []
+        for index in env_indices:
+            random.seed(seed + index)
+            np.random.seed(seed + index)
+            random_states.append((random.getstate(), np.random.get_state()))
+
+    @contextlib.contextmanager
+    def random_state(num_env):
+        if random_states is None:
+            yield
+            return
+        random.setstate(random_states[num_env][0])
+        np.random.set_state(random_states[num_env][1])
+        try:
+            yield
+        finally:
+            random_states[num_env] = (random.getstate(),
+                                      np.random.get_state())
+
+    envs = []
+    agent_lists = []
+    for index in env_indices:
+        # Seats whose actions come from the main process get a BaseAgent.
+        agent_list = [
+            agents.BaseAgent() if agent_string is None else
+            helpers.make_agent_from_string(agent_string, agent_id)
+            for agent_id, agent_string in enumerate(agent_strings)
+        ]
+        env = make(config_id, agent_list, **env_kwargs)
+        if training_agent is not None:
+            env.set_training_agent(training_agent)
+        env.seed(None if seed is None else seed + index)
+        envs.append(env)
+        agent_lists.append(agent_list)
+    last_obs = [None] * len(envs)
+
+    def reset(num_env):
+        last_obs[num_env] = envs[num_env].reset()
+        _write_observations(observations, env_indices[num_env],
+                            last_obs[num_env])
+
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == 'step':
+                infos = []
+                for num_env, (env, index) in enumerate(zip(envs,
+                                                           env_indices)):
+                    with random_state(num_env):
+                        # The seats without an action are played here.
+                        actions = list(data[num_env])
+                        acting = [
+                            agent for agent in agent_lists[num_env]
+                            if actions[agent.agent_id] is None
+                        ]
+                        if acting:
+                            acted = env.model.act(
+                                acting, last_obs[num_env], env.action_space,
+                                collector=env.action_collector)
+                            for agent, action in zip(acting, acted):
+                                actions[agent.agent_id] = action
+                        obs, reward, done, info = env.step(actions)
+                        rewards[index] = reward
+                        dones[index] = done
+                        if done:
+                            reset(num_env)
+                        else:
+                            last_obs[num_env] = obs
+                            _write_observations(observations, index, obs)
+                    infos.append(info)
+                remote.send(infos)
+            elif command == 'reset':
+                for num_env in range(len(envs)):
+                    with random_state(num_env):
+                        reset(num_env)
+                remote.send(None)
+            elif command == 'close':
+                for env in envs:
+                    env.close()
+                remote.close()
+                break
+            else:
+                raise NotImplementedError(command)
+    except KeyboardInterrupt:
+        print('VecEnv worker: got KeyboardInterrupt')
+
+
+class VecEnv(object):
+    """Steps num_envs Pomme envs in up to num_workers processes.
+
+    Observations are returned as a dict of stacked arrays (see
+    observation_spec), rewards as a float32 array of shape (num_envs,
+    num_agents) and dones as a bool array of shape (num_envs,). Envs that are
+    done are reset right away, so the observations returned for them are
+    those of the new episode.
+
+    Without a training_agent, step(None) lets every agent act and
+    step(actions) takes the actions of all agents, shaped (num_envs,
+    num_agents). With a training_agent, step(actions) takes only that
+    agent's actions, shaped (num_envs,), the other agents act, and
+    observations and rewards are those of the training agent.
+
+    Agents act in the workers, except for the batch_agents. Those act in the
+    main process with one act_batch call per agent and step, covering every
+    env and seat the agent plays. Seats of agents that are dead get Stop.
+    """
+
+    def __init__(self,
+                 config_id,
+                 agent_strings,
+                 num_envs,
+                 num_workers=None,
+                 training_agent=None,
+                 seed=None,
+                 copy_observations=True,
+                 start_method=None,
+                 batch_agents=None,
+                 **env_kwargs):
+        '''Starts the worker processes.
+
+        Args:
+          config_id: The env_id of the config to run.
+          agent_strings: The agents of each env, in the format of
+            helpers.make_agent_from_string. They can be None for the seats
+            of the training_agent and the batch_agents.
+          num_envs: The number of envs.
+          num_workers: The number of worker processes. Defaults to one per
+            cpu, but at most num_envs.
+          training_agent: The id of the agent whose actions are passed to
+            step, or None.
+          seed: If given, env i is seeded with seed + i and keeps its own
+            random and np.random state, seeded the same way, so its games
+            do not depend on num_workers. With an act_deadline in
+            env_kwargs this is best-effort: an agent that misses the
+            deadline keeps running and draws from the random state of
+            whichever env of its worker is played next.
+          copy_observations: With False, the returned observations and the
+            maps of those given to the batch_agents are views of the shared
+            memory that the next step overwrites.
+          start_method: The multiprocessing start method of the workers.
+          batch_agents: A dict from seat to the agent that plays it in the
+            main process with act_batch. One agent can play several seats.
+          env_kwargs: Passed on to pommerman.make.
+        '''
+        self.config_id = config_id
+        self.num_envs = num_envs
+        self.num_agents = len(agent_strings)
+        self.training_agent = training_agent
+        self._copy_observations = copy_observations
+        self.action_space = action_space(config_id)
+        kwargs = dict(gym.spec(config_id)._kwargs, **env_kwargs)
+        self._game_type = kwargs['game_type'].value
+        self._game_env = kwargs['env']
+
+        # The seats of each batch agent, in the order the agents were given.
+        self._batch_seats = []
+        batch_agents = batch_agents or {}
+        assert training_agent not in batch_agents
+        for seat, agent in sorted(batch_agents.items()):
+            for batch_agent, seats in self._batch_seats:
+                if batch_agent is agent:
+                    seats.append(seat)
+                    break
+            else:
+                self._batch_seats.append((agent, [seat]))
+        agent_strings = [
+            None if seat in batch_agents else agent_string
+            for seat, agent_string in enumerate(agent_strings)
+        ]
+
+        num_workers = min(num_workers or os.cpu_count() or 1, num_envs)
+        ctx = multiprocessing.get_context(start_method)
+        self._observations = _SharedArrays(
+            ctx, num_envs,
+            observation_spec(config_id, self.num_agents,
+                             env_kwargs.get('track_beliefs', False)))
+        self._rewards = _SharedArrays(
+            ctx, num_envs, {'rewards': ((self.num_agents,), np.float32)})
+        self._dones = _SharedArrays(ctx, num_envs, {'dones': ((), np.bool_)})
+
+        self._slices = [
+            (indices[0], indices[-1] + 1)
+            for indices in np.array_split(np.arange(num_envs), num_workers)
+        ]
+        self._remotes = []
+        self._processes = []
+        for start, stop in self._slices:
+            remote, worker_remote = ctx.Pipe()
+            process = ctx.Process(
+                target=_worker,
+                args=(worker_remote, remote, config_id, list(agent_strings),
+                      list(range(start, stop)), self._observations,
+                      self._rewards, self._dones, training_agent, seed,
+                      env_kwargs),
+                daemon=True)
+            process.start()
+            worker_remote.close()
+            self._remotes.append(remote)
+            self._processes.append(process)
+
+        self._waiting = False
+        self.closed = False
+
+    def _get_observations(self):
+        observations = {}
+        for key, array in self._observations.arrays.items():
+            if self.training_agent is not None and key not in [
+                    'alive', 'step_count']:
+                array = array[:, self.training_agent]
+            observations[key] = array.copy() if self._copy_observations \
+                else array
+        return observations
+
+    def reset(self):
+        '''Resets all envs and returns their observations'''
+        for remote in self._remotes:
+            remote.send(('reset', None))
+        for remote in self._remotes:
+            remote.recv()
+        return self._get_observations()
+
+    def _act_batch(self, actions):
+        '''Fills in the actions of the batch agents'''
+        arrays = self._observations.arrays
+        alive = arrays['alive']
+        for agent, seats in self._batch_seats:
+            keys = []
+            for index in range(self.num_envs):
+                for seat in seats:
+                    if alive[index, seat]:
+                        keys.append((index, seat))
+                    else:
+                        actions[index][seat] = constants.Action.Stop.value
+            if not keys:
+                continue
+
+            observations = [
+                _read_observation(arrays, index, seat, self._game_type,
+                                  self._game_env, self._copy_observations)
+                for index, seat in keys
+            ]
+            batch_actions = agent.act_batch(observations, self.action_space)
+            assert len(batch_actions) == len(keys)
+            for (index, seat), action in zip(keys, batch_actions):
+                actions[index][seat] = _python_action(action)
+
+    def step_async(self, actions):
+        '''Tells the workers to step their envs with actions'''
+        # The actions of each env by seat, None for those the workers fill.
+        if actions is not None and self.training_agent is None:
+            actions = np.asarray(actions)
+            assert len(actions) == self.num_envs
+            env_actions = actions.tolist()
+        else:
+            env_actions = [[None] * self.num_agents
+                           for _ in range(self.num_envs)]
+            if actions is not None:
+                actions = np.asarray(actions)
+                assert len(actions) == self.num_envs
+                for index, action in enumerate(actions):
+                    env_actions[index][self.training_agent] = \
+                        _python_action(action)
+            self._act_batch(env_actions)
+
+        for remote, (start, stop) in zip(self._remotes, self._slices):
+            remote.send(('step', env_actions[start:stop]))
+        self._waiting = True
+
+    def step_wait(self):
+        '''Waits for the step started by step_async and returns its result'''
+        infos = []
+        for remote in self._remotes:
+            infos.extend(remote.recv())
+        self._waiting = False
+
+        rewards = self._rewards.arrays['rewards']
+        if self.training_agent is not None:
+            rewards = rewards[:, self.training_agent]
+        dones = self._dones.arrays['dones']
+        return (self._get_observations(), rewards.copy(), dones.copy(),
+                infos)
+
+    def step(self, actions=None):
+        '''Steps all envs and returns (observations, rewards, dones, infos)'''
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        '''Closes the envs and stops the workers'''
+        if self.closed:
+            return
+        if self._waiting:
+            for remote in self._remotes:
+                remote.recv()
+        for remote in self._remotes:
+            remote.send(('close', None))
+        for process in self._processes:
+            process.join()
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
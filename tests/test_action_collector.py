@@ -0,0 +1,69 @@
+import threading
+import time
+import unittest
+
+import pommerman
+from pommerman import action_collector
+from pommerman import agents
+from pommerman import constants
+
+
+class SleepyAgent(agents.BaseAgent):
+    '''Moves up after sleeping for as long as it is told'''
+
+    def __init__(self, sleep=0):
+        super(SleepyAgent, self).__init__()
+        self.sleep = sleep
+        self.num_acting = 0
+        self.max_acting = 0
+        self._lock = threading.Lock()
+
+    def act(self, obs, action_space):
+        with self._lock:
+            self.num_acting += 1
+            self.max_acting = max(self.max_acting, self.num_acting)
+        time.sleep(self.sleep)
+        with self._lock:
+            self.num_acting -= 1
+        return constants.Action.Up.value
+
+
+class ActionCollectorTest(unittest.TestCase):
+
+    def test_deadline(self):
+        agent_list = [SleepyAgent(.05) for _ in range(3)] + [SleepyAgent(.8)]
+        env = pommerman.make('PommeFFACompetition-v0', agent_list,
+                             act_deadline=.2)
+        obs = env.reset()
+        start = time.perf_counter()
+        actions = env.act(obs)
+        # The agents were asked at once and the slow one was not waited for.
+        self.assertLess(time.perf_counter() - start, .6)
+        self.assertEqual(actions, [constants.Action.Up.value] * 3 +
+                         [constants.Action.Stop.value])
+        collector = env.action_collector
+        self.assertEqual(len(collector.late), 1)
+        self.assertEqual(collector.late[0]['agent_id'], 3)
+        self.assertFalse(collector.late[0]['busy'])
+
+        # The slow agent is still busy, so it isn't asked again.
+        obs = env.step(actions)[0]
+        actions = env.act(obs)
+        self.assertEqual(actions[3], constants.Action.Stop.value)
+        self.assertTrue(collector.late[1]['busy'])
+
+        time.sleep(.8)
+        self.assertGreater(collector.late[0]['late_by'], 0)
+        self.assertEqual(agent_list[3].max_acting, 1)
+        env.close()
+
+    def test_collect_order(self):
+        collector = action_collector.ActionCollector(1)
+        agent_list = [SleepyAgent(.01 * (4 - i)) for i in range(4)]
+        for agent_id, agent in enumerate(agent_list):
+            agent.init_agent(agent_id, constants.GameType.FFA)
+        actions = collector.collect(agent_list, lambda agent: agent.agent_id,
+                                    lambda agent: None)
+        self.assertEqual(actions, [0, 1, 2, 3])
+        self.assertEqual(collector.late, [])
+        collector.close()
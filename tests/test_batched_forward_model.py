@@ -0,0 +1,151 @@
+import copy
+import random
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import batched_forward_model
+
+
+class BatchedForwardModelTest(unittest.TestCase):
+
+    def make_env(self, config_id, seed):
+        random.seed(seed)
+        np.random.seed(seed)
+        agent_list = [
+            agents.SimpleAgent(),
+            agents.RandomAgent(),
+            agents.SimpleAgent(),
+            agents.RandomAgent(),
+        ]
+        if config_id == 'OneVsOne-v0':
+            agent_list = agent_list[:2]
+        env = pommerman.make(config_id, agent_list)
+        env.seed(seed)
+        obs = env.reset()
+        if seed % 2:
+            # Hand out kicks so that the kick resolution gets exercised.
+            for agent in env._agents:
+                agent._character.can_kick = True
+        return env, obs
+
+    @staticmethod
+    def snapshot(env):
+        board = env._board.copy()
+        characters = copy.deepcopy([agent._character for agent in env._agents])
+        bombs = [copy.copy(bomb) for bomb in env._bombs]
+        for bomb in bombs:
+            bomb.bomber = characters[bomb.bomber.agent_id]
+        flames = [copy.copy(flame) for flame in env._flames]
+        return board, characters, bombs, dict(env._items), flames
+
+    def assertSameGame(self, expected, actual):
+        board, characters, bombs, items, flames = expected
+        batched_board, batched_characters, batched_bombs, batched_items, \
+            batched_flames = actual
+        np.testing.assert_array_equal(board, batched_board)
+        self.assertEqual([c.to_json() for c in characters],
+                         [c.to_json() for c in batched_characters])
+        self.assertEqual([b.to_json() for b in bombs],
+                         [b.to_json() for b in batched_bombs])
+        self.assertEqual(items, batched_items)
+        self.assertEqual([f.to_json() for f in flames],
+                         [f.to_json() for f in batched_flames])
+
+    def test_step_batch_matches_step(self):
+        configs = ['PommeFFACompetition-v0', 'PommeTeam-v0', 'OneVsOne-v0']
+        games = [self.make_env(configs[seed % 3], seed) for seed in range(6)]
+        model = batched_forward_model.BatchedForwardModel
+
+        for _ in range(300):
+            for num_game, (env, obs) in enumerate(games):
+                before = self.snapshot(env)
+                actions = env.act(obs)
+                obs, _, done, _ = env.step(actions)
+                if done:
+                    obs = env.reset()
+                    continue
+
+                board, characters, bombs, items, flames = before
+                state = batched_forward_model.BatchedGameState(
+                    1, len(board), len(characters))
+                state.set_game(0, board, characters, bombs, items, flames)
+                model.step_batch(state, [actions],
+                                 max_blast_strength=env._agent_view_size or 10)
+                batched = state.get_game(0, characters)
+                self.assertSameGame(
+                    self.snapshot(env),
+                    (batched[0], characters) + tuple(batched[1:]))
+                games[num_game] = (env, obs)
+
+    def test_step_batch_many_games(self):
+        envs = [self.make_env('PommeFFACompetition-v0', seed)[0]
+                for seed in range(8)]
+        model = batched_forward_model.BatchedForwardModel
+        state = batched_forward_model.BatchedGameState(8, 11, 4)
+        shadows = []
+        for num_game, env in enumerate(envs):
+            board, characters, bombs, items, flames = self.snapshot(env)
+            state.set_game(num_game, board, characters, bombs, items, flames)
+            shadows.append(characters)
+
+        rng = np.random.RandomState(0)
+        for _ in range(200):
+            actions = rng.randint(0, 6, size=(8, 4))
+            for num_game, env in enumerate(envs):
+                env.step(actions[num_game].tolist())
+            model.step_batch(state, actions)
+            for num_game, env in enumerate(envs):
+                board, bombs, items, flames = state.get_game(
+                    num_game, shadows[num_game])
+                self.assertSameGame(
+                    self.snapshot(env),
+                    (board, shadows[num_game], bombs, items, flames))
+
+    def play(self, config_id, seed, model=None, actions=None):
+        '''Plays a seeded game and returns its steps and actions'''
+        random.seed(seed)
+        np.random.seed(seed)
+        kwargs = {} if model is None else {'model': model}
+        env = pommerman.make(config_id,
+                             [agents.SimpleAgent() for _ in range(4)],
+                             **kwargs)
+        env.seed(seed)
+        obs = env.reset()
+        steps = [(env._board.copy(), None, False)]
+        played = []
+        done = False
+        while not done:
+            step_actions = env.act(obs) if actions is None \
+                else actions[len(played)]
+            obs, rewards, done, _ = env.step(step_actions)
+            steps.append((env._board.copy(), rewards, done))
+            played.append(step_actions)
+        env.close()
+        return env, steps, played
+
+    def test_env_with_batched_model(self):
+        for config_id in ['PommeFFACompetition-v0', 'PommeTeamCompetition-v0',
+                          'PommeRadioCompetition-v2']:
+            for seed in range(3):
+                _, expected, actions = self.play(config_id, seed)
+                # The same actions, so the agents' random draws don't matter.
+                env, steps, _ = self.play(
+                    config_id, seed,
+                    model=batched_forward_model.BatchedForwardModel,
+                    actions=actions)
+                self.assertIsInstance(
+                    env.model, batched_forward_model.BatchedForwardModel)
+                self.assertEqual(len(steps), len(expected))
+                for (board, rewards, done), (expected_board,
+                                             expected_rewards,
+                                             expected_done) in zip(
+                                                 steps, expected):
+                    np.testing.assert_array_equal(board, expected_board)
+                    self.assertEqual(rewards, expected_rewards)
+                    self.assertEqual(done, expected_done)
+
+if __name__ == '__main__':
+    unittest.main()
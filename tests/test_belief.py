@@ -0,0 +1,67 @@
+import random
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import constants
+
+FOG = constants.Item.Fog.value
+
+
+class BeliefTest(unittest.TestCase):
+
+    def test_beliefs_follow_views(self):
+        random.seed(1)
+        np.random.seed(1)
+        env = pommerman.make('PommeTeamCompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)],
+                             track_beliefs=True)
+        obs = env.reset()
+        # What agent 0 saw of each cell and when, kept by hand.
+        last_board = np.full((11, 11), FOG)
+        last_life = np.zeros((11, 11))
+        last_seen = np.full((11, 11), -1)
+        done = False
+        step = 0
+        while not done and step < 200:
+            agent_obs = obs[0]
+            visible = agent_obs['board'] != FOG
+            last_board[visible] = agent_obs['board'][visible]
+            last_life[visible] = agent_obs['bomb_life'][visible]
+            last_seen[visible] = step
+
+            seen = last_seen >= 0
+            np.testing.assert_array_equal(
+                agent_obs['belief_age'],
+                np.where(seen, step - last_seen, -1))
+            # A bomb out of view is counted down from when it was seen.
+            expected_life = np.maximum(last_life - (step - last_seen), 0)
+            np.testing.assert_array_equal(
+                agent_obs['belief_bomb_life'],
+                np.where(seen, expected_life, 0))
+            gone = (expected_life == 0) & (last_board ==
+                                           constants.Item.Bomb.value)
+            np.testing.assert_array_equal(
+                agent_obs['belief_board'],
+                np.where(gone, constants.Item.Passage.value, last_board))
+            items = np.isin(last_board, [6, 7, 8])
+            np.testing.assert_array_equal(
+                agent_obs['belief_items'],
+                np.where(items & seen, last_board, 0))
+
+            obs, _, done, _ = env.step(env.act(obs))
+            step += 1
+        self.assertGreater(step, 50)
+
+        obs = env.reset()
+        self.assertEqual((obs[0]['belief_age'] > 0).sum(), 0)
+        env.close()
+
+    def test_off_by_default(self):
+        env = pommerman.make('PommeTeamCompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)])
+        obs = env.reset()
+        self.assertNotIn('belief_board', obs[0])
+        env.close()
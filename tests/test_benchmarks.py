@@ -0,0 +1,35 @@
+import copy
+import unittest
+
+from benchmarks import env_benchmarks
+
+
+class EnvBenchmarksTest(unittest.TestCase):
+
+    def test_run_and_compare(self):
+        results = env_benchmarks.run(['OneVsOne-v0'], window=5, repeats=1,
+                                     num_resets=2)
+        result, = results['results']
+        self.assertEqual(set(result['phases']), set(env_benchmarks.PHASES))
+        for phase in result['phases'].values():
+            self.assertEqual(phase['steps'], 5)
+            self.assertGreater(phase['steps_per_sec'], 0)
+            self.assertGreater(phase['observations_per_sec'], 0)
+            self.assertIn('step.explosions', phase['sections'])
+        self.assertEqual(result['phases']['late']['start_step'], 533)
+        self.assertGreater(result['memory_bytes'], 0)
+
+        # The states are the same in every run.
+        again = env_benchmarks.run(['OneVsOne-v0'], window=5, repeats=1,
+                                   num_resets=2)
+        for phase, values in again['results'][0]['phases'].items():
+            for key in ['alive_agents', 'bombs', 'wood']:
+                self.assertEqual(values[key], result['phases'][phase][key])
+
+        slower = copy.deepcopy(results)
+        slower['results'][0]['phases']['mid']['steps_per_sec'] /= 2
+        rows = env_benchmarks.compare(slower, results, tolerance=0.1)
+        regressions = [row[1] for row in rows if row[-1]]
+        self.assertEqual(regressions, ['mid.steps_per_sec'])
+        self.assertFalse(any(row[-1] for row in env_benchmarks.compare(
+            results, slower, tolerance=0.1)))
@@ -0,0 +1,110 @@
+from http import server
+import json
+import random
+import threading
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import binary_obs
+from pommerman import constants
+from pommerman import utility
+
+
+class _Handler(server.BaseHTTPRequestHandler):
+    '''A remote agent that keeps what it was sent and moves up'''
+    protocol_version = 'HTTP/1.1'
+    received = []
+    ports = set()
+
+    def _reply(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._reply({'success': True})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/action':
+            self.ports.add(self.client_address[1])
+            self.received.append((self.headers['Content-Type'], body))
+            self._reply({'action': constants.Action.Up.value})
+        else:
+            self._reply({'success': True})
+
+    def log_message(self, *args):
+        pass
+
+
+class BinaryObsTest(unittest.TestCase):
+
+    def observations(self, config_id):
+        random.seed(0)
+        np.random.seed(0)
+        env = pommerman.make(config_id,
+                             [agents.SimpleAgent() for _ in range(4)])
+        obs = env.reset()
+        for _ in range(20):
+            obs = env.step(env.act(obs))[0]
+        return env, obs
+
+    def test_round_trip(self):
+        for config_id in ['PommeFFACompetition-v0',
+                          'PommeRadioCompetition-v2']:
+            env, observations = self.observations(config_id)
+            for obs in observations:
+                payload = binary_obs.encode(obs, env.action_space)
+                as_json = json.dumps(obs, cls=utility.PommermanJSONEncoder)
+                self.assertLess(len(payload), len(as_json) / 2)
+
+                decoded, action_space = binary_obs.decode(payload)
+                self.assertEqual(
+                    json.dumps(decoded, cls=utility.PommermanJSONEncoder,
+                               sort_keys=True),
+                    json.dumps(json.loads(as_json), sort_keys=True))
+                self.assertEqual(
+                    action_space,
+                    json.loads(json.dumps(env.action_space,
+                                          cls=utility.PommermanJSONEncoder)))
+                for key in ['board', 'bomb_life', 'flame_life']:
+                    self.assertEqual(decoded[key].dtype, obs[key].dtype)
+                    self.assertFalse(decoded[key].flags.writeable)
+                # The board is a view of the payload.
+                self.assertFalse(decoded['board'].flags.owndata)
+            env.close()
+
+        with self.assertRaises(ValueError):
+            binary_obs.decode(b'JSON' + payload[4:])
+
+    def test_http_agent(self):
+        httpd = server.ThreadingHTTPServer(('localhost', 0), _Handler)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            env, observations = self.observations('PommeFFACompetition-v0')
+            agent = agents.HttpAgent(port=httpd.server_address[1],
+                                     binary_obs=True)
+            for _ in range(3):
+                action = agent.act(observations[0], env.action_space)
+                self.assertEqual(action, constants.Action.Up.value)
+            agent.shutdown()
+            env.close()
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+        self.assertEqual(len(_Handler.received), 3)
+        # The requests went over one kept-alive connection.
+        self.assertEqual(len(_Handler.ports), 1)
+        content_type, body = _Handler.received[0]
+        self.assertEqual(content_type, binary_obs.CONTENT_TYPE)
+        decoded, _ = binary_obs.decode(body)
+        np.testing.assert_array_equal(decoded['board'],
+                                      observations[0]['board'])
@@ -0,0 +1,60 @@
+import random
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import board_analysis
+from pommerman import constants
+from pommerman import utility
+
+
+class BoardAnalysisTest(unittest.TestCase):
+
+    def play(self, config_id, num_steps):
+        random.seed(4)
+        np.random.seed(4)
+        env = pommerman.make(config_id,
+                             [agents.SimpleAgent() for _ in range(4)])
+        obs = env.reset()
+        for _ in range(num_steps):
+            obs = env.step(env.act(obs))[0]
+        env.close()
+        return obs
+
+    def test_analysis(self):
+        obs = self.play('PommeFFACompetition-v0', 30)
+        analysis = board_analysis.analyze(obs[0])
+        bombs = analysis.bombs
+        self.assertGreater(len(bombs), 0)
+        board = obs[0]['board']
+        for x in range(len(board)):
+            for y in range(len(board)):
+                lives = [
+                    obs[0]['bomb_life'][bomb['position']] for bomb in bombs
+                    if (x == bomb['position'][0] and
+                        abs(bomb['position'][1] - y) <= bomb['blast_strength'])
+                    or (y == bomb['position'][1] and
+                        abs(bomb['position'][0] - x) <= bomb['blast_strength'])
+                ]
+                self.assertEqual(analysis.danger[x, y],
+                                 min(lives) if lives else np.inf)
+                self.assertEqual(analysis.blast_coverage[x, y], bool(lives))
+
+                enemies = [constants.Item(e) for e in obs[0]['enemies']]
+                self.assertEqual(
+                    analysis.passable(enemies)[x, y],
+                    utility.position_is_passable(board, (x, y), enemies))
+        self.assertFalse(analysis.danger.flags.writeable)
+
+        # Agents that see the same share the analysis.
+        for agent_obs in obs[1:]:
+            self.assertIs(board_analysis.analyze(agent_obs), analysis)
+
+    def test_fogged_views(self):
+        obs = self.play('PommeTeamCompetition-v0', 30)
+        analyses = [board_analysis.analyze(agent_obs) for agent_obs in obs]
+        self.assertEqual(len(set(map(id, analyses))), len(obs))
+        for agent_obs, analysis in zip(obs, analyses):
+            np.testing.assert_array_equal(analysis.board, agent_obs['board'])
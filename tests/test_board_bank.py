@@ -0,0 +1,77 @@
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import board_bank
+
+
+class BoardBankTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'ffa.npy')
+        self.bank = board_bank.generate(
+            self.path, 20, seed=3,
+            **board_bank.config_settings('PommeFFACompetition-v0'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_generate(self):
+        self.assertEqual(len(self.bank), 20)
+        self.assertEqual(self.bank.board_size, 11)
+        self.assertEqual(self.bank.num_agents, 4)
+        for index in range(len(self.bank)):
+            board, items = self.bank.get(index)
+            self.assertEqual(len(items), 20)
+            for position in items:
+                self.assertEqual(board[position],
+                                 pommerman.constants.Item.Wood.value)
+
+        # The same seed makes the same bank.
+        again = board_bank.generate(
+            os.path.join(self.directory, 'again.npy'), 20, seed=3,
+            **board_bank.config_settings('PommeFFACompetition-v0'))
+        for index in range(len(self.bank)):
+            board, items = self.bank.get(index)
+            board_again, items_again = again.get(index)
+            np.testing.assert_array_equal(board, board_again)
+            self.assertEqual(items, items_again)
+
+        unpickled = pickle.loads(pickle.dumps(self.bank))
+        np.testing.assert_array_equal(unpickled.get(5)[0],
+                                      self.bank.get(5)[0])
+
+    def test_env_reset(self):
+        env = pommerman.make('PommeFFACompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)],
+                             board_bank=self.path)
+        env.set_board_index(7)
+        obs = env.reset()
+        self.assertEqual(env.board_index, 7)
+        board, items = self.bank.get(7)
+        np.testing.assert_array_equal(obs[0]['board'], board)
+        self.assertEqual(env._items, items)
+        for agent_id, agent in enumerate(env._agents):
+            self.assertEqual(board[agent.position],
+                             pommerman.utility.agent_value(agent_id))
+        # The game runs on the board of the bank.
+        for _ in range(10):
+            obs = env.step(env.act(obs))[0]
+
+        # Without an index the boards are drawn with np.random.
+        indices = []
+        for _ in range(2):
+            np.random.seed(1)
+            random.seed(1)
+            env.reset()
+            indices.append(env.board_index)
+        self.assertEqual(indices[0], indices[1])
+        env.close()
@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from pommerman import constants
+from pommerman import explosions
+
+PASSAGE = constants.Item.Passage.value
+RIGID = constants.Item.Rigid.value
+WOOD = constants.Item.Wood.value
+
+
+class ExplosionsTest(unittest.TestCase):
+
+    def test_chain_and_walls(self):
+        board = np.full((1, 7, 7), PASSAGE, dtype=np.uint8)
+        board[0, 0, 4] = RIGID
+        board[0, 4, 0] = WOOD
+        # Bomb 0 goes off and reaches bomb 1, which reaches bomb 2. Bomb 3
+        # is out of reach of all of them.
+        positions = np.array([[0, 0], [0, 2], [2, 2], [6, 6]])
+        exploded, exploded_map = explosions.resolve(
+            board, np.zeros(4, dtype=np.int64), positions,
+            np.array([3, 3, 2, 3]), [True, False, False, False])
+        self.assertEqual(exploded.tolist(), [True, True, True, False])
+
+        expected = np.zeros((7, 7), dtype=bool)
+        for row, col in [(0, 0), (1, 0), (2, 0), (0, 1), (0, 2), (0, 3),
+                         (1, 2), (2, 2), (3, 2), (2, 1), (2, 3)]:
+            expected[row, col] = True
+        np.testing.assert_array_equal(exploded_map[0], expected)
+
+    def test_wood_stops_blast(self):
+        board = np.full((1, 5, 5), PASSAGE, dtype=np.uint8)
+        board[0, 2, 1] = WOOD
+        board[0, 2, 3] = RIGID
+        _, exploded_map = explosions.resolve(
+            board, np.zeros(1, dtype=np.int64), np.array([[2, 2]]),
+            np.array([4]), [True])
+        self.assertTrue(exploded_map[0, 2, 1])
+        self.assertFalse(exploded_map[0, 2, 0])
+        self.assertFalse(exploded_map[0, 2, 3:].any())
+        self.assertTrue(exploded_map[0, 0:5, 2].all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import random
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import constants
+from pommerman import featurizer
+
+
+class FeaturizerTest(unittest.TestCase):
+
+    def play(self, config_id, num_steps):
+        random.seed(0)
+        np.random.seed(0)
+        env = pommerman.make(config_id,
+                             [agents.SimpleAgent() for _ in range(4)])
+        obs = env.reset()
+        observations = list(obs)
+        for _ in range(num_steps):
+            obs = env.step(env.act(obs))[0]
+            observations.extend(obs)
+        env.close()
+        return observations
+
+    def test_features(self):
+        observations = self.play('PommeRadioCompetition-v2', 30)
+        features = featurizer.Featurizer.for_config(
+            'PommeRadioCompetition-v2')
+        channels = features.channels()
+        out = features.allocate(len(observations) + 3)
+        planes = features.featurize(observations, out=out)
+        self.assertEqual(planes.shape,
+                         (len(observations), features.num_channels, 11, 11))
+        self.assertEqual(planes.dtype, np.float32)
+        self.assertTrue(np.shares_memory(planes, out))
+
+        for obs, plane in zip(observations, planes):
+            start, num = channels['board']
+            self.assertEqual(num, len(constants.Item))
+            for item in constants.Item:
+                np.testing.assert_array_equal(
+                    plane[start + item.value], obs['board'] == item.value)
+            start, _ = channels['bomb_life']
+            np.testing.assert_array_equal(plane[start], obs['bomb_life'])
+            start, _ = channels['position']
+            self.assertEqual(plane[start].sum(), 1)
+            self.assertEqual(plane[start][tuple(obs['position'])], 1)
+            start, _ = channels['enemies']
+            np.testing.assert_array_equal(
+                plane[start],
+                np.isin(obs['board'], [e.value for e in obs['enemies']]))
+            start, _ = channels['ammo']
+            self.assertTrue((plane[start] == obs['ammo']).all())
+            start, num = channels['message']
+            self.assertEqual(num, 2)
+            self.assertEqual(plane[start:start + num, 0, 0].tolist(),
+                             list(obs['message']))
+
+        space = features.observation_space()
+        self.assertEqual(space.shape, features.shape)
+        self.assertTrue(all(space.contains(plane) for plane in planes))
+
+    def test_stacked_and_uint8(self):
+        observations = self.play('PommeFFACompetition-v0', 10)
+        features = featurizer.Featurizer(11, dtype=np.uint8)
+        planes = features(observations)
+        self.assertEqual(planes.dtype, np.uint8)
+
+        # Stacked arrays like those of a VecEnv give the same planes.
+        stacked = {
+            key: np.array([
+                obs[key].value if key == 'teammate' else
+                [e.value for e in obs[key]] if key == 'enemies' else
+                obs[key] for obs in observations
+            ])
+            for key in ['board', 'bomb_blast_strength', 'bomb_life',
+                        'bomb_moving_direction', 'flame_life', 'position',
+                        'teammate', 'enemies', 'ammo', 'blast_strength',
+                        'can_kick']
+        }
+        np.testing.assert_array_equal(features(stacked), planes)
@@ -0,0 +1,150 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import recording
+from pommerman import replay
+
+
+class GameStateTest(unittest.TestCase):
+
+    def make_env(self, seed):
+        random.seed(seed)
+        np.random.seed(seed)
+        env = pommerman.make('PommeFFACompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)])
+        env.seed(seed)
+        obs = env.reset()
+        for agent in env._agents:
+            agent._character.can_kick = True
+        return env, obs
+
+    def assertSameState(self, env, state):
+        expected = replay.state_to_arrays(env._board, env._agents, env._bombs,
+                                          env._items, env._flames)
+        actual = replay.state_to_arrays(*state.to_objects())
+        for key, value in expected.items():
+            np.testing.assert_array_equal(value, actual[key])
+        self.assertEqual(env._step_count, state.step_count)
+
+    def test_step_matches_env(self):
+        env, obs = self.make_env(0)
+        state = env.get_state()
+        done = False
+        while not done:
+            actions = env.act(obs)
+            # A clone that wanders off must not change the state.
+            branch = state.clone()
+            branch.step([5] * 4)
+            branch.step([1] * 4)
+            state.step(actions)
+            obs, _, done, _ = env.step(actions)
+            self.assertSameState(env, state)
+
+    def test_position_lookups(self):
+        env, obs = self.make_env(2)
+        for _ in range(80):
+            obs, _, done, _ = env.step(env.act(obs))
+            state = env.get_state()
+            for row in range(len(env._board)):
+                for col in range(len(env._board)):
+                    bombs = [bomb for bomb in env._bombs
+                             if bomb.position == (row, col)]
+                    view = state.bomb_at((row, col))
+                    self.assertEqual(len(bombs), int(view is not None))
+                    if bombs:
+                        self.assertSameBomb(bombs[0], view)
+                    flames = [flame for flame in env._flames
+                              if flame.position == (row, col)]
+                    view = state.flame_at((row, col))
+                    self.assertEqual(
+                        max([flame.life for flame in flames], default=None),
+                        view and view.life)
+                    if flames:
+                        self.assertEqual(view.position, (row, col))
+                        self.assertEqual(
+                            all(flame.is_dead() for flame in flames),
+                            view.is_dead())
+            for bomb, view in zip(env._bombs, state.bomb_views()):
+                self.assertSameBomb(bomb, view)
+
+    def assertSameBomb(self, bomb, view):
+        for attr in ['position', 'life', 'blast_strength',
+                     'moving_direction']:
+            self.assertEqual(getattr(bomb, attr), getattr(view, attr))
+        for attr in ['agent_id', 'position', 'ammo', 'is_alive',
+                     'blast_strength', 'can_kick']:
+            self.assertEqual(getattr(bomb.bomber, attr),
+                             getattr(view.bomber, attr))
+        self.assertEqual(bomb.bomber.agent_id, view.bomber_id)
+        self.assertEqual(bomb.exploded(), view.exploded())
+        self.assertEqual(bomb.is_moving(), view.is_moving())
+        self.assertEqual(
+            {key: list(value) for key, value in bomb.explode().items()},
+            {key: list(value) for key, value in view.explode().items()})
+        exploded_map = np.zeros((11, 11))
+        exploded_map[bomb.position] = 1
+        self.assertTrue(view.in_range(exploded_map))
+        self.assertEqual(bomb.in_range(exploded_map),
+                         view.in_range(exploded_map))
+
+    def test_set_state(self):
+        env, obs = self.make_env(1)
+        for _ in range(30):
+            obs, _, _, _ = env.step(env.act(obs))
+        saved = env.get_state()
+        rng = np.random.RandomState(0)
+        actions = rng.randint(0, 6, size=(40, 4)).tolist()
+        for step_actions in actions:
+            env.step(step_actions)
+        end = env.get_state()
+
+        env.set_state(saved)
+        self.assertSameState(env, saved)
+        for step_actions in actions:
+            env.step(step_actions)
+        self.assertSameState(env, end)
+
+        # The record starts at the restored state, so replaying it rebuilds
+        # the game that was played from there.
+        record = env.get_record()
+        self.assertEqual(len(record.actions), len(actions))
+        self.assertEqual(record.step_count, saved.step_count)
+        board = replay.Replay(record).get_state(len(actions))[0]
+        np.testing.assert_array_equal(board, env._board)
+
+    def test_set_state_ends_replay_and_beliefs(self):
+        random.seed(2)
+        np.random.seed(2)
+        env = pommerman.make('PommeTeamCompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)],
+                             track_beliefs=True)
+        obs = env.reset()
+        saved = env.get_state()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'game.npz')
+            env.record_replay(path)
+            for _ in range(10):
+                obs, _, _, _ = env.step(env.act(obs))
+            self.assertGreater((obs[0]['belief_age'] > 0).sum(), 0)
+
+            env.set_state(saved)
+            # The replay holds the game up to the restore and no more.
+            for _ in range(5):
+                env.step([0] * 4)
+            reader = recording.ReplayReader(path)
+            self.assertEqual(reader.num_steps, 10)
+
+        # The beliefs start over from the restored board.
+        obs = env.get_observations()
+        self.assertEqual((obs[0]['belief_age'] > 0).sum(), 0)
+        env.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+
+import numpy as np
+from PIL import Image
+
+import pommerman
+from pommerman import agents
+from pommerman import constants
+from pommerman import graphics
+
+
+def reference_rgb_array(board, agent_list, is_partially_observable,
+                        agent_view_size):
+    '''Colors the board one cell at a time'''
+    board_size = len(board)
+    all_frame = np.zeros((board_size, board_size, 3))
+    for row in range(board_size):
+        for col in range(board_size):
+            value = board[row][col]
+            if value >= constants.Item.Agent0.value:
+                agent = agent_list[value - constants.Item.Agent0.value]
+                if agent.is_alive:
+                    all_frame[row, col] = constants.AGENT_COLORS[agent.agent_id]
+            else:
+                all_frame[row, col] = constants.ITEM_COLORS[value]
+    frames = [all_frame]
+    for agent in agent_list:
+        row, col = agent.position
+        frame = all_frame.copy()
+        for r in range(board_size):
+            for c in range(board_size):
+                if is_partially_observable and not (
+                        r - agent_view_size <= row < r + agent_view_size and
+                        c - agent_view_size <= col < c + agent_view_size):
+                    frame[r, c] = constants.ITEM_COLORS[
+                        constants.Item.Fog.value]
+        frames.append(frame)
+    return frames
+
+
+class PixelViewerTest(unittest.TestCase):
+
+    def test_rgb_array(self):
+        env = pommerman.make('PommeRadioCompetition-v2',
+                             [agents.SimpleAgent() for _ in range(4)])
+        env.seed(0)
+        obs = env.reset()
+        boards, alive, positions, expected = [], [], [], []
+        for _ in range(300):
+            frames = graphics.PixelViewer.rgb_array(
+                env._board, env._board_size, env._agents, True,
+                env._agent_view_size)
+            reference = reference_rgb_array(env._board, env._agents, True,
+                                            env._agent_view_size)
+            self.assertEqual(frames.dtype, np.float64)
+            np.testing.assert_array_equal(frames, reference)
+            boards.append(env._board.copy())
+            alive.append([agent.is_alive for agent in env._agents])
+            positions.append([agent.position for agent in env._agents])
+            expected.append(reference)
+            obs, _, done, _ = env.step(env.act(obs))
+            if done:
+                break
+        env.close()
+
+        batch = graphics.PixelViewer.rgb_array_batch(
+            boards, alive, positions, True, env._agent_view_size)
+        self.assertEqual(batch.dtype, np.uint8)
+        np.testing.assert_array_equal(batch, expected)
+
+    def test_tile_frames(self):
+        rng = np.random.RandomState(0)
+        for board_size, num_agents in [(11, 4), (8, 2)]:
+            frames = rng.randint(0, 256, (2, 1 + num_agents, board_size,
+                                          board_size, 3)).astype(np.uint8)
+            images = graphics.PixelViewer.tile_frames(frames)
+            size = board_size * constants.HUMAN_FACTOR
+            for frame, image in zip(frames, images):
+                all_img = Image.fromarray(frame[0]).resize(
+                    (size, size), resample=Image.NEAREST)
+                other_imgs = [
+                    np.array(
+                        Image.fromarray(x).resize(
+                            (int(size / num_agents),) * 2,
+                            resample=Image.NEAREST)) for x in frame[1:]
+                ]
+                np.testing.assert_array_equal(
+                    image,
+                    np.concatenate(
+                        [np.array(all_img),
+                         np.concatenate(other_imgs, 0)], 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import random
+import unittest
+
+import numpy as np
+
+from pommerman import constants
+from pommerman import utility
+
+PASSAGE = constants.Item.Passage.value
+RIGID = constants.Item.Rigid.value
+WOOD = constants.Item.Wood.value
+
+
+class MakeBoardTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        np.random.seed(0)
+
+    def test_boards(self):
+        for size, num_rigid, num_wood, num_agents in [(11, 36, 36, 4),
+                                                      (8, 16, 16, 2)]:
+            # The agents in the order of their ids.
+            agents = [(1, 1), (size - 2, 1), (size - 2, size - 2),
+                      (1, size - 2)] if num_agents == 4 else \
+                [(1, 1), (size - 2, size - 2)]
+            for _ in range(50):
+                board = utility.make_board(size, num_rigid, num_wood,
+                                           num_agents)
+                walls = np.where(board >= constants.Item.Agent0.value,
+                                 PASSAGE, board)
+                np.testing.assert_array_equal(walls, walls.T)
+                self.assertEqual((board == RIGID).sum(), num_rigid)
+                self.assertEqual((board == WOOD).sum(), num_wood)
+                for agent_id, position in enumerate(agents):
+                    self.assertEqual(board[position],
+                                     utility.agent_value(agent_id))
+                self.assertLessEqual(
+                    len(utility.inaccessible_passages(board, agents)), 4)
+
+    def test_inaccessible_passages(self):
+        board = np.full((5, 5), PASSAGE, dtype=np.uint8)
+        board[:, 2] = RIGID
+        board[0, 3] = WOOD
+        agents = [(4, 4), (0, 0)]
+        self.assertEqual(
+            utility.inaccessible_passages(board, agents),
+            [(row, col) for row in range(5) for col in (3, 4)
+             if (row, col) != (0, 3)])
+        self.assertEqual(agents, [(4, 4), (0, 0)])
+
+    def test_repair(self):
+        # A rigid wall along the anti-diagonal cuts off the bottom right.
+        board = np.full((7, 7), PASSAGE, dtype=np.uint8)
+        for row in range(1, 7):
+            board[row, 7 - row] = RIGID
+        rows, cols = np.triu_indices(7, 1)
+        self.assertEqual(
+            len(utility.inaccessible_passages(board, [(0, 0)])), 15)
+
+        self.assertTrue(utility._repair_board(board, rows, cols, (0, 0)))
+        self.assertLessEqual(
+            len(utility.inaccessible_passages(board, [(0, 0)])), 4)
+        self.assertEqual((board == RIGID).sum(), 6)
+        np.testing.assert_array_equal(board, board.T)
@@ -0,0 +1,64 @@
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman.network import obs_stream
+
+
+class ObsStreamTest(unittest.TestCase):
+
+    def test_rebuilds_observations(self):
+        env = pommerman.make('PommeTeamCompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)])
+        env.seed(0)
+        obs = env.reset()
+        encoders = [obs_stream.Encoder() for _ in range(4)]
+        decoders = [obs_stream.Decoder() for _ in range(4)]
+        done = False
+        while not done:
+            for num_agent, agent_obs in enumerate(obs):
+                if 10 + num_agent not in obs[0]['alive']:
+                    message = decoders[num_agent].decode(
+                        encoders[num_agent].encode_dead())
+                    self.assertTrue(message['d'])
+                    continue
+                message = decoders[num_agent].decode(
+                    encoders[num_agent].encode(agent_obs, 'turn'))
+                self.assertEqual(message['i'], 'turn')
+                decoded = message['o']
+                self.assertEqual(set(decoded), set(agent_obs))
+                for key, value in agent_obs.items():
+                    if isinstance(value, np.ndarray):
+                        np.testing.assert_array_equal(decoded[key], value)
+                    elif key == 'teammate':
+                        self.assertEqual(decoded[key], value.name)
+                    elif key == 'enemies':
+                        self.assertEqual(decoded[key],
+                                         [enemy.name for enemy in value])
+                    else:
+                        self.assertEqual(decoded[key], list(value) if
+                                         isinstance(value, tuple) else value)
+            obs, _, done, _ = env.step(env.act(obs))
+        env.close()
+
+    def test_deltas_are_small(self):
+        env = pommerman.make('PommeFFACompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)])
+        env.seed(1)
+        obs = env.reset()
+        encoder = obs_stream.Encoder()
+        keyframe = len(encoder.encode(obs[0], 'turn'))
+        sizes = []
+        for _ in range(20):
+            obs, _, done, _ = env.step(env.act(obs))
+            if done:
+                break
+            sizes.append(len(encoder.encode(obs[0], 'turn')))
+        self.assertLess(sum(sizes) / len(sizes), keyframe / 4)
+        env.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
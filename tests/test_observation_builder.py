@@ -0,0 +1,89 @@
+import random
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import constants
+
+
+def reference_observation(env, agent):
+    '''Builds the array part of an observation cell by cell'''
+    board_size = len(env._board)
+    view_size = env._agent_view_size
+
+    def in_view(row, col):
+        if not env._is_partially_observable:
+            return True
+        return abs(row - agent.position[0]) <= view_size and \
+            abs(col - agent.position[1]) <= view_size
+
+    obs = {key: np.zeros((board_size, board_size)) for key in [
+        'bomb_blast_strength', 'bomb_life', 'bomb_moving_direction',
+        'flame_life']}
+    obs['board'] = env._board.copy()
+    for row in range(board_size):
+        for col in range(board_size):
+            if not in_view(row, col):
+                obs['board'][row, col] = constants.Item.Fog.value
+    for bomb in env._bombs:
+        if in_view(*bomb.position):
+            obs['bomb_blast_strength'][bomb.position] = bomb.blast_strength
+            obs['bomb_life'][bomb.position] = bomb.life
+            if bomb.moving_direction is not None:
+                obs['bomb_moving_direction'][bomb.position] = \
+                    bomb.moving_direction.value
+    for flame in env._flames:
+        if in_view(*flame.position):
+            obs['flame_life'][flame.position] = flame.life + 1
+    return obs
+
+
+class ObservationBuilderTest(unittest.TestCase):
+
+    def run_game(self, config_id, seed, copy_observations, num_steps=200):
+        random.seed(seed)
+        np.random.seed(seed)
+        agent_list = [agents.SimpleAgent() for _ in range(4)]
+        env = pommerman.make(config_id, agent_list,
+                             copy_observations=copy_observations)
+        env.seed(seed)
+        obs = env.reset()
+        for _ in range(num_steps):
+            for agent, agent_obs in zip(env._agents, obs):
+                expected = reference_observation(env, agent)
+                for key, value in expected.items():
+                    np.testing.assert_array_equal(agent_obs[key], value)
+                    if not copy_observations:
+                        self.assertFalse(agent_obs[key].flags.writeable)
+                self.assertEqual(agent_obs['position'], agent.position)
+            obs, _, done, _ = env.step(env.act(obs))
+            if done:
+                obs = env.reset()
+        env.close()
+
+    def test_fully_observable(self):
+        self.run_game('PommeFFACompetition-v0', 0, True)
+
+    def test_partially_observable(self):
+        self.run_game('PommeTeamCompetition-v0', 1, True)
+        self.run_game('PommeRadio-v2', 2, True)
+
+    def test_read_only_views(self):
+        self.run_game('PommeFFACompetition-v0', 3, False)
+        self.run_game('PommeTeamCompetition-v0', 4, False)
+
+    def test_copies_are_independent(self):
+        env = pommerman.make('PommeTeamCompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)])
+        obs = env.reset()
+        obs[0]['flame_life'][:] = 7
+        obs[0]['board'][:] = 0
+        new_obs = env.get_observations()
+        self.assertFalse((new_obs[0]['flame_life'] == 7).any())
+        self.assertTrue((new_obs[0]['board'] == constants.Item.Fog.value).any())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import profiling
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def tearDown(self):
+        profiling.disable()
+
+    def play(self, num_steps):
+        random.seed(0)
+        np.random.seed(0)
+        env = pommerman.make('PommeFFACompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)])
+        obs = env.reset()
+        for _ in range(num_steps):
+            obs = env.step(env.act(obs))[0]
+        env.close()
+
+    def test_sections_and_counters(self):
+        profiler = profiling.enable(trace=True)
+        self.play(20)
+        self.assertIs(profiling.disable(), profiler)
+
+        for name in ['env.step', 'env.step.model', 'observations',
+                     'step.flames', 'step.collisions', 'step.explosions',
+                     'act.agent_0', 'act.agent_3']:
+            self.assertIn(name, profiler.totals)
+        self.assertEqual(profiler.calls['env.step'], 20)
+        self.assertEqual(profiler.calls['observations'], 21)
+        self.assertGreaterEqual(profiler.counters['step.collision_iterations'],
+                                20)
+        summary = profiler.summary()
+        self.assertIn('step.explosions', summary)
+        self.assertIn('step.collision_iterations', summary)
+
+        path = os.path.join(tempfile.mkdtemp(), 'trace.json')
+        profiler.save_chrome_trace(path)
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+        steps = [event for event in events if event['name'] == 'env.step']
+        self.assertEqual(len(steps), 20)
+        self.assertTrue(all(event['dur'] >= 0 for event in steps))
+
+    def test_disabled(self):
+        profiler = profiling.enable()
+        self.play(3)
+        self.assertIs(profiling.disable(), profiler)
+        calls = dict(profiler.calls)
+        totals = dict(profiler.totals)
+        counters = dict(profiler.counters)
+        self.assertEqual(calls['env.step'], 3)
+
+        # With profiling off nothing reports to the old profiler or installs
+        # a new one.
+        self.assertIsNone(profiling.active)
+        self.play(5)
+        self.assertIsNone(profiling.active)
+        self.assertEqual(dict(profiler.calls), calls)
+        self.assertEqual(dict(profiler.totals), totals)
+        self.assertEqual(dict(profiler.counters), counters)
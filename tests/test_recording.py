@@ -0,0 +1,81 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import recording
+from pommerman import replay
+
+
+class RecordingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def record_game(self, config_id, seed, keyframe_interval):
+        '''Plays a game into a replay and returns the states of every step'''
+        random.seed(seed)
+        np.random.seed(seed)
+        env = pommerman.make(config_id,
+                             [agents.SimpleAgent() for _ in range(4)])
+        env.seed(seed)
+        obs = env.reset()
+        for agent in env._agents:
+            agent._character.can_kick = True
+        path = os.path.join(self.directory, '%d.npz' % seed)
+        env.record_replay(path, keyframe_interval=keyframe_interval)
+
+        def snapshot():
+            return replay.state_to_arrays(env._board, env._agents,
+                                             env._bombs, env._items,
+                                             env._flames)
+
+        states = [snapshot()]
+        done = False
+        while not done:
+            obs, _, done, info = env.step(env.act(obs))
+            states.append(snapshot())
+        env.close()
+        return path, states, info
+
+    def assertSameState(self, expected, state):
+        actual = replay.state_to_arrays(*state)
+        for key in expected:
+            if key in ['board', 'agents']:
+                np.testing.assert_array_equal(expected[key], actual[key])
+            else:
+                # Compare as sets since only the contents matter.
+                self.assertEqual(sorted(map(tuple, expected[key].tolist())),
+                                 sorted(map(tuple, actual[key].tolist())))
+
+    def test_seek(self):
+        path, states, info = self.record_game('PommeFFACompetition-v0', 1,
+                                              None)
+        with recording.ReplayReader(path) as reader:
+            self.assertEqual(len(reader), len(states))
+            self.assertEqual(reader.header['result'], info['result'].name)
+            self.assertEqual(reader.keyframes, [0])
+            steps = list(range(len(states)))
+            random.Random(0).shuffle(steps)
+            for step in steps[:20] + sorted(steps):
+                self.assertSameState(states[step], reader.get_state(step))
+
+    def test_keyframes_and_collapse(self):
+        path, states, _ = self.record_game('PommeFFA-v1', 3, 64)
+        with recording.ReplayReader(path) as reader:
+            # The board collapses at step 500 and the game lasts past it.
+            self.assertIn(500, reader.keyframes)
+            for step in range(len(states)):
+                self.assertSameState(states[step], reader.get_state(step))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+import gym
 import pommerman
 
 from pommerman import agents
@@ -43,6 +44,18 @@ class MyTestCase(unittest.TestCase):
             print('Episode {} finished'.format(i_episode))
         env.close()
 
+    def test_make_with_env_kwargs(self):
+        """ Extra kwargs to make override the config's env_kwargs. """
+        agent_list = [agents.RandomAgent() for _ in range(4)]
+        env = pommerman.make('PommeFFACompetition-v0', agent_list,
+                             max_steps=7)
+        self.assertEqual(env._max_steps, 7)
+        self.assertEqual(env.spec._kwargs['max_steps'], 7)
+        self.assertEqual(
+            gym.spec('PommeFFACompetition-v0')._kwargs['max_steps'],
+            pommerman.constants.MAX_STEPS)
+        env.close()
+
     def test_serpentine_main(self):
         main()
 
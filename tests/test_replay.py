@@ -0,0 +1,67 @@
+import json
+import random
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import replay
+
+
+class ReplayTest(unittest.TestCase):
+
+    def play_game(self, config_id, seed):
+        '''Plays a game and returns its record and the states of every step'''
+        random.seed(seed)
+        np.random.seed(seed)
+        env = pommerman.make(config_id,
+                             [agents.SimpleAgent() for _ in range(4)])
+        env.seed(seed)
+        obs = env.reset()
+
+        def snapshot():
+            return replay.state_to_arrays(env._board, env._agents,
+                                          env._bombs, env._items, env._flames)
+
+        states = [snapshot()]
+        done = False
+        while not done:
+            obs, _, done, _ = env.step(env.act(obs))
+            states.append(snapshot())
+        record = env.get_record()
+        env.close()
+        return record, states
+
+    def assertSameState(self, expected, state):
+        actual = replay.state_to_arrays(*state)
+        np.testing.assert_array_equal(expected['board'], actual['board'])
+        np.testing.assert_array_equal(expected['agents'], actual['agents'])
+        for key in ['bombs', 'flames', 'items']:
+            self.assertEqual(sorted(map(tuple, expected[key].tolist())),
+                             sorted(map(tuple, actual[key].tolist())))
+
+    def test_replay_any_step(self):
+        record, states = self.play_game('PommeTeamCompetition-v0', 5)
+        self.assertEqual(record.seed, 5)
+        self.assertEqual(len(record.actions), len(states) - 1)
+
+        # Go through json like a saved match would.
+        record = replay.GameRecord.from_json(
+            json.loads(json.dumps(record.to_json())))
+        game = replay.Replay(record, checkpoint_interval=40)
+        steps = list(range(len(states)))
+        random.Random(0).shuffle(steps)
+        for step in steps:
+            self.assertSameState(states[step], game.get_state(step))
+
+    def test_replay_collapse(self):
+        record, states = self.play_game('PommeFFA-v1', 3)
+        self.assertGreater(len(states), record.collapses[0] + 1)
+        game = replay.Replay(record)
+        for step in range(len(states)):
+            self.assertSameState(states[step], game.get_state(step))
+
+
+if __name__ == '__main__':
+    unittest.main()
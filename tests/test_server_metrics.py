@@ -0,0 +1,84 @@
+import asyncio
+import json
+import unittest
+
+from pommerman.network.server import metrics
+
+
+class MetricsTest(unittest.TestCase):
+
+    def test_histogram(self):
+        histogram = metrics.Histogram()
+        for seconds in [0.00005, 0.003, 0.003, 10]:
+            histogram.add(seconds)
+        ret = histogram.to_json()
+        self.assertEqual(ret['count'], 4)
+        self.assertEqual(ret['max'], 10)
+        self.assertEqual(ret['counts'][0], 1)
+        self.assertEqual(ret['counts'][ret['le'].index(0.005)], 2)
+        self.assertEqual(ret['counts'][-1], 1)
+
+    def test_match(self):
+        metrics_ = metrics.Metrics(gauges=lambda: {'players': 4})
+        players = ['a', 'b', 'c', 'd']
+        for player in players:
+            metrics_.player_joined(player)
+        metrics_.match_started('m', players)
+        for index in range(4):
+            metrics_.player_acted('m', index, 0.01 * (index + 1))
+        metrics_.turn_closed('m', 0.05, [])
+        for index in range(2):
+            metrics_.player_acted('m', index, 0.01)
+        metrics_.turn_closed('m', 1.0, [2, 3])
+
+        ret = metrics_.to_json()
+        self.assertEqual(ret['gauges'], {'players': 4})
+        self.assertEqual(ret['turns'], 2)
+        self.assertEqual(ret['timeouts'], 1)
+        self.assertEqual(ret['queue_wait']['count'], 4)
+        self.assertEqual(ret['response']['count'], 6)
+        self.assertEqual(ret['players']['c']['timeouts'], 1)
+        self.assertEqual(ret['players']['a']['response']['count'], 2)
+        match = ret['matches']['m']
+        self.assertEqual(match['late'], [0, 0, 1, 1])
+        self.assertEqual(match['turn_latency']['max'], 1.0)
+        json.dumps(ret)
+
+        metrics_.match_ended('m')
+        metrics_.player_left('a')
+        ret = metrics_.to_json()
+        self.assertEqual(ret['matches'], {})
+        self.assertEqual(ret['finished_matches'][0]['id'], 'm')
+        self.assertNotIn('a', ret['players'])
+
+    def test_http(self):
+        metrics_ = metrics.Metrics(gauges=lambda: {'matches': 0})
+
+        async def get(port, path):
+            reader, writer = await asyncio.open_connection('localhost', port)
+            writer.write(('GET %s HTTP/1.0\r\n\r\n' % path).encode())
+            response = await reader.read()
+            writer.close()
+            head, body = response.split(b'\r\n\r\n', 1)
+            return head.split(b'\r\n')[0], json.loads(body)
+
+        async def run():
+            server = await metrics_.serve(0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                return [await get(port, path)
+                        for path in ['/health', '/metrics', '/other']]
+            finally:
+                server.close()
+
+        health, all_, other = asyncio.new_event_loop().run_until_complete(
+            run())
+        self.assertEqual(health[0], b'HTTP/1.0 200 OK')
+        self.assertEqual(health[1]['status'], 'ok')
+        self.assertEqual(health[1]['matches'], 0)
+        self.assertIn('turn_latency', all_[1])
+        self.assertEqual(other[0], b'HTTP/1.0 404 Not Found')
+
+
+if __name__ == '__main__':
+    unittest.main()
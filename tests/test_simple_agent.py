@@ -0,0 +1,106 @@
+from collections import defaultdict
+import random
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import constants
+from pommerman import utility
+
+
+def search_dicts(board, my_position, enemies, depth):
+    '''The search over dicts that SimpleAgent._djikstra used to do'''
+    exclude = [constants.Item.Fog, constants.Item.Rigid, constants.Item.Flames]
+    items = defaultdict(list)
+    dist = {}
+    prev = {}
+    queue = []
+    my_x, my_y = my_position
+    for r in range(max(0, my_x - depth), min(len(board), my_x + depth)):
+        for c in range(max(0, my_y - depth), min(len(board), my_y + depth)):
+            position = (r, c)
+            if abs(r - my_x) + abs(c - my_y) > depth or \
+               utility.position_in_items(board, position, exclude):
+                continue
+            prev[position] = None
+            items[constants.Item(board[position])].append(position)
+            if position == my_position:
+                queue.append(position)
+                dist[position] = 0
+            else:
+                dist[position] = np.inf
+
+    while queue:
+        position = queue.pop(0)
+        if utility.position_is_passable(board, position, enemies):
+            x, y = position
+            val = dist[position] + 1
+            for row, col in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                new_position = (row + x, col + y)
+                if new_position not in dist:
+                    continue
+                if val < dist[new_position]:
+                    dist[new_position] = val
+                    prev[new_position] = position
+                    queue.append(new_position)
+                elif val == dist[new_position] and random.random() < .5:
+                    prev[new_position] = position
+    return items, dist, prev
+
+
+class SimpleAgentTest(unittest.TestCase):
+
+    def test_djikstra(self):
+        random.seed(2)
+        np.random.seed(2)
+        env = pommerman.make('PommeTeamCompetition-v0',
+                             [agents.SimpleAgent() for _ in range(4)])
+        obs = env.reset()
+        for _ in range(40):
+            obs = env.step(env.act(obs))[0]
+        env.close()
+
+        for agent_obs in obs:
+            board = agent_obs['board']
+            my_position = tuple(agent_obs['position'])
+            enemies = agent_obs['enemies']
+            state = random.getstate()
+            items, dist, prev = search_dicts(board, my_position, enemies, 10)
+            state_after = random.getstate()
+            random.setstate(state)
+            array_items, array_dist, array_prev = \
+                agents.SimpleAgent._djikstra(board, my_position, [], enemies,
+                                             depth=10)
+
+            self.assertEqual(dict(items), dict(array_items))
+            expected_dist = np.full(board.shape, np.inf)
+            expected_prev = np.full(board.shape, -1)
+            for position, distance in dist.items():
+                expected_dist[position] = distance
+                if prev[position] is not None:
+                    expected_prev[position] = \
+                        prev[position][0] * len(board) + prev[position][1]
+            np.testing.assert_array_equal(array_dist, expected_dist)
+            np.testing.assert_array_equal(array_prev, expected_prev)
+            # Both searches drew as many random numbers.
+            self.assertEqual(random.getstate(), state_after)
+
+    def test_direction_without_path(self):
+        # The enemy stands on the cell of a dead agent, so it is at dist 0.
+        board = np.full((11, 11), constants.Item.Passage.value)
+        my_position = (3, 3)
+        board[my_position] = constants.Item.Agent1.value
+        enemies = [constants.Item.Agent1]
+        items, dist, prev = agents.SimpleAgent._djikstra(
+            board, my_position, [], enemies, depth=10)
+        self.assertIsNone(
+            agents.SimpleAgent._near_enemy(my_position, items, dist, prev,
+                                           enemies, 3))
+
+        # A cell the search never reached has no way back either.
+        self.assertEqual(prev[0, 0], -1)
+        self.assertIsNone(
+            agents.SimpleAgent._get_direction_towards_position(
+                my_position, (0, 0), prev))
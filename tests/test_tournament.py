@@ -0,0 +1,31 @@
+import unittest
+
+from pommerman.cli import tournament
+
+
+class TournamentTest(unittest.TestCase):
+
+    def test_elo_is_zero_sum(self):
+        rating = tournament.Elo()
+        rating.update([0, 1, 2, 3], [1, 0, 1, 1])
+        rating.update([0, 1], [0, 0])
+        self.assertAlmostEqual(sum(rating.ratings.values()), 4 * 1200.)
+        self.assertGreater(rating.get(1), rating.get(0))
+
+    def test_swiss_pairings_avoid_rematches(self):
+        rating = tournament.Elo()
+        played = {(0, 1), (1, 0)}
+        games = tournament.swiss_pairings([0, 1, 2, 3, 4], 2, rating, played)
+        self.assertEqual(len(games), 2)
+        self.assertNotIn((0, 1), games)
+        self.assertEqual(len(set(sum(games, ()))), 4)
+
+    def test_play_game(self):
+        ranks, steps = tournament.play_game(
+            ('OneVsOne-v0', ['test::agents.SimpleAgent', 'random::null'], 3))
+        self.assertEqual(len(ranks), 2)
+        self.assertGreater(steps, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
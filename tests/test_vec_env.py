@@ -0,0 +1,143 @@
+import random
+import time
+import unittest
+
+import numpy as np
+
+import pommerman
+from pommerman import agents
+from pommerman import vec
+
+
+class VecEnvTest(unittest.TestCase):
+
+    def test_matches_single_env(self):
+        config_id = 'PommeFFACompetition-v0'
+        agent_strings = ['test::agents.SimpleAgent'] * 4
+        seed = 7
+        with vec.VecEnv(config_id, agent_strings, num_envs=2, num_workers=2,
+                        training_agent=0, seed=seed) as env:
+            obs = env.reset()
+            self.assertEqual(obs['board'].shape, (2, 11, 11))
+
+            # A single env seeded the same way as the second env.
+            random.seed(seed + 1)
+            np.random.seed(seed + 1)
+            single = pommerman.make(config_id,
+                                    [agents.SimpleAgent() for _ in range(4)])
+            single.set_training_agent(0)
+            single.seed(seed + 1)
+            single_obs = single.reset()
+
+            rng = np.random.RandomState(0)
+            for _ in range(100):
+                for key in ['board', 'bomb_life', 'flame_life', 'ammo']:
+                    np.testing.assert_array_equal(obs[key][1],
+                                                  single_obs[0][key])
+                actions = rng.randint(0, 6, size=2)
+                all_actions = single.act(single_obs)
+                all_actions.insert(0, int(actions[1]))
+                single_obs, single_rewards, done, _ = single.step(all_actions)
+                obs, rewards, dones, infos = env.step(actions)
+                self.assertEqual(dones[1], done)
+                self.assertEqual(rewards[1], single_rewards[0])
+                if done:
+                    break
+
+    def test_seed_independent_of_workers(self):
+        boards = []
+        for num_workers in [1, 3]:
+            with vec.VecEnv('OneVsOne-v0', ['test::agents.SimpleAgent'] * 2,
+                            num_envs=3, num_workers=num_workers,
+                            seed=3) as env:
+                steps = [env.reset()['board']]
+                for _ in range(50):
+                    steps.append(env.step()[0]['board'])
+                boards.append(np.stack(steps))
+        np.testing.assert_array_equal(boards[0], boards[1])
+
+    def test_auto_reset(self):
+        with vec.VecEnv('OneVsOne-v0', ['test::agents.SimpleAgent'] * 2,
+                        num_envs=3, num_workers=2, seed=0) as env:
+            obs = env.reset()
+            self.assertEqual(obs['board'].shape, (3, 2, 8, 8))
+            self.assertEqual(obs['enemies'].shape, (3, 2, 1))
+            finished = 0
+            for _ in range(1000):
+                obs, rewards, dones, infos = env.step()
+                self.assertEqual(rewards.shape, (3, 2))
+                for num_env in np.flatnonzero(dones):
+                    finished += 1
+                    self.assertEqual(obs['step_count'][num_env], 0)
+                    self.assertIn('result', infos[num_env])
+            self.assertGreater(finished, 0)
+
+    def test_batch_agents(self):
+        policy = BatchPolicy()
+        with vec.VecEnv('PommeTeamCompetition-v0',
+                        [None, 'test::agents.SimpleAgent', None,
+                         'test::agents.SimpleAgent'],
+                        num_envs=3, num_workers=2, seed=0,
+                        batch_agents={0: policy, 2: policy}) as env:
+            obs = env.reset()
+            for _ in range(20):
+                alive = obs['alive'][:, [0, 2]].sum()
+                last_obs = obs
+                obs, rewards, dones, infos = env.step()
+                batch = policy.batches[-1]
+                self.assertEqual(len(batch), alive)
+                for (index, seat), agent_obs in zip(
+                        [(index, seat) for index in range(3)
+                         for seat in [0, 2] if last_obs['alive'][index, seat]],
+                        batch):
+                    np.testing.assert_array_equal(
+                        agent_obs['board'], last_obs['board'][index, seat])
+                    self.assertEqual(agent_obs['teammate'].value,
+                                     last_obs['teammate'][index, seat])
+            self.assertEqual(len(policy.batches), 20)
+
+        # Agents that only act on single observations play too.
+        with vec.VecEnv('PommeFFACompetition-v0',
+                        [None] + ['test::agents.SimpleAgent'] * 3,
+                        num_envs=2, num_workers=1, seed=0,
+                        batch_agents={0: agents.RandomAgent()}) as env:
+            env.reset()
+            for _ in range(5):
+                env.step()
+
+    def test_act_deadline(self):
+        # Built in the workers by helpers.make_agent_from_string.
+        slow = "__import__('tests.test_vec_env').test_vec_env.SlowAgent"
+        with vec.VecEnv('OneVsOne-v0', ['test::' + slow] * 2, num_envs=2,
+                        num_workers=1, seed=0, act_deadline=.1) as env:
+            env.reset()
+            start = time.perf_counter()
+            obs, rewards, dones, infos = env.step()
+            # The agents of both envs were not waited for and stopped.
+            self.assertLess(time.perf_counter() - start, .8)
+            self.assertTrue(obs['alive'].all())
+            self.assertFalse(dones.any())
+
+
+class SlowAgent(agents.BaseAgent):
+    '''Moves up after a second'''
+
+    def act(self, obs, action_space):
+        time.sleep(1)
+        return pommerman.constants.Action.Up.value
+
+
+class BatchPolicy(agents.BaseAgent):
+    '''Moves up and keeps the batches it was given'''
+
+    def __init__(self):
+        super(BatchPolicy, self).__init__()
+        self.batches = []
+
+    def act_batch(self, observations, action_space):
+        self.batches.append(observations)
+        return np.full(len(observations), pommerman.constants.Action.Up.value)
+
+
+if __name__ == '__main__':
+    unittest.main()